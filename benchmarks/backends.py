@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Compare the API backends of the collection on the same node
+
+Runs the same reads with each backend and prints the time per call and the
+number of connections made. Run it from a checkout of the collection below an
+`ansible_collections/cloudcodger/proxmox_openssh` directory, with the Python
+modules of the backends installed.
+
+    python benchmarks/backends.py pve1 --token-id 'devops@pve!ansible' \\
+        --token-secret "$(cat ~/.pve_tokens/devops-pve-ansible.token)"
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+COLLECTIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+if os.path.isdir(os.path.join(COLLECTIONS_DIR, 'ansible_collections')) and COLLECTIONS_DIR not in sys.path:
+    sys.path.insert(0, COLLECTIONS_DIR)
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    ProxmoxOpenSSHAnsible)
+
+# Reads made in each round, the last one runs several pvesh commands in one call with the SSH backends
+READS = (
+    ('version', lambda proxmox: proxmox.proxmox_api.version.get()),
+    ('users', lambda proxmox: proxmox.proxmox_api.access.users.get()),
+    ('acls', lambda proxmox: proxmox.proxmox_api.access.acl.get()),
+    ('snapshot', lambda proxmox: proxmox.get_many(['/access/groups', '/access/users', '/access/acl', '/storage'])),
+)
+
+
+class BenchmarkModule(object):
+    """Stands in for AnsibleModule, failures end the benchmark"""
+
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+
+    def warn(self, warning):
+        print('WARNING: {0}'.format(warning), file=sys.stderr)
+
+    def fail_json(self, msg, **kwargs):
+        sys.exit('{0}: {1}'.format(self.params['api_backend'], msg))
+
+
+def run(backend, args):
+    params = dict(
+        api_host=args.host,
+        api_user=args.user,
+        api_port=None,
+        api_sudo=args.sudo,
+        api_backend=backend,
+        api_token_id=args.token_id,
+        api_token_secret=args.token_secret,
+        api_validate_certs=args.validate_certs,
+    )
+    start = time.time()
+    proxmox = ProxmoxOpenSSHAnsible(BenchmarkModule(params))
+    connect = time.time() - start
+
+    timings = dict((name, []) for name, read in READS)
+    for _ in range(args.rounds):
+        for name, read in READS:
+            start = time.time()
+            read(proxmox)
+            timings[name].append(time.time() - start)
+
+    metrics = proxmox.api_session.metrics()
+    print('{0:10s} connect {1:7.3f}s  connections {2:5d}'.format(backend, connect, metrics['connections']))
+    for name, read in READS:
+        print('  {0:10s} median {1:7.3f}s  total {2:7.3f}s'.format(
+            name, statistics.median(timings[name]), sum(timings[name])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('host', help='the target host of the Proxmox VE cluster')
+    parser.add_argument('--user', default='root', help='the SSH user')
+    parser.add_argument('--sudo', action='store_true', help='run pvesh with sudo')
+    parser.add_argument('--token-id', help='API token for the https backend, as user@realm!token')
+    parser.add_argument('--token-secret', help='secret of the API token')
+    parser.add_argument('--validate-certs', action='store_true', help='verify the TLS certificate of the https backend')
+    parser.add_argument('--backends', default='openssh,paramiko,https', help='comma separated backends to compare')
+    parser.add_argument('--rounds', type=int, default=10, help='rounds of reads per backend')
+    args = parser.parse_args()
+
+    for backend in args.backends.split(','):
+        if backend == 'https' and not args.token_id:
+            print('{0:10s} skipped, no --token-id'.format(backend))
+            continue
+        run(backend, args)
+
+
+if __name__ == '__main__':
+    main()
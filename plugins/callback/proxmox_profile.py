@@ -0,0 +1,171 @@
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: proxmox_profile
+
+type: aggregate
+
+short_description: Summarize the Proxmox VE API cost of a playbook
+
+version_added: "2.1.0"
+
+description:
+  - Collects the C(proxmox_metrics) returned by the modules in this collection.
+  - At the end of the playbook prints the slowest tasks, the most frequently called
+    API endpoints and the reads that repeated an earlier read with no write in between.
+  - Optionally writes the same information as a JSON report that can be compared between runs.
+
+requirements:
+  - Enable the callback with C(callbacks_enabled = cloudcodger.proxmox_openssh.proxmox_profile) in C(ansible.cfg).
+
+options:
+    report_path:
+        description: Path of the JSON report to write, no report is written when not set.
+        type: path
+        env:
+          - name: PROXMOX_PROFILE_REPORT
+        ini:
+          - section: callback_proxmox_profile
+            key: report_path
+    top:
+        description: Number of entries shown in each ranking.
+        type: int
+        default: 10
+        env:
+          - name: PROXMOX_PROFILE_TOP
+        ini:
+          - section: callback_proxmox_profile
+            key: top
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+import json
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'cloudcodger.proxmox_openssh.proxmox_profile'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.tasks = {}
+        self.task_order = []
+        self.endpoints = {}
+        self.redundant = {}
+        # Reads seen per cluster host since the last write to it
+        self.reads = {}
+
+    def _task_entry(self, task):
+        uuid = task._uuid
+        if uuid not in self.tasks:
+            self.tasks[uuid] = {
+                'task': task.get_name(),
+                'path': task.get_path(),
+                'started': time.time(),
+                'duration': 0.0,
+                'runs': 0,
+                'calls': 0,
+                'connections': 0,
+                'api_elapsed': 0.0,
+                'write_wait': 0.0,
+            }
+            self.task_order.append(uuid)
+        return self.tasks[uuid]
+
+    def _add_metrics(self, entry, metrics):
+        entry['runs'] += 1
+        entry['calls'] += len(metrics.get('calls', []))
+        entry['connections'] += metrics.get('connections', 0)
+        entry['api_elapsed'] += metrics.get('elapsed', 0.0)
+        entry['write_wait'] += metrics.get('write_wait', 0.0)
+
+        host = metrics.get('host')
+        seen = self.reads.setdefault(host, set())
+        for call in metrics.get('calls', []):
+            endpoint = '{0} {1}'.format(call['method'], call['path'])
+            stats = self.endpoints.setdefault(endpoint, {'endpoint': endpoint, 'count': 0, 'elapsed': 0.0})
+            stats['count'] += 1
+            stats['elapsed'] += call['elapsed']
+
+            if call['method'] in ('POST', 'PUT', 'DELETE'):
+                seen.clear()
+            if call['method'] != 'GET':
+                continue
+            read = (call['path'], json.dumps(call.get('params', {}), sort_keys=True))
+            if read in seen:
+                stats = self.redundant.setdefault(endpoint, {'endpoint': endpoint, 'count': 0, 'elapsed': 0.0})
+                stats['count'] += 1
+                stats['elapsed'] += call['elapsed']
+            seen.add(read)
+
+    def _collect(self, result):
+        entry = self._task_entry(result._task)
+        entry['duration'] = time.time() - entry['started']
+        items = result._result.get('results')
+        if not isinstance(items, list):
+            items = [result._result]
+        # Modules working on several clusters report the metrics of each one
+        items = items + [cluster for item in items if isinstance(item, dict) for cluster in item.get('clusters') or []]
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get('proxmox_metrics'), dict):
+                self._add_metrics(entry, item['proxmox_metrics'])
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._task_entry(task)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._task_entry(task)
+
+    def v2_runner_on_ok(self, result):
+        self._collect(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._collect(result)
+
+    def _ranked(self, entries, key):
+        return sorted(entries, key=lambda entry: entry[key], reverse=True)[:self.get_option('top')]
+
+    def v2_playbook_on_stats(self, stats):
+        tasks = [self.tasks[uuid] for uuid in self.task_order if self.tasks[uuid]['runs']]
+        endpoints = list(self.endpoints.values())
+        redundant = list(self.redundant.values())
+
+        self._display.banner('PROXMOX API PROFILE')
+        self._display.display('Slowest tasks (API seconds / wall seconds / calls / ssh connections):')
+        for entry in self._ranked(tasks, 'api_elapsed'):
+            self._display.display('  {0:8.2f} {1:8.2f} {2:6d} {3:6d}  {4}'.format(
+                entry['api_elapsed'], entry['duration'], entry['calls'], entry['connections'], entry['task']))
+        self._display.display('Most frequent endpoints (calls / API seconds):')
+        for entry in self._ranked(endpoints, 'count'):
+            self._display.display('  {0:6d} {1:8.2f}  {2}'.format(entry['count'], entry['elapsed'], entry['endpoint']))
+        self._display.display('Redundant reads (calls / API seconds):')
+        for entry in self._ranked(redundant, 'count'):
+            self._display.display('  {0:6d} {1:8.2f}  {2}'.format(entry['count'], entry['elapsed'], entry['endpoint']))
+
+        report_path = self.get_option('report_path')
+        if report_path:
+            report = {
+                'tasks': tasks,
+                'endpoints': sorted(endpoints, key=lambda entry: entry['endpoint']),
+                'redundant_reads': sorted(redundant, key=lambda entry: entry['endpoint']),
+                'totals': {
+                    'calls': sum(entry['calls'] for entry in tasks),
+                    'connections': sum(entry['connections'] for entry in tasks),
+                    'api_elapsed': round(sum(entry['api_elapsed'] for entry in tasks), 4),
+                    'write_wait': round(sum(entry['write_wait'] for entry in tasks), 4),
+                },
+            }
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
@@ -14,13 +14,115 @@ class ModuleDocFragment(object):
 options:
   api_host:
     description:
-      - Specify the target host of the Proxmox VE cluster.
-    type: str
+      - Specify the target host of the Proxmox VE cluster, or a list of nodes of the cluster.
+      - With a list the nodes are probed once for the play, with the latencies cached on the control node
+        for 15 minutes. Reads go to the healthy node with the lowest latency and writes and remote commands
+        to the primary, the first healthy node of the list. A call to a node that can't be reached is sent to
+        the next node and that node is left out for the rest of the task.
+      - With C(api_backend=fake) all the nodes share the state file of the first node.
+    type: raw
     required: true
   api_user:
     description:
       - Specify the user to authenticate with.
     type: str
     required: true
+  api_port:
+    description:
+      - Specify the port of the target host.
+      - Defaults to C(22) for the SSH backends and C(8006) for the C(https) backend.
+    type: int
+  api_sudo:
+    description:
+      - Run pvesh with sudo on the target host.
+    type: bool
+    default: false
+  api_backend:
+    description:
+      - How the Proxmox VE API is reached.
+      - C(openssh) runs C(pvesh) over SSH on I(api_host), with a new C(ssh) process for each call.
+      - C(paramiko) keeps one authenticated SSH connection per host in the module process and runs each
+        C(pvesh) call on a new channel of it. Host keys are checked against the OpenSSH C(known_hosts) files
+        and C(HostName) and C(IdentityFile) are read from C(~/.ssh/config). Requires the Python C(paramiko) module.
+      - C(fake) answers from the state file C(fake/<api_host>.json) in the C(PROXMOX_OPENSSH_CACHE_DIR)
+        directory, C(~/.ansible/proxmox_openssh) by default, to run playbooks without a cluster.
+        The state starts with the objects of a new installation and the file may also set the C(latency)
+        of each request and C(failures) to inject.
+      - C(https) sends the requests to the API of I(api_host) with the I(api_token_id) and I(api_token_secret) of an
+        API token, over keep-alive connections shared by the module run. No Perl interpreter is started on the node
+        for a call. Plan mode and the reads of several paths in one call need an SSH backend.
+      - C(replay) answers from the cassette I(api_cassette) recorded by an earlier run, with the recorded
+        response times scaled by I(api_replay_speed). Calls that were not recorded fail.
+    type: str
+    choices: [ openssh, paramiko, https, fake, replay ]
+    default: openssh
+  api_helper:
+    description:
+      - With the C(openssh) and C(paramiko) backends, start a small Perl helper on I(api_host) that answers
+        all API requests of the module run over one SSH channel, instead of a new C(pvesh) for each request.
+      - The helper is sent with the command that starts it, nothing is installed on the node.
+      - When the helper can not be started the module warns and uses C(pvesh). When it breaks during a request
+        the module warns, sends a read again with C(pvesh) and fails a write, whose outcome is unknown.
+    type: bool
+    default: false
+  api_cassette:
+    description:
+      - Path of a cassette file on the control node.
+      - With the other backends every request and remote command of the run is appended to the cassette with its
+        answer and the time it took, for the C(replay) backend. Passwords, token secrets and keys are redacted.
+      - The pre-flight check and the probes of an I(api_host) list are then made on every run instead of being
+        cached, so they are in the cassette.
+    type: path
+  api_replay_speed:
+    description:
+      - Factor applied to the recorded response times by the C(replay) backend, C(0) answers at once.
+    type: float
+    default: 1.0
+  api_write_concurrency:
+    description:
+      - Most writes sent to the cluster of I(api_host) at the same time by all the module runs of the control node,
+        whatever the number of forks. Reads are not limited.
+      - The limit is kept with lock files in the cache directory of the control node, C(~/.ansible/proxmox_openssh)
+        or C(PROXMOX_OPENSSH_CACHE_DIR), shared by the runs with the same first node in I(api_host).
+      - The seconds the writes of a run waited are returned in C(proxmox_metrics.write_wait).
+    type: int
+  api_write_rate:
+    description:
+      - Most writes per second sent to the cluster of I(api_host) by all the module runs of the control node,
+        with bursts of up to one second of writes.
+      - Shared as I(api_write_concurrency) and can be combined with it.
+    type: float
+  api_timeout:
+    description:
+      - Seconds each API request may take, with C(pvesh), the API helper of I(api_helper) or the C(https) backend.
+      - With the C(openssh) backend it includes opening the SSH connection and starting C(pvesh).
+    type: int
+    default: 5
+  api_token_id:
+    description:
+      - Full ID of the API token used by the C(https) backend, as C(user@realm!token).
+    type: str
+  api_token_secret:
+    description:
+      - Secret of the API token used by the C(https) backend, for example the content of the
+        file the C(datacenter) role stores for a new token.
+    type: str
+  api_validate_certs:
+    description:
+      - Verify the TLS certificate of I(api_host) with the C(https) backend.
+    type: bool
+    default: false
 requirements: [ "openssh-wrapper", "proxmoxer", "requests" ]
+'''
+
+    # Plan mode shared by the modules that write to the API
+    PLAN = r'''
+options:
+  api_plan:
+    description:
+      - Path of a plan file on the control node.
+      - When set, API writes are not sent but appended to this file together with the digests of
+        C(/etc/pve/user.cfg) and C(/etc/pve/storage.cfg) they were computed from.
+      - Apply the reviewed plan with the M(cloudcodger.proxmox_openssh.proxmox_plan_apply) module.
+    type: path
 '''
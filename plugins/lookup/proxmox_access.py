@@ -0,0 +1,174 @@
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: proxmox_access
+
+short_description: Read Proxmox VE Datacenter users, groups, tokens and ACLs
+
+version_added: "2.1.0"
+
+description:
+  - Returns the users, groups, API tokens or ACLs of a Proxmox VE Datacenter.
+  - Uses the same proxmoxer openssh backend as the modules in this collection.
+  - Results are cached on the control node, so repeated lookups in loops and conditions
+    do not reconnect to the host and unchanged results are not read again.
+
+options:
+    _terms:
+        description: The access resources to return, any of C(users), C(groups), C(tokens) and C(acls).
+        required: true
+    host:
+        description: The target host of the Proxmox VE cluster.
+        required: true
+        type: str
+    user:
+        description: The user to authenticate with.
+        default: root
+        type: str
+    port:
+        description: The SSH port of the target host.
+        default: 22
+        type: int
+    sudo:
+        description: Run pvesh with sudo.
+        default: false
+        type: bool
+    backend:
+        description:
+          - C(openssh) starts an C(ssh) process for each read.
+          - C(paramiko) keeps one connection per host for all lookups of the playbook run in a worker process.
+        default: openssh
+        choices: [ openssh, paramiko ]
+        type: str
+    ttl:
+        description:
+          - Seconds a cached result is reused without contacting the host.
+          - An older result is revalidated with one small read of C(/etc/pve/.version) and only read again
+            when C(/etc/pve/user.cfg) changed since, or when its version can't be read.
+        default: 60
+        type: int
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Create the devops user unless it exists."
+  cloudcodger.proxmox_openssh.proxmox_user:
+    api_host: "pve1"
+    api_user: "root"
+    user: "devops@pve"
+  when: "'devops@pve' not in lookup('cloudcodger.proxmox_openssh.proxmox_access', 'users', host='pve1')
+    | map(attribute='userid')"
+
+- name: "Show the tokens of every user."
+  ansible.builtin.debug:
+    msg: "{{ item.userid }}!{{ item.tokenid }}"
+  # One list is returned for each term, the loop takes the tokens of the only one
+  loop: "{{ query('cloudcodger.proxmox_openssh.proxmox_access', 'tokens', host='pve1') | first }}"
+'''
+
+RETURN = r'''
+_raw:
+    description: One list of dicts for each requested resource, as returned by the Proxmox VE API.
+    type: list
+    elements: list
+'''
+
+import os
+import time
+
+from ansible import constants as C
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    ProxmoxOpenSSHAnsible, ProxmoxOpenSSHCache)
+
+RESOURCES = ('users', 'groups', 'tokens', 'acls')
+
+# pmxcfs file all the resources are read from
+ACCESS_FILES = ('/etc/pve/user.cfg',)
+
+
+class _LookupModule(object):
+    """Stands in for AnsibleModule so the module_utils classes can be used on the controller"""
+
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+
+    def fail_json(self, msg, **kwargs):
+        raise AnsibleError(msg)
+
+
+class ProxmoxOpenSSHAccessLookup(ProxmoxOpenSSHAnsible):
+
+    def read(self, resource):
+        """
+        Read an access resource
+
+        :param resource: str - one of users, groups, tokens or acls
+        :return: list - dicts describing the resource
+        """
+        if resource == 'users':
+            return self.get_users()
+        if resource == 'groups':
+            return self.get_groups()
+        if resource == 'acls':
+            return list(self.iter_acls())
+
+        tokens = []
+        for user in self.iter_users(full=1):
+            for token in user.get('tokens') or []:
+                token = dict(token, userid=user['userid'])
+                token['full_tokenid'] = '{0}!{1}'.format(user['userid'], token['tokenid'])
+                tokens.append(token)
+        return tokens
+
+
+# Results fetched by this worker process, the file cache shares them with the other forks
+_MEMO = {}
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        params = dict(
+            api_host=self.get_option('host'),
+            api_user=self.get_option('user'),
+            api_port=self.get_option('port'),
+            api_sudo=self.get_option('sudo'),
+            api_backend=self.get_option('backend'),
+        )
+        cache = ProxmoxOpenSSHCache(os.path.join(C.DEFAULT_LOCAL_TMP, 'proxmox_access'), ttl=self.get_option('ttl'))
+
+        proxmox = None
+        versions = None
+        ret = []
+        for term in terms:
+            if term not in RESOURCES:
+                raise AnsibleError("Unknown proxmox_access resource '{0}', expected one of {1}".format(term, ', '.join(RESOURCES)))
+
+            key = cache.key(params, term)
+            fetched, result = _MEMO.get(key, (0, None))
+            if result is None or time.time() - fetched > cache.ttl:
+                result = cache.get(key)
+                if result is None:
+                    if proxmox is None:
+                        proxmox = ProxmoxOpenSSHAccessLookup(_LookupModule(params))
+                        versions = proxmox.probe_versions(ACCESS_FILES)
+                    # An expired result is kept while user.cfg is unchanged
+                    result = cache.get(key, versions) if versions else None
+                    if result is None:
+                        result = proxmox.read(term)
+                    cache.set(key, result, versions)
+                _MEMO[key] = (time.time(), result)
+            ret.append(result)
+
+        return ret
@@ -7,51 +7,1309 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import codecs
+import fcntl
+import functools
+import hashlib
+import inspect
+import json
+import os
+import select
+import subprocess
+import tempfile
+import threading
+import time
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import missing_required_lib
+from ansible.module_utils.six import string_types
 from ansible_collections.community.general.plugins.module_utils.proxmox import (ProxmoxAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_cassette import (
+    ProxmoxOpenSSHRecordSession, ProxmoxOpenSSHReplaySession)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_governor import (
+    ProxmoxOpenSSHGovernor, ProxmoxOpenSSHGovernorSession)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_fake import (
+    ProxmoxOpenSSHFakeSession, ProxmoxOpenSSHResponse)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_helper import (
+    ProxmoxOpenSSHHelperSession)
 
 PROXMOXER_IMP_ERR = None
 try:
     from proxmoxer import ProxmoxAPI
+    from proxmoxer.backends.command_base import Response, shell_join
+    from proxmoxer.core import ResourceException
     HAS_PROXMOXER = True
+    # proxmoxer 2.3 added the exit code to what the _exec of its command backends returns
+    EXEC_RETURNS_EXIT_CODE = 'exit_code' in inspect.signature(Response.__init__).parameters
 except ImportError:
     HAS_PROXMOXER = False
     PROXMOXER_IMP_ERR = traceback.format_exc()
 
+PARAMIKO_IMP_ERR = None
+try:
+    import paramiko
+    HAS_PARAMIKO = True
+except ImportError:
+    HAS_PARAMIKO = False
+    PARAMIKO_IMP_ERR = traceback.format_exc()
+
+# pmxcfs files holding the access (users, groups, tokens, ACLs, pools) and storage configuration
+PVE_CONFIG_FILES = ('/etc/pve/user.cfg', '/etc/pve/storage.cfg')
+
+# Version counters pmxcfs keeps for its files, raised by every write to a file
+PMXCFS_VERSION_FILE = '/etc/pve/.version'
+
+# Separates the outputs of several pvesh commands run in one remote call
+OUTPUT_MARKER = '@@proxmox_openssh@@'
+
+# Size of the reads taken from the SSH stdout stream while decoding a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Seconds the pre-flight result of a host is reused, about the length of a play, and a failed one
+PREFLIGHT_TTL = 15 * 60
+PREFLIGHT_FAILURE_TTL = 60
+
+# Option of /access/acl naming the principals of each ACL entry `type`
+ACL_OPTIONS = {'group': 'groups', 'token': 'tokens', 'user': 'users'}
+
+# Seconds an API request may take, the default of proxmoxer
+DEFAULT_API_TIMEOUT = 5
+
 def proxmox_openssh_argument_spec():
 
     return dict(
-        api_host=dict(type='str',
+        api_host=dict(type='raw',
                       required=True
                       ),
         api_user=dict(type='str',
                       required=True
                       ),
-        api_port=dict(type='int',
-                      default=22
-                      ),
+        api_port=dict(type='int'),
         api_sudo=dict(type='bool',
                       default=False
                       ),
+        api_plan=dict(type='path'),
+        api_backend=dict(type='str',
+                         default='openssh',
+                         choices=['openssh', 'paramiko', 'https', 'fake', 'replay']
+                         ),
+        api_token_id=dict(type='str'),
+        api_token_secret=dict(type='str',
+                              no_log=True
+                              ),
+        api_validate_certs=dict(type='bool',
+                                default=False
+                                ),
+        api_helper=dict(type='bool',
+                        default=False
+                        ),
+        api_cassette=dict(type='path'),
+        api_replay_speed=dict(type='float',
+                              default=1.0
+                              ),
+        api_write_concurrency=dict(type='int'),
+        api_write_rate=dict(type='float'),
+        api_timeout=dict(type='int',
+                         default=DEFAULT_API_TIMEOUT
+                         ),
     )
 
+# Port used by each backend when api_port is not set
+DEFAULT_PORTS = {'openssh': 22, 'paramiko': 22, 'https': 8006, 'fake': 22, 'replay': 22}
+
+def api_host_nodes(api_host):
+    """The nodes of api_host, a host or a list of the nodes of one cluster, without duplicates"""
+    nodes = [api_host] if isinstance(api_host, string_types) else list(api_host or [])
+    unique = []
+    for node in nodes:
+        if str(node) not in unique:
+            unique.append(str(node))
+    return unique
+
+def resolve_api_port(params):
+    """The port to connect to, api_port or the default port of the backend"""
+    return params.get('api_port') or DEFAULT_PORTS[params.get('api_backend') or 'openssh']
+
+def default_cache_dir():
+    """Cache directory on the node running the module, normally the control node"""
+    return os.environ.get('PROXMOX_OPENSSH_CACHE_DIR', os.path.join('~', '.ansible', 'proxmox_openssh'))
+
+def fake_state_path(api_host):
+    """State file of the fake backend for a host"""
+    return os.path.join(default_cache_dir(), 'fake', '{0}.json'.format(api_host))
+
+def config_versions(content, files=PVE_CONFIG_FILES):
+    """pmxcfs version of each configuration file, from the content of /etc/pve/.version, None when unknown"""
+    versions = json.loads(content) if content else {}
+    return dict((path, versions.get(path[len('/etc/pve/'):])) for path in files)
+
+def iter_json_array(chunks):
+    """Incrementally decode a JSON document read in chunks
+
+    Elements of a top level JSON array are yielded as soon as they are complete,
+    so the caller can stop reading at any point. Any other document is yielded
+    once, after the stream ends.
+
+    :param chunks: iterable of str - pieces of the JSON document
+    :return: generator - decoded array elements
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    in_array = None
+    for chunk in chunks:
+        buf += chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if in_array is None:
+                in_array = buf[pos] == '['
+                if not in_array:
+                    break
+                pos += 1
+                continue
+            if not in_array:
+                break
+            if buf[pos] == ',':
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # Element is incomplete, wait for the next chunk
+                break
+            if end == len(buf) and not isinstance(item, (dict, list)):
+                # A scalar at the end of the buffer may continue in the next chunk
+                break
+            yield item
+            pos = end
+        buf = buf[pos:]
+
+    if in_array:
+        raise ValueError('Truncated JSON array in response')
+    if buf.strip():
+        yield json.loads(buf)
+
+def _iter_text(read, size=STREAM_CHUNK_SIZE):
+    """Read a binary stream as it fills, yielding UTF-8 decoded text
+
+    :param read: callable - returns up to the given number of bytes as soon as some are available, b'' at the end
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    for data in iter(lambda: read(size), b''):
+        text = utf8.decode(data)
+        if text:
+            yield text
+    text = utf8.decode(b'', final=True)
+    if text:
+        yield text
+
+def _exec_result(stdout, stderr, returncode):
+    if EXEC_RETURNS_EXIT_CODE:
+        return stdout, stderr, returncode
+    return stdout, stderr
+
+def _openssh_exec(session, cmd):
+    """Run a command like OpenSSHSession._exec does
+
+    openssh_wrapper enforces its timeout with a process wide SIGALRM, which
+    breaks when several hosts are worked on from threads. The same timeout is
+    applied to the ssh process itself instead.
+    """
+    proc = subprocess.Popen(session.ssh_client.ssh_command('/bin/bash', False),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, env=session.ssh_client.get_env())
+    try:
+        stdout, stderr = proc.communicate(shell_join(cmd).encode('utf-8'), timeout=session.timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise IOError('SSH command timed out after {0} seconds'.format(session.timeout))
+    if proc.returncode == 255:
+        raise IOError(stderr.decode('utf-8', 'replace').strip())
+    return _exec_result(stdout.strip(), stderr.strip(), proc.returncode)
+
+class _OpenSSHStream(object):
+    """A remote command whose stdout is read while it runs, over a new ssh process
+
+    An interactive command keeps its stdin open for send().
+    """
+
+    def __init__(self, session, cmd, interactive=False):
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(session.ssh_client.ssh_command('/bin/bash', False),
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=self.stderr, env=session.ssh_client.get_env())
+        if interactive:
+            # bash reads its script from stdin unbuffered, what follows the line goes to the command
+            self.send('exec {0}\n'.format(shell_join(cmd)).encode('utf-8'))
+        else:
+            self.proc.stdin.write(shell_join(cmd).encode('utf-8'))
+            self.proc.stdin.close()
+
+    def send(self, data):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def read(self, size, timeout=None):
+        if timeout is not None and not select.select([self.proc.stdout], [], [], timeout)[0]:
+            raise IOError('No output from the remote command after {0} seconds'.format(timeout))
+        return os.read(self.proc.stdout.fileno(), size)
+
+    def wait(self):
+        """
+        Wait for the command to end
+
+        :return: tuple - the exit status and stderr as str
+        """
+        if not self.proc.stdin.closed:
+            self.proc.stdin.close()
+        returncode = self.proc.wait()
+        self.stderr.seek(0)
+        return returncode, self.stderr.read().decode('utf-8', 'replace').strip()
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        if not self.proc.stdin.closed:
+            self.proc.stdin.close()
+        self.proc.stdout.close()
+        self.stderr.close()
+
+# Guards the connections shared by everything running in the process
+_CONNECTIONS_LOCK = threading.Lock()
+
+# Keep-alive HTTPS sessions per host, port and token
+_HTTPS_SESSIONS = {}
+
+def _https_session(key, session):
+    """
+    Get the HTTPS session already used for a key, or keep this one for it
+
+    :return: tuple - the session to use and if it is a new one
+    """
+    with _CONNECTIONS_LOCK:
+        shared = _HTTPS_SESSIONS.setdefault(key, session)
+    return shared, shared is session
+
+# Authenticated paramiko clients per host, port and user
+_PARAMIKO_CLIENTS = {}
+_PARAMIKO_LOCKS = {}
+
+def _paramiko_client(host, port, user, timeout):
+    """
+    Get the authenticated paramiko client for a host, connecting when there is none yet
+
+    Host keys are checked against the known_hosts files of OpenSSH and the
+    HostName and IdentityFile of ~/.ssh/config are used, so the same hosts and
+    keys as with the openssh backend are accepted.
+
+    :return: tuple - the client and if a new connection was made
+    """
+    key = (host, port, user)
+    with _CONNECTIONS_LOCK:
+        lock = _PARAMIKO_LOCKS.setdefault(key, threading.Lock())
+    # Only connections to the same host wait for each other
+    with lock:
+        client = _PARAMIKO_CLIENTS.get(key)
+        if client is not None and client.get_transport() is not None and client.get_transport().is_active():
+            return client, False
+
+        ssh_config = {}
+        config_path = os.path.expanduser(os.path.join('~', '.ssh', 'config'))
+        if os.path.exists(config_path):
+            config = paramiko.SSHConfig()
+            with open(config_path) as f:
+                config.parse(f)
+            ssh_config = config.lookup(host)
+
+        client = paramiko.SSHClient()
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        client.connect(ssh_config.get('hostname', host), port=port, username=user,
+                       key_filename=ssh_config.get('identityfile'), timeout=timeout)
+        _PARAMIKO_CLIENTS[key] = client
+        return client, True
+
+def _paramiko_exec(session, client, cmd):
+    """Run a command on a new channel of an authenticated paramiko client"""
+    channel = client.get_transport().open_session(timeout=session.timeout)
+    try:
+        channel.settimeout(session.timeout)
+        channel.exec_command(shell_join(cmd))
+        # pvesh writes little to stderr, it is read once stdout is complete
+        stdout = channel.makefile('rb', -1).read()
+        stderr = channel.makefile_stderr('rb', -1).read()
+        returncode = channel.recv_exit_status()
+    except IOError as e:
+        raise IOError('SSH command failed after {0} seconds without output: {1}'.format(session.timeout, e))
+    finally:
+        channel.close()
+    return _exec_result(stdout.strip(), stderr.strip(), returncode)
+
+class _ParamikoStream(object):
+    """A remote command whose stdout is read while it runs, over a new channel of a paramiko client"""
+
+    def __init__(self, session, client, cmd, interactive=False):
+        self.channel = client.get_transport().open_session(timeout=session.timeout)
+        self.channel.exec_command(shell_join(cmd))
+
+    def send(self, data):
+        self.channel.sendall(data)
+
+    def read(self, size, timeout=None):
+        self.channel.settimeout(timeout)
+        return self.channel.recv(size)
+
+    def wait(self):
+        self.channel.settimeout(None)
+        returncode = self.channel.recv_exit_status()
+        return returncode, self.channel.makefile_stderr('rb', -1).read().decode('utf-8', 'replace').strip()
+
+    def close(self):
+        # Closing the channel ends a command that is still running
+        self.channel.close()
+
+class ProxmoxOpenSSHUnsupportedError(Exception):
+    """Raised when the backend of the connection can't do what was asked, like running a remote command"""
+
+class ProxmoxOpenSSHHostExit(Exception):
+    """Raised instead of exiting by exit_json and fail_json of a ProxmoxOpenSSHHostModule"""
+
+    def __init__(self, result):
+        super(ProxmoxOpenSSHHostExit, self).__init__(result.get('msg', ''))
+        self.result = result
+
+class ProxmoxOpenSSHHostModule(object):
+    """Presents a module to a ProxmoxOpenSSHAnsible class with the connection parameters of another host
+
+    Used to work on several hosts from one module run. exit_json and fail_json
+    raise ProxmoxOpenSSHHostExit instead of ending the module, so one host
+    failing does not stop the others.
+    """
+
+    def __init__(self, module, **params):
+        self.params = dict(module.params, **params)
+        self.check_mode = module.check_mode
+        self.warn = module.warn
+
+    def exit_json(self, **kwargs):
+        kwargs.setdefault('failed', False)
+        raise ProxmoxOpenSSHHostExit(kwargs)
+
+    def fail_json(self, msg, **kwargs):
+        raise ProxmoxOpenSSHHostExit(dict(kwargs, failed=True, msg=msg))
+
+def run_on_hosts(module, hosts, work, workers=4):
+    """
+    Run the same work against several hosts concurrently
+
+    :param module: AnsibleModule - the module
+    :param hosts: list - API hosts, one per cluster
+    :param work: callable - takes a ProxmoxOpenSSHHostModule and ends with its exit_json or fail_json
+    :param workers: int - maximum number of hosts worked on at the same time
+    :return: list - the result of each host in the order of hosts, with `api_host` added
+    """
+    def run(host):
+        try:
+            work(ProxmoxOpenSSHHostModule(module, api_host=host))
+            result = {'failed': True, 'msg': 'No result for {0}'.format(host)}
+        except ProxmoxOpenSSHHostExit as e:
+            result = e.result
+        except Exception as e:
+            result = {'failed': True, 'msg': '%s' % e, 'exception': traceback.format_exc()}
+        result['api_host'] = host
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        return list(executor.map(run, hosts))
+    finally:
+        executor.shutdown()
+
+class ProxmoxOpenSSHCache(object):
+    """Small JSON file cache kept on the controller
+
+    Entries are stored one file per key below `cache_dir` and are ignored once
+    they are older than `ttl` seconds. Files are replaced atomically so
+    concurrent Ansible forks can share the same directory.
+
+    An entry may be stored with the pmxcfs versions of the files its value was
+    read from, see ProxmoxOpenSSHAnsible.probe_versions. Given the current
+    versions, such an entry stays valid whatever its age until a file changes.
+    """
+
+    def __init__(self, cache_dir, ttl=60):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(*parts):
+        """Build a file name safe key from any number of values"""
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key, versions=None):
+        """
+        Get a cached value
+
+        :param key: str - cache key
+        :param versions: dict - current versions from a change probe, to revalidate an expired entry
+        :return: the cached value or None when missing, expired or changed
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if versions is not None:
+                return entry['value'] if entry['versions'] == versions else None
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            return entry['value']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set(self, key, value, versions=None):
+        """
+        Store a value, failures to write the cache are not fatal
+
+        :param key: str - cache key
+        :param value: any JSON serializable value
+        :param versions: dict - versions of the files the value was read from
+        :return: None
+        """
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o700)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'versions': versions, 'value': value}, f)
+            os.rename(tmp_path, self._path(key))
+        except (IOError, OSError):
+            pass
+
+class ProxmoxOpenSSHMetricsSession(object):
+    """Wraps a proxmoxer session and records every API call made through it
+
+    The recorded calls are returned by the modules as `proxmox_metrics` and
+    aggregated across a playbook by the `proxmox_profile` callback plugin.
+    """
+
+    def __init__(self, session, backend, base_url=''):
+        self.session = session
+        self.backend = backend
+        self.base_url = base_url
+        self.connections = 0
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def record(self, method, url, params, status_code, elapsed, connection=None):
+        """
+        Record one API call
+
+        :param method: str - HTTP method of the call
+        :param url: str - API path
+        :param params: dict - query parameters, only kept for reads
+        :param status_code: int - the response status
+        :param elapsed: float - seconds spent on the call
+        :param connection: bool - if the call made a new connection, by default unless the session keeps one
+        :return: None
+        """
+        # Every call starts a new ssh process, unless the backend keeps its connection
+        if connection is None:
+            connection = not getattr(self.session, 'persistent', False)
+        if connection:
+            self.connections += 1
+        if self.base_url and url.startswith(self.base_url):
+            url = url[len(self.base_url):]
+        self.calls.append({
+            'method': method.upper(),
+            'path': url,
+            'params': dict(params or {}) if method.upper() == 'GET' else {},
+            'status': status_code,
+            'elapsed': round(elapsed, 4),
+        })
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        start = time.time()
+        status_code = 599
+        try:
+            response = self.session.request(method, url, data=data, params=params, headers=headers)
+            status_code = response.status_code
+            return response
+        finally:
+            self.record(method, url, params, status_code, time.time() - start)
+
+    def metrics(self):
+        """
+        Summarize the recorded calls
+
+        :return: dict - backend, connection count, total API time and the calls
+        """
+        return {
+            'backend': self.backend,
+            'connections': self.connections,
+            'elapsed': round(sum(call['elapsed'] for call in self.calls), 4),
+            'calls': self.calls,
+        }
+
+class _PrefetchedStream(object):
+    """A remote command stream whose first output was already read"""
+
+    def __init__(self, stream, data, result=None):
+        self.stream = stream
+        self.data = data
+        self.result = result
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def read(self, size, timeout=None):
+        if self.data:
+            data, self.data = self.data[:size], self.data[size:]
+            return data
+        if self.result is not None:
+            return b''
+        return self.stream.read(size, timeout=timeout)
+
+    def wait(self):
+        if self.result is None:
+            self.result = self.stream.wait()
+        return self.result
+
+class ProxmoxOpenSSHRouterSession(object):
+    """Sends the API calls for one cluster to several of its nodes
+
+    Reads, including the streamed reads of iter_get and the remote commands
+    run with remote_exec(read=True), go to the healthy node with the lowest
+    latency. Writes and the other remote commands go to the primary, the
+    first healthy node in the order of api_host, so the writes of a run keep
+    their order on one node. A node failing to connect is left out for the
+    rest of the run and the call is sent to the next node.
+
+    Nodes are dicts with the `host`, its probed `latency`, None when it did not
+    answer, and `connect`, which returns the ProxmoxAPI and session of the
+    node and is only called once the node is used.
+    """
+
+    def __init__(self, nodes, base_url=''):
+        self.nodes = nodes
+        # Base URL of the calls, the one of the primary
+        self.base_url = base_url
+        self.down = set(node['host'] for node in nodes if node['latency'] is None)
+
+    def healthy(self):
+        """:return: list - the nodes that are not down, in the order of api_host"""
+        return [node for node in self.nodes if node['host'] not in self.down]
+
+    @property
+    def primary(self):
+        return (self.healthy() or self.nodes)[0]
+
+    def _session(self, node):
+        if 'session' not in node:
+            proxmox_api, node['session'] = node['connect']()[:2]
+            node['base_url'] = proxmox_api._store['base_url']
+        return node['session']
+
+    def __getattr__(self, name):
+        attr = getattr(self._session(self.primary), name)
+        # Only offered when the backend of the nodes has them
+        if name == '_exec':
+            return self.exec_command
+        if name == 'stream_command':
+            return self.start_stream
+        return attr
+
+    def _failover(self, description, read, call):
+        """
+        Make a call on the first node that answers
+
+        :param description: str - what is called, for the error
+        :param read: bool - try the nodes by latency instead of in the order of api_host
+        :param call: callable - takes the node and its session
+        :return: the result of the call
+        """
+        nodes = self.healthy()
+        if read:
+            nodes.sort(key=lambda node: node['latency'])
+        errors = []
+        for node in nodes:
+            try:
+                session = self._session(node)
+            except Exception as e:
+                self.down.add(node['host'])
+                errors.append('{0}: {1}'.format(node['host'], e))
+                continue
+            try:
+                return call(node, session)
+            except (IOError, OSError) as e:
+                self.down.add(node['host'])
+                errors.append('{0}: {1}'.format(node['host'], e))
+        raise IOError("No node answered {0}: {1}".format(description, '; '.join(errors) or 'all nodes are down'))
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        path = url[len(self.base_url):] if self.base_url and url.startswith(self.base_url) else url
+        return self._failover('{0} {1}'.format(method.upper(), path), method.upper() == 'GET',
+                              lambda node, session: session.request(method, node['base_url'] + path,
+                                                                    data=data, params=params, headers=headers))
+
+    def exec_command(self, cmd, read=False):
+        """Run a remote command on the primary, or on the fastest node for a read"""
+        return self._failover(shell_join(cmd), read, lambda node, session: session._exec(cmd))
+
+    def start_stream(self, cmd, interactive=False):
+        """
+        Start a streamed read on the fastest node
+
+        The first output is read before the stream is returned, so a node that
+        can't be reached is found, ssh exits with 255, while the next node can
+        still be tried.
+        """
+        def start(node, session):
+            stream = session.stream_command(cmd, interactive=interactive)
+            if interactive:
+                return stream
+            try:
+                data = stream.read(STREAM_CHUNK_SIZE)
+                result = None if data else stream.wait()
+            except Exception:
+                stream.close()
+                raise
+            if result is not None and result[0] == 255:
+                stream.close()
+                raise IOError(result[1] or 'SSH connection failed')
+            return _PrefetchedStream(stream, data, result)
+        return self._failover(shell_join(cmd), True, start)
+
+class ProxmoxOpenSSHPlanSession(object):
+    """Wraps a proxmoxer session so writes are recorded in a plan instead of being sent
+
+    Reads are passed through. The sha1 digests of the pmxcfs configuration files
+    are read by the caller before any other read, including the streamed reads
+    and remote commands that do not go through this session, so the plan can be
+    applied later only when the state it was computed from is unchanged. The
+    `digest` of an object read from the API is not added to the writes: it
+    covers the whole configuration file, so it goes stale after the first write
+    to that file, and the file digests are already checked before applying.
+    """
+
+    def __init__(self, session, host, digests):
+        self.session = session
+        self.host = host
+        self.digests = digests
+        self.writes = []
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        method = method.upper()
+        if method == 'GET':
+            return self.session.request(method, url, data=data, params=params, headers=headers)
+
+        self.writes.append({
+            'host': self.host,
+            'method': method,
+            'path': url,
+            'data': dict(data or {}),
+            'params': dict(params or {}),
+        })
+
+        # The secret of a planned token only exists once the plan is applied
+        if method == 'POST' and '/token/' in url:
+            return ProxmoxOpenSSHResponse(json.dumps({'full-tokenid': None, 'info': {}, 'value': None}), 200)
+        return ProxmoxOpenSSHResponse('null', 200)
+
+    def save(self, plan_path):
+        """
+        Append the recorded writes to a plan file shared by all tasks of the plan
+
+        :param plan_path: str - path of the JSON plan file
+        :return: None
+        """
+        if not self.writes:
+            return
+
+        fd = os.open(plan_path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            content = f.read()
+            plan = json.loads(content) if content.strip() else {'version': 1, 'hosts': {}, 'writes': []}
+            host = plan['hosts'].setdefault(self.host, {'digests': self.digests})
+            if host['digests'] != self.digests:
+                raise ValueError("Configuration of {0} changed while the plan {1} was computed".format(self.host, plan_path))
+            plan['writes'].extend(self.writes)
+            f.seek(0)
+            f.truncate()
+            json.dump(plan, f, indent=2, sort_keys=True)
+
 # Extending the ProxmoxAnsible class and override _connect so that proxmoxer uses openssh backend
 # instead of the default, https backend
 class ProxmoxOpenSSHAnsible(ProxmoxAnsible):
 
+    def __init__(self, module):
+        self.api_session = None
+        self.governor_session = None
+        self.plan_session = None
+        # Every result, including failures, reports the API calls the module made.
+        # Controller side stand-ins for a module, without exit_json, are left alone.
+        if hasattr(module, 'exit_json') and not getattr(module, '_proxmox_metrics', False):
+            module._proxmox_metrics = True
+            module.exit_json = self._with_results(module.exit_json, True)
+            module.fail_json = self._with_results(module.fail_json, False)
+
+        if not HAS_PROXMOXER:
+            module.fail_json(msg=missing_required_lib('proxmoxer'), exception=PROXMOXER_IMP_ERR)
+
+        self.module = module
+        self.proxmox_api = self._connect()
+        # The pve-manager version is kept for the API schema cache
+        self.pve_version, self.privileges = self.preflight()
+
+    def _with_results(self, exit_method, success):
+        def wrapper(**kwargs):
+            if self.api_session is not None:
+                metrics = dict(self.api_session.metrics(), host=self.module.params['api_host'])
+                if self.governor_session is not None:
+                    metrics['write_wait'] = round(self.governor_session.wait, 4)
+                    metrics['governed_writes'] = self.governor_session.writes
+                kwargs.setdefault('proxmox_metrics', metrics)
+            if self.plan_session is not None:
+                kwargs.setdefault('planned_writes', self.plan_session.writes)
+                if success:
+                    try:
+                        self.plan_session.save(self.module.params['api_plan'])
+                    except Exception as e:
+                        return self.module.fail_json(msg="Unable to save plan: {0}".format(e))
+            return exit_method(**kwargs)
+        return wrapper
+
     def _connect(self):
-        api_host = self.module.params['api_host']
+        api_nodes = api_host_nodes(self.module.params['api_host'])
+        api_backend = self.module.params.get('api_backend') or 'openssh'
+        if not api_nodes:
+            self.module.fail_json(msg="api_host requires at least one host")
+
+        if api_backend == 'https':
+            if not (self.module.params.get('api_token_id') and self.module.params.get('api_token_secret')):
+                self.module.fail_json(msg="api_backend https requires api_token_id and api_token_secret")
+            if '!' not in self.module.params['api_token_id']:
+                self.module.fail_json(msg="api_token_id '{0}' is not in the user@realm!token format".format(self.module.params['api_token_id']))
+            if self.module.params.get('api_plan'):
+                self.module.fail_json(msg="api_plan requires an SSH backend to read the configuration digests")
+        if api_backend == 'replay' and not self.module.params.get('api_cassette'):
+            self.module.fail_json(msg="api_backend replay requires api_cassette")
+        write_concurrency = self.module.params.get('api_write_concurrency')
+        write_rate = self.module.params.get('api_write_rate')
+        if write_concurrency is not None and write_concurrency < 1:
+            self.module.fail_json(msg="api_write_concurrency must be at least 1")
+        if write_rate is not None and write_rate <= 0:
+            self.module.fail_json(msg="api_write_rate must be greater than 0")
+
+        try:
+            if len(api_nodes) == 1:
+                proxmox_api, session, connected = self._connect_node(api_nodes[0], api_nodes[0])
+            else:
+                proxmox_api, session = self._connect_cluster(api_nodes)
+                connected = False
+                # The rest of the module talks to the node receiving the writes
+                self.module.params['api_host'] = session.primary['host']
+            api_host = self.module.params['api_host']
+            self.api_session = ProxmoxOpenSSHMetricsSession(session, api_backend, base_url=proxmox_api._store['base_url'])
+            if getattr(session, 'persistent', False):
+                self.api_session.connections += int(connected)
+            proxmox_api._store['session'] = self.api_session
+            if write_concurrency or write_rate:
+                # Keyed by the first node of api_host, the forks working on a cluster share its limits
+                governor = ProxmoxOpenSSHGovernor(os.path.join(default_cache_dir(), 'governor'),
+                                                  ProxmoxOpenSSHCache.key(api_nodes[0]), write_concurrency, write_rate)
+                self.governor_session = ProxmoxOpenSSHGovernorSession(self.api_session, governor)
+                proxmox_api._store['session'] = self.governor_session
+            if self.module.params.get('api_plan'):
+                # Taken before anything is read, so a change made while the plan is computed is detected on apply
+                self.plan_session = ProxmoxOpenSSHPlanSession(proxmox_api._store['session'], api_host, self.config_digests())
+                proxmox_api._store['session'] = self.plan_session
+            return proxmox_api
+        except Exception as e:
+            self.module.fail_json(msg='%s' % e, exception=traceback.format_exc())
+
+    def _connect_node(self, api_host, cluster):
+        """
+        Connect the backend to one node
+
+        :param api_host: str - the node
+        :param cluster: str - the first node of api_host, the fake backend keeps one state for all nodes
+        :return: tuple - the ProxmoxAPI, its session and if a new connection was made
+        """
         api_user = self.module.params['api_user']
-        api_port = self.module.params['api_port']
+        api_port = resolve_api_port(self.module.params)
         api_sudo = self.module.params['api_sudo']
+        api_backend = self.module.params.get('api_backend') or 'openssh'
+        api_timeout = self.module.params.get('api_timeout') or DEFAULT_API_TIMEOUT
+
+        auth_args = {'user': api_user, 'port': api_port, 'sudo': api_sudo, 'timeout': api_timeout, 'backend': 'openssh'}
+
+        connected = False
+        if api_backend == 'https':
+            token_user, token_name = self.module.params['api_token_id'].split('!', 1)
+            validate_certs = self.module.params.get('api_validate_certs', False)
+            auth_args = {'user': token_user, 'token_name': token_name, 'token_value': self.module.params['api_token_secret'],
+                         'port': api_port, 'verify_ssl': validate_certs, 'timeout': api_timeout, 'backend': 'https'}
+            proxmox_api = ProxmoxAPI(api_host, **auth_args)
+            # Every call of the run goes over the same pooled keep-alive connections
+            key = (api_host, api_port, self.module.params['api_token_id'], validate_certs, api_timeout)
+            session, connected = _https_session(key, proxmox_api._store['session'])
+            proxmox_api._store['session'] = session
+            session.persistent = True
+        elif api_backend == 'fake':
+            # pvesh is never run, the local backend only provides the resource tree
+            auth_args = {'backend': 'fake'}
+            proxmox_api = ProxmoxAPI(backend='local')
+            proxmox_api._store['session'] = ProxmoxOpenSSHFakeSession(fake_state_path(cluster), node=api_host)
+        elif api_backend == 'replay':
+            # The local backend only provides the resource tree, the answers come from the cassette
+            auth_args = {'backend': 'replay'}
+            proxmox_api = ProxmoxAPI(backend='local')
+            proxmox_api._store['session'] = ProxmoxOpenSSHReplaySession(self.module.params['api_cassette'], api_host,
+                                                                        speed=self.module.params.get('api_replay_speed', 1.0),
+                                                                        sudo=api_sudo)
+        elif api_backend == 'paramiko':
+            if not HAS_PARAMIKO:
+                self.module.fail_json(msg=missing_required_lib('paramiko'), exception=PARAMIKO_IMP_ERR)
+            # The pvesh commands built by the local backend run on channels of one shared client
+            auth_args['backend'] = 'paramiko'
+            proxmox_api = ProxmoxAPI(backend='local', sudo=api_sudo, timeout=api_timeout)
+            session = proxmox_api._store['session']
+            client, connected = _paramiko_client(api_host, api_port, api_user, session.timeout)
+            session._exec = functools.partial(_paramiko_exec, session, client)
+            session.stream_command = functools.partial(_ParamikoStream, session, client)
+            session.persistent = True
+        else:
+            proxmox_api = ProxmoxAPI(api_host, **auth_args)
+            session = proxmox_api._store['session']
+            session._exec = functools.partial(_openssh_exec, session)
+            session.stream_command = functools.partial(_OpenSSHStream, session)
+        if self.module.params.get('api_helper') and auth_args['backend'] in ('openssh', 'paramiko'):
+            try:
+                proxmox_api._store['session'] = ProxmoxOpenSSHHelperSession(session, timeout=api_timeout, warn=self.module.warn)
+                # The requests of the module share the ssh process of the helper
+                connected = connected or auth_args['backend'] == 'openssh'
+            except Exception as e:
+                self.module.warn("Unable to start the API helper on {0}, using pvesh: {1}".format(api_host, e))
+        if self.module.params.get('api_cassette') and api_backend != 'replay':
+            proxmox_api._store['session'] = ProxmoxOpenSSHRecordSession(proxmox_api._store['session'], self.module.params['api_cassette'],
+                                                                        api_host, api_backend, base_url=proxmox_api._store['base_url'])
+        return proxmox_api, proxmox_api._store['session'], connected
+
+    def _connect_cluster(self, api_nodes):
+        """
+        Route the calls over several nodes of one cluster
+
+        Each node is probed with a `/version` request and the latencies are
+        cached on the controller for PREFLIGHT_TTL seconds, so the nodes are
+        probed once for the play. Later runs only connect to the nodes they
+        use. When a node did not answer the probe is only reused for
+        PREFLIGHT_FAILURE_TTL seconds, and not at all when none answered.
+
+        :param api_nodes: list - the nodes of api_host
+        :return: tuple - the ProxmoxAPI of the primary node and the ProxmoxOpenSSHRouterSession
+        """
+        params = self.module.params
+        cache = ProxmoxOpenSSHCache(os.path.join(default_cache_dir(), 'routes'), ttl=PREFLIGHT_TTL)
+        degraded = ProxmoxOpenSSHCache(os.path.join(default_cache_dir(), 'routes'), ttl=PREFLIGHT_FAILURE_TTL)
+        key = cache.key(api_nodes, params['api_user'], resolve_api_port(params), params.get('api_backend'))
+        connections = {}
+
+        def connect(host):
+            if host not in connections:
+                connections[host] = self._connect_node(host, api_nodes[0])
+            return connections[host]
+
+        def probe(host):
+            try:
+                proxmox_api, session = connect(host)[:2]
+                start = time.time()
+                response = session.request('GET', proxmox_api._store['base_url'] + '/version')
+                if response.status_code != 200:
+                    return None
+                return time.time() - start
+            except Exception:
+                return None
+
+        # A recorded or replayed run probes the nodes, so the probes are in the cassette
+        latencies = None if params.get('api_cassette') else cache.get(key) or degraded.get(degraded.key('degraded', key))
+        if latencies is None:
+            executor = ThreadPoolExecutor(max_workers=len(api_nodes))
+            try:
+                latencies = dict(zip(api_nodes, executor.map(probe, api_nodes)))
+            finally:
+                executor.shutdown()
+            # A node that was down may be back soon, and a cluster that did not answer is probed again
+            if None not in latencies.values():
+                cache.set(key, latencies)
+            elif set(latencies.values()) != set([None]):
+                degraded.set(degraded.key('degraded', key), latencies)
+
+        nodes = [{'host': host, 'latency': latencies.get(host), 'connect': functools.partial(connect, host)}
+                 for host in api_nodes]
+        router = ProxmoxOpenSSHRouterSession(nodes)
+        if not router.healthy():
+            raise IOError("None of the nodes {0} answered".format(', '.join(api_nodes)))
+        proxmox_api = connect(router.primary['host'])[0]
+        router.base_url = proxmox_api._store['base_url']
+        return proxmox_api, router
+
+    def preflight(self):
+        """
+        Check the host once and reuse the result for the following tasks
+
+        With the SSH backends one remote call checks that the host is reachable,
+        that `api_sudo` works without a password, that the commands run as root
+        as pvesh requires, and reads the pve-manager version. The https backend
+        reads the version and the privileges of the API token on `/`. A result
+        is cached on the controller per host, user, port and backend for
+        PREFLIGHT_TTL seconds, a failure for PREFLIGHT_FAILURE_TTL seconds so
+        the other tasks on a bad host fail at once.
+
+        :return: tuple - the /version response, the privileges on `/` or None when they are all granted
+        """
+        params = self.module.params
+        backend = self.api_session.backend
+        cache_dir = os.path.join(default_cache_dir(), 'preflight')
+        passed = ProxmoxOpenSSHCache(cache_dir, ttl=PREFLIGHT_TTL)
+        failed = ProxmoxOpenSSHCache(cache_dir, ttl=PREFLIGHT_FAILURE_TTL)
+        key = passed.key(params['api_host'], params['api_user'], resolve_api_port(params), bool(params.get('api_sudo')), backend,
+                         params.get('api_token_id'))
+
+        if params.get('api_cassette'):
+            # A recorded or replayed run always checks, so the check is in the cassette
+            result = self._preflight_checks()
+            return result['version'], result['privileges']
+
+        error = failed.get(failed.key('failed', key))
+        if error is not None:
+            self.module.fail_json(msg="Pre-flight check of {0} failed less than {1} seconds ago: {2}".format(
+                params['api_host'], PREFLIGHT_FAILURE_TTL, error))
+        result = passed.get(key)
+        if result is None:
+            try:
+                result = self._preflight_checks()
+            except Exception as e:
+                failed.set(failed.key('failed', key), str(e))
+                self.module.fail_json(msg="Pre-flight check of {0} failed: {1}".format(params['api_host'], e),
+                                      exception=traceback.format_exc())
+            passed.set(key, result)
+        return result['version'], result['privileges']
+
+    def _preflight_checks(self):
+        if not self.has_remote_exec:
+            privileges = None
+            if self.api_session.backend == 'https':
+                privileges = sorted(self.proxmox_api.access.permissions.get(path='/').get('/', {}))
+            return {'version': self.proxmox_api.version.get(), 'privileges': privileges}
+
+        script = 'echo {0} uid $(id -u); pvesh get /version --output-format json; rc=$?; echo; echo {0} version $rc'.format(OUTPUT_MARKER)
+        stdout, stderr = self.remote_exec(['sh', '-c', script])
+        uid = None
+        output = []
+        for line in stdout.splitlines():
+            if not line.startswith(OUTPUT_MARKER):
+                output.append(line)
+            elif line.split()[1] == 'uid':
+                uid = line.split()[-1]
+                output = []
+            elif uid != '0':
+                break
+            elif line.split()[-1] != '0':
+                raise IOError('pvesh get /version failed: {0}'.format(stderr.strip()))
+            else:
+                return {'version': json.loads('\n'.join(output)), 'privileges': None}
+        if 'sudo' in stderr:
+            raise IOError('api_sudo is set but sudo failed, it must run without a password: {0}'.format(stderr.strip()))
+        if uid is None:
+            raise IOError('unable to run a command: {0}'.format(stderr.strip()))
+        if uid != '0':
+            raise IOError('pvesh needs root, connect as root or set api_sudo for {0}'.format(self.module.params['api_user']))
+        raise IOError('incomplete output: {0}'.format(stderr.strip()))
+
+    @property
+    def has_remote_exec(self):
+        """If the backend runs commands on the API host, see remote_exec"""
+        return hasattr(self.api_session.session, '_exec')
+
+    @property
+    def has_config_files(self):
+        """If the backend reads and writes pmxcfs files, with remote commands or on its own"""
+        return self.has_remote_exec or hasattr(self.api_session.session, 'read_config_files')
+
+    def remote_exec(self, cmd, read=False):
+        """
+        Run a command on the API host over the SSH connection of the backend
 
-        auth_args = {'user': api_user, 'port': api_port, 'sudo': api_sudo, 'backend': 'openssh'}
+        :param cmd: list - the command and its arguments
+        :param read: bool - the command only reads, with several nodes in api_host it goes to the fastest one
+        :return: tuple - stdout and stderr as str
+        :raises ProxmoxOpenSSHUnsupportedError: when the backend doesn't run remote commands, see has_remote_exec
+        """
+        if not self.has_remote_exec:
+            raise ProxmoxOpenSSHUnsupportedError('The {0} backend does not run remote commands'.format(self.api_session.backend))
+        if self.module.params.get('api_sudo'):
+            cmd = ['sudo'] + list(cmd)
+        start = time.time()
+        if read and isinstance(self.api_session.session, ProxmoxOpenSSHRouterSession):
+            stdout, stderr = self.api_session.session.exec_command(cmd, read=True)[:2]
+        else:
+            stdout, stderr = self.api_session._exec(cmd)[:2]
+        self.api_session.record('SSH', shell_join(cmd), None, 500 if stderr else 200, time.time() - start,
+                                connection=self.api_session.backend == 'openssh')
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode('utf-8', 'replace')
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', 'replace')
+        return stdout, stderr
+
+    def get_many(self, paths):
+        """
+        Read several API paths with a single remote call
+
+        The pvesh commands run one after the other in one SSH session, so a full
+        snapshot costs one connection. Backends that can't run remote commands,
+        and the API helper, read the paths one by one.
+
+        :param paths: list - API paths, or tuples of an API path and a dict of query parameters
+        :return: list - the decoded response of each path, in order
+        """
+        requests = [(path, {}) if isinstance(path, str) else path for path in paths]
+        if not self.has_remote_exec or getattr(self.api_session.session, 'resident', False):
+            return [self.proxmox_api(path.strip('/')).get(**params) for path, params in requests]
+
+        script = []
+        for path, params in requests:
+            cmd = ['pvesh', 'get', '/' + path.strip('/')]
+            for key, value in sorted(params.items()):
+                cmd += ['-{0}'.format(key), str(value)]
+            script.append('{0} --output-format json; rc=$?; echo; echo {1} $rc'.format(shell_join(cmd), OUTPUT_MARKER))
+        stdout, stderr = self.remote_exec(['sh', '-c', '; '.join(script)], read=True)
+
+        results = []
+        output = []
+        for line in stdout.splitlines():
+            if not line.startswith(OUTPUT_MARKER):
+                output.append(line)
+                continue
+            path = requests[len(results)][0]
+            if line.split()[-1] != '0':
+                raise ResourceException(500, 'pvesh get {0} failed'.format(path), stderr)
+            content = '\n'.join(output).strip()
+            results.append(json.loads(content) if content else None)
+            output = []
+        if len(results) != len(requests):
+            raise ResourceException(500, 'Incomplete output of {0} pvesh commands'.format(len(requests)), stderr)
+        return results
+
+    def config_digests(self, files=PVE_CONFIG_FILES):
+        """
+        Get the sha1 digests of pmxcfs configuration files in one remote call
+
+        These are the same values the API returns and accepts as `digest`.
+
+        :param files: list - absolute paths of the files
+        :return: dict - digest for each file, None for a missing file
+        """
+        if hasattr(self.api_session.session, 'config_digests'):
+            return self.api_session.session.config_digests(files)
+        stdout, stderr = self.remote_exec(['sha1sum'] + list(files), read=True)
+        digests = dict((path, None) for path in files)
+        for line in stdout.splitlines():
+            parts = line.split(None, 1)
+            if len(parts) == 2 and parts[1] in digests:
+                digests[parts[1]] = parts[0]
+        return digests
+
+    def probe_versions(self, files=PVE_CONFIG_FILES):
+        """
+        Read the pmxcfs versions of configuration files with one small remote call
+
+        Any write to a file, from any node of the cluster, raises its version,
+        so a copy of users, groups, ACLs or storages read while the versions
+        were the same is still current.
+
+        :param files: list - absolute paths of the files
+        :return: dict - version of each file, None when the versions can't be read
+        """
+        try:
+            versions = config_versions(self.read_config_files([PMXCFS_VERSION_FILE])[PMXCFS_VERSION_FILE], files)
+        except Exception:
+            # Backends without remote commands, an unreadable or unexpected file
+            return None
+        return None if None in versions.values() else versions
+
+    def read_config_files(self, files):
+        """
+        Read small pmxcfs files in one remote call
+
+        :param files: list - absolute paths of the files
+        :return: dict - content of each file without the trailing newlines, None for a missing file
+        """
+        if hasattr(self.api_session.session, 'read_config_files'):
+            return self.api_session.session.read_config_files(files)
+        script = ['cat {0} 2>/dev/null; rc=$?; echo; echo {1} $rc'.format(shell_join([path]), OUTPUT_MARKER) for path in files]
+        stdout, stderr = self.remote_exec(['sh', '-c', '; '.join(script)], read=True)
+
+        contents = []
+        output = []
+        for line in stdout.splitlines():
+            if not line.startswith(OUTPUT_MARKER):
+                output.append(line)
+                continue
+            contents.append('\n'.join(output).rstrip('\n') if line.split()[-1] == '0' else None)
+            output = []
+        if len(contents) != len(files):
+            raise IOError('Incomplete output reading {0}: {1}'.format(', '.join(files), stderr))
+        return dict(zip(files, contents))
+
+    def write_config_file(self, path, content):
+        """
+        Write a small pmxcfs file in one remote call
+
+        :param path: str - absolute path of the file
+        :param content: str - the new content, a newline is added
+        """
+        if self.governor_session is not None:
+            return self.governor_session.governed(self._write_config_file, path, content)
+        return self._write_config_file(path, content)
 
+    def _write_config_file(self, path, content):
+        if hasattr(self.api_session.session, 'write_config_file'):
+            return self.api_session.session.write_config_file(path, content)
+        stdout, stderr = self.remote_exec(['sh', '-c', 'printf "%s\\n" "$2" > "$1"', 'sh', path, content])
+        if stderr:
+            raise IOError('Unable to write {0}: {1}'.format(path, stderr.strip()))
+
+    def iter_get(self, path, **params):
+        """Yield the records of a GET request while the response is still being read
+
+        With the SSH backends the pvesh output is decoded straight from the
+        stdout stream of the command. Closing the generator early terminates the
+        remote command, so a lookup that finds its match does not read the rest
+        of the response. Other backends fall back to a buffered request.
+
+        :param path: str - API path, for example '/access/users'
+        :param params: dict - query parameters
+        :return: generator - decoded records
+        """
+        session = self.proxmox_api._store['session']
+        # The API helper answers faster than a new pvesh, even for large responses
+        if not hasattr(self.api_session.session, 'stream_command') or getattr(self.api_session.session, 'resident', False):
+            result = self.proxmox_api(path.strip('/')).get(**params)
+            for item in result if isinstance(result, list) else [result]:
+                yield item
+            return
+
+        cmd = ['pvesh', 'get', '/' + path.strip('/')]
+        for key, value in params.items():
+            if value is not None:
+                cmd += ['-{0}'.format(key), str(value)]
+        cmd += ['--output-format', 'json']
+        if session.sudo:
+            cmd = ['sudo'] + cmd
+
+        start = time.time()
+        status_code = 599
+        stream = self.api_session.session.stream_command(cmd)
+        try:
+            # A generator closed early by the caller still counts as a successful read
+            status_code = 200
+            for item in iter_json_array(_iter_text(stream.read)):
+                yield item
+
+            returncode, message = stream.wait()
+            if returncode != 0:
+                status_code = 500
+                for line in message.splitlines():
+                    if line[:3].isdigit() and line[3:4] == ' ':
+                        status_code = int(line[:3])
+                        break
+                raise ResourceException(status_code, message.splitlines()[-1] if message else 'pvesh failed', message)
+        finally:
+            stream.close()
+            self.api_session.record('GET', '/' + path.strip('/'), params, status_code, time.time() - start)
+
+    def iter_users(self, **params):
+        """Yield users one at a time as they are read
+
+        :return: generator - user dicts
+        """
         try:
-            return ProxmoxAPI(api_host, **auth_args)
+            for user in self.iter_get('/access/users', **params):
+                yield user
         except Exception as e:
-            self.module.fail_json(msg='%s' % e, exception=traceback.format_exc())
+            self.module.fail_json(msg="Unable to retrieve users: {0}".format(e))
+
+    def iter_acls(self):
+        """Yield ACL entries one at a time as they are read
+
+        :return: generator - ACL dicts
+        """
+        try:
+            for acl in self.iter_get('/access/acl'):
+                yield acl
+        except Exception as e:
+            self.module.fail_json(msg="Unable to retrieve ACLs: {0}".format(e))
+
+    def dependent_acls(self, principal):
+        """
+        ACL entries referencing a user and its tokens, or a token, from one snapshot
+
+        The snapshot is indexed by ugid, with the entries of a token also under its user.
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :return: list - sorted tuples of path, roleid, type and ugid
+        """
+        index = {}
+        for acl in self.iter_acls():
+            if acl['type'] == 'group':
+                continue
+            key = (acl['path'], acl['roleid'], acl['type'], acl['ugid'])
+            index.setdefault(acl['ugid'], []).append(key)
+            if acl['type'] == 'token':
+                index.setdefault(acl['ugid'].split('!', 1)[0], []).append(key)
+        return sorted(set(index.get(principal, [])))
+
+    def delete_acls(self, entries):
+        """
+        Delete ACL entries with one request for each path and role
+
+        :param entries: iterable - tuples of path, roleid, type and ugid
+        :return: int - the number of requests, also counted in check mode
+        """
+        grouped = {}
+        for path, roleid, acl_type, ugid in entries:
+            ugids = grouped.setdefault((path, roleid), {}).setdefault(ACL_OPTIONS[acl_type], [])
+            if ugid not in ugids:
+                ugids.append(ugid)
+        if self.module.check_mode:
+            return len(grouped)
+
+        for (path, roleid), principals in sorted(grouped.items()):
+            try:
+                self.proxmox_api.access.acl.set(path=path, roles=roleid, delete=1,
+                                                **dict((option, ','.join(sorted(ugids))) for option, ugids in principals.items()))
+            except Exception as e:
+                self.module.fail_json(msg="Failed to delete ACLs of path {0} and role {1}: {2}".format(path, roleid, e))
+        return len(grouped)
 
     def get_groups(self):
         """Retrieve groups information
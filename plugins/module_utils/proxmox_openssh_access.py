@@ -0,0 +1,634 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ACL_OPTIONS, ProxmoxOpenSSHAnsible)
+
+# Access objects of the datacenter, shared by their modules and usable with any stand-in for AnsibleModule
+# that has params, check_mode, warn, exit_json and fail_json, like ProxmoxOpenSSHClientModule.
+
+
+class ProxmoxOpenSSHGroupAnsible(ProxmoxOpenSSHAnsible):
+
+    def get(self, groupid):
+        """
+        Get group info
+
+        :param groupid: str - name of the group
+        :return: dict - group info
+        """
+        try:
+            return self.proxmox_api.access.groups.get(groupid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to get group with ID {0}: {1}".format(groupid, e))
+
+    def exists(self, groupid):
+        """
+        Check if the group exists
+
+        :param groupid: str - name of the group
+        :return: bool - if the group exists
+        """
+        for group in self.get_groups():
+            if group['groupid'] == groupid:
+                return True
+        return False
+
+    def is_empty(self, groupid):
+        """
+        Check whether group has users
+
+        :param groupid: str - name of the group
+        :return: bool - if the group is empty
+        """
+        return True if not self.get(groupid)['members'] else False
+
+    def create(self, groupid, comment=None):
+        """
+        Create group
+
+        :param groupid: str - name of the group
+        :param comment: str
+        :return: None
+        """
+        if self.exists(groupid):
+            self.module.exit_json(changed=False, groupid=groupid, msg="Group {0} exists".format(groupid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.groups.create(groupid=groupid, comment=comment)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to create group with ID {0}: {1}".format(groupid, e))
+
+    def delete(self, groupid):
+        """
+        Delete group
+
+        :param groupid: str - name of the group
+        :return: None
+        """
+        if not self.exists(groupid):
+            self.module.exit_json(changed=False, groupid=groupid, msg="Group {0} doesn't exist".format(groupid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.groups.delete(groupid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to delete group with ID {0}: {1}".format(groupid, e))
+
+
+class ProxmoxOpenSSHUserAnsible(ProxmoxOpenSSHAnsible):
+
+    def get(self, userid):
+        """
+        Get user info
+
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: dict - user info
+        """
+        try:
+            return self.proxmox_api.access.users.get(userid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to get user with ID {0}: {1}".format(userid, e))
+
+    def exists(self, userid):
+        """
+        Check if the user exists
+
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: bool - if the user exists
+        """
+        for user in self.iter_users():
+            if user['userid'] == userid:
+                return True
+        return False
+
+    def create(self, userid, comment=None, email=None, groups=None, firstname=None, lastname=None):
+        """
+        Create user
+
+        :param userid: str - full User ID, in the `name@realm` format
+        :param comment: str
+        :param email: str
+        :param groups: str
+        :param firstname: str
+        :param lastname: str
+        :return: None
+        """
+        if self.exists(userid):
+            self.module.exit_json(changed=False, userid=userid, msg="User {0} exists".format(userid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.users.create(
+                userid=userid,
+                comment=comment,
+                email=email,
+                groups=groups,
+                firstname=firstname,
+                lastname=lastname,
+                )
+        except Exception as e:
+            self.module.fail_json(msg="Failed to create user with ID {0}: {1}".format(userid, e))
+
+    def delete(self, userid):
+        """
+        Delete user
+
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: None
+        """
+        if not self.exists(userid):
+            self.module.exit_json(changed=False, userid=userid, msg="User {0} doesn't exist".format(userid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.users.delete(userid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to delete user with ID {0}: {1}".format(userid, e))
+
+    def cascade_delete(self, userid):
+        """
+        Delete the ACLs referencing the user and its tokens, the tokens, then the user
+
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: dict - the ACLs deleted as path:roleid:type:ugid and the tokens deleted as user@realm!token
+        """
+        if not self.exists(userid):
+            self.module.exit_json(changed=False, userid=userid, msg="User {0} doesn't exist".format(userid))
+
+        acls = self.dependent_acls(userid)
+        try:
+            tokens = sorted(token['tokenid'] for token in self.iter_get('/access/users/{0}/token'.format(userid)))
+        except Exception as e:
+            self.module.fail_json(msg="Failed to get tokens of user with ID {0}: {1}".format(userid, e))
+        cascade = {'acls': [':'.join(acl) for acl in acls], 'tokens': ['{0}!{1}'.format(userid, tokenid) for tokenid in tokens]}
+
+        self.delete_acls(acls)
+        if self.module.check_mode:
+            return cascade
+
+        for tokenid in tokens:
+            try:
+                self.proxmox_api.access.users(userid).token(tokenid).delete()
+            except Exception as e:
+                self.module.fail_json(cascade=cascade, msg="Failed to delete token {0} for user with ID {1}: {2}".format(tokenid, userid, e))
+        try:
+            self.proxmox_api.access.users.delete(userid)
+        except Exception as e:
+            self.module.fail_json(cascade=cascade, msg="Failed to delete user with ID {0}: {1}".format(userid, e))
+        return cascade
+
+
+class ProxmoxOpenSSHTokenAnsible(ProxmoxOpenSSHAnsible):
+
+    def get(self, tokenid, userid):
+        """
+        Get user-specific token info
+
+        :param tokenid: str - the Token ID
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: dict - token info
+        """
+        try:
+            return self.proxmox_api.access.users(userid).get_token(tokenid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to get token ID {0} for user ID {1}: {2}".format(tokenid, userid, e))
+
+    def exists(self, tokenid, userid):
+        """
+        Check if the user-specific token exists
+
+        :param tokenid: str - the Token ID
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: bool - if the user-specific token exists
+        """
+        for user in self.iter_users():
+            if user['userid'] == userid:
+                for token in self.iter_get('/access/users/{0}/token'.format(userid)):
+                    if token['tokenid'] == tokenid:
+                        return True
+                return False
+        return False
+
+    def create(self, tokenid, userid, comment=None, privsep=True, expire=0):
+        """
+        Create user-specific token
+
+        :param tokenid: str - the Token ID
+        :param userid: str - full User ID, in the `name@realm` format
+        :param comment: str
+        :param privsep: bool
+        :param expire: int - seconds since epoch
+        :return: None
+        """
+        if self.exists(tokenid, userid):
+            self.module.exit_json(changed=False, tokenid=tokenid, userid=userid, msg="Token {0} for user {1} exists".format(tokenid, userid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            return self.proxmox_api.access.users(userid).token(tokenid).create(
+                comment=comment,
+                privsep=privsep,
+                expire=expire,
+                )
+        except Exception as e:
+            self.module.fail_json(msg="Failed to create token with ID {0} for user with ID {1}: {2}".format(tokenid, userid, e))
+
+    def delete(self, tokenid, userid):
+        """
+        Delete user-specific token
+
+        :param tokenid: str - the Token ID
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: None
+        """
+        if not self.exists(tokenid, userid):
+            self.module.exit_json(changed=False, tokenid=tokenid, userid=userid, msg="Token {0} for user {1} doesn't exist".format(tokenid, userid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.users(userid).token(tokenid).delete()
+        except Exception as e:
+            self.module.fail_json(msg="Failed to delete token {0} for user with ID {1}: {2}".format(tokenid, userid, e))
+
+    def cascade_delete(self, tokenid, userid):
+        """
+        Delete the ACLs referencing the user-specific token, then the token
+
+        :param tokenid: str - the Token ID
+        :param userid: str - full User ID, in the `name@realm` format
+        :return: dict - the ACLs deleted as path:roleid:type:ugid
+        """
+        if not self.exists(tokenid, userid):
+            self.module.exit_json(changed=False, tokenid=tokenid, userid=userid, msg="Token {0} for user {1} doesn't exist".format(tokenid, userid))
+
+        acls = self.dependent_acls('{0}!{1}'.format(userid, tokenid))
+        cascade = {'acls': [':'.join(acl) for acl in acls]}
+
+        self.delete_acls(acls)
+        if self.module.check_mode:
+            return cascade
+
+        try:
+            self.proxmox_api.access.users(userid).token(tokenid).delete()
+        except Exception as e:
+            self.module.fail_json(cascade=cascade, msg="Failed to delete token {0} for user with ID {1}: {2}".format(tokenid, userid, e))
+        return cascade
+
+
+class ProxmoxOpenSSHACLAnsible(ProxmoxOpenSSHAnsible):
+
+    def all_exist(self, path, roleid, **kwargs):
+        """
+        Check if all the ACLs for a path and roleid for specified groups, tokens, and users exist
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param propagate: bool - allow to propagate (inherit) permissions
+        :param groups: str - comman seperated list of group names
+        :param tokens: str - comman seperated list of tokens as user@real!token
+        :param users: str - comman seperated list of users as user@real
+        :return: bool - if the ACLs exist for all groups, tokens and users
+        """
+        current_acls = self.proxmox_api.access.acl.get()
+        if not current_acls:
+            return False
+
+        matching_groups = []
+        matching_tokens = []
+        matching_users = []
+
+        for acl in current_acls:
+            if acl['path'] != path:
+                continue
+            if acl['propagate'] != kwargs['propagate']:
+                continue
+            if acl['roleid'] != roleid:
+                continue
+            if acl['type'] == 'group':
+                matching_groups.append(acl['ugid'])
+            if acl['type'] == 'token':
+                matching_tokens.append(acl['ugid'])
+            if acl['type'] == 'user':
+                matching_users.append(acl['ugid'])
+
+        if 'groups' in kwargs and kwargs['groups']:
+            if not matching_groups:
+                return False
+            for ugid in re.split(r'[, ]+', kwargs['groups']):
+                if ugid not in matching_groups:
+                    return False
+
+        if 'tokens' in kwargs and kwargs['tokens']:
+            if not matching_tokens:
+                return False
+            for ugid in re.split(r'[, ]+', kwargs['tokens']):
+                if ugid not in matching_tokens:
+                    return False
+
+        if 'users' in kwargs and kwargs['users']:
+            if not matching_users:
+                return False
+            for ugid in re.split(r'[, ]+', kwargs['users']):
+                if ugid not in matching_users:
+                    return False
+
+        return True
+
+    def matching_acls(self, path, roleid, **kwargs):
+        """
+        Check if all the ACLs for a path and roleid for specified groups, tokens, and users exist
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param groups: str - comman seperated list of group names
+        :param tokens: str - comman seperated list of tokens as user@real!token
+        :param users: str - comman seperated list of users as user@real
+        :return: list - a list of matching ACLs
+        """
+        matched_acls = []
+
+        current_acls = self.proxmox_api.access.acl.get()
+        if not current_acls:
+            self.module.exit_json(changed=False, msg="No ACLs exist.")
+
+        for acl in current_acls:
+            if acl['path'] != path or acl['roleid'] != roleid:
+                continue
+            if acl['type'] == 'group' and 'groups' in kwargs and kwargs['groups']:
+                for ugid in re.split(r'[, ]+', kwargs['groups']):
+                    if acl['ugid'] == ugid:
+                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'group', 'ugid': ugid})
+            if acl['type'] == 'token' and 'tokens' in kwargs and kwargs['tokens']:
+                for ugid in re.split(r'[, ]+', kwargs['tokens']):
+                    if acl['ugid'] == ugid:
+                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'token', 'ugid': ugid})
+            if acl['type'] == 'user' and 'users' in kwargs and kwargs['users']:
+                for ugid in re.split(r'[, ]+', kwargs['users']):
+                    if acl['ugid'] == ugid:
+                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'user', 'ugid': ugid})
+
+        return matched_acls
+
+    def group_acl_exists(self, path, roleid, groupid):
+        """
+        Check if the ACL for a group exists
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param groupid: str - name of the group
+        :return: bool - if the acl exists
+        """
+        for item in self.iter_acls():
+            if item['path'] == path and item['roleid'] == roleid and item['type'] == "group" and item['ugid'] == groupid:
+                return True
+        return False
+
+    def token_acl_exists(self, path, roleid, tokenid):
+        """
+        Check if the ACL for a token exists
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param tokenid: str - name of the token
+        :return: bool - if the acl exists
+        """
+        for item in self.iter_acls():
+            if item['path'] == path and item['roleid'] == roleid and item['type'] == "token" and item['ugid'] == tokenid:
+                return True
+        return False
+
+    def user_acl_exists(self, path, roleid, userid):
+        """
+        Check if the ACL for a user exists
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param userid: str - name of the user
+        :return: bool - if the acl exists
+        """
+        for item in self.iter_acls():
+            if item['path'] == path and item['roleid'] == roleid and item['type'] == "user" and item['ugid'] == userid:
+                return True
+        return False
+
+    def create(self, path, roleid, **kwargs):
+        """
+        Create permissions ACLs
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param groups: str - list of the group names
+        :param tokens: str - list of the tokens as user@realm!token
+        :param users: str - list of the users as user@realm
+        :param propagate: bool
+        :return: None
+        """
+        if self.all_exist(path, roleid, **kwargs):
+            self.module.exit_json(changed=False, roleid=roleid, msg="All requested ACLs for path '{0}' and roleid '{1}' exist".format(path, roleid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.access.acl.set(path=path, roles=roleid, **kwargs)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to create ACL for {0}: {1}".format(kwargs, e))
+
+    def delete(self, path, roleid, **kwargs):
+        """
+        Delete permissions ACLs
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param propagate: bool - allow to propagate (inherit) permissions
+        :param groups: str - list of the group names
+        :param tokens: str - list of the tokens as user@realm!token
+        :param users: str - list of the users as user@realm
+        :return: list - list of ACL dicts removed
+        """
+
+        removing = self.matching_acls(path, roleid, **kwargs)
+
+        if not removing:
+            self.module.exit_json(changed=False, msg="No requested ACLs for path '{0}' and roleid '{1}' exist".format(path, roleid))
+
+        if self.module.check_mode:
+            return removing
+
+        try:
+            self.proxmox_api.access.acl.set(path=path, roles=roleid, delete=True, **kwargs)
+            return removing
+        except Exception as e:
+            self.module.fail_json(msg="Failed to delete ACLs for {0}: {1}".format(removing, e))
+
+    def exclusive(self, path, roleid, propagate, prefix=None, all_roles=False, **kwargs):
+        """
+        Set the ACLs of the given principals and remove every other ACL in scope, from one snapshot
+
+        The scope is the entries of `path`, or of `prefix` and the paths below it,
+        for `roleid` or every role. The entries to remove are those of the scope
+        that are not desired, deleted with one request for each path and role.
+
+        :param path: str - the access control path
+        :param roleid: str - name of the role
+        :param propagate: bool - allow to propagate (inherit) permissions
+        :param prefix: str - remove entries of this path and the paths below it instead of only those of `path`
+        :param all_roles: bool - remove the entries of every role in scope instead of only those of `roleid`
+        :param groups: str - comma separated list of group names
+        :param tokens: str - comma separated list of tokens as user@realm!token
+        :param users: str - comma separated list of users as user@realm
+        :return: tuple - dict of option to the ugids set, sorted list of the removed entries as path:roleid:type:ugid
+        """
+        desired = set()
+        for acl_type, option in ACL_OPTIONS.items():
+            for ugid in re.split(r'[, ]+', kwargs.get(option) or ''):
+                if ugid:
+                    desired.add((path, roleid, acl_type, ugid))
+
+        try:
+            current_acls = self.proxmox_api.access.acl.get() or []
+        except Exception as e:
+            self.module.fail_json(msg="Unable to retrieve ACLs: {0}".format(e))
+
+        # path -> (path, roleid, type, ugid) -> propagate
+        index = {}
+        for acl in current_acls:
+            index.setdefault(acl['path'], {})[(acl['path'], acl['roleid'], acl['type'], acl['ugid'])] = int(acl['propagate'])
+
+        if prefix is None:
+            paths = [path]
+        else:
+            # The ACL on the prefix itself is in scope with or without a trailing slash
+            prefix = prefix.rstrip('/') or '/'
+            below = prefix.rstrip('/') + '/'
+            paths = [acl_path for acl_path in index if acl_path == prefix or acl_path.startswith(below)]
+        in_scope = set()
+        for acl_path in paths:
+            in_scope.update(key for key in index.get(acl_path, {}) if all_roles or key[1] == roleid)
+        removing = sorted(in_scope - desired)
+
+        setting = {}
+        for key in sorted(desired):
+            if index.get(path, {}).get(key) != int(propagate):
+                setting.setdefault(ACL_OPTIONS[key[2]], []).append(key[3])
+        if setting and not self.module.check_mode:
+            try:
+                self.proxmox_api.access.acl.set(path=path, roles=roleid, propagate=propagate,
+                                                **dict((option, ','.join(ugids)) for option, ugids in setting.items()))
+            except Exception as e:
+                self.module.fail_json(msg="Failed to create ACL for {0}: {1}".format(setting, e))
+
+        self.delete_acls(removing)
+        return setting, [':'.join(key) for key in removing]
+
+
+class ProxmoxOpenSSHPoolAnsible(ProxmoxOpenSSHAnsible):
+
+    def get(self, poolid):
+        """
+        Get the comment and members of a pool
+
+        :param poolid: str - the pool ID
+        :return: dict - comment, sorted vms and sorted storages, None when the pool doesn't exist
+        """
+        try:
+            pool = self.proxmox_api.pools(poolid).get()
+        except Exception as e:
+            if 'does not exist' in str(e):
+                return None
+            self.module.fail_json(msg="Failed to get pool with ID {0}: {1}".format(poolid, e))
+
+        members = pool.get('members') or []
+        return {
+            'comment': pool.get('comment') or '',
+            'vms': sorted(set(int(member['vmid']) for member in members if member.get('type') in ('qemu', 'lxc', 'openvz'))),
+            # A shared storage is listed once for every node
+            'storages': sorted(set(member['storage'] for member in members if member.get('type') == 'storage')),
+        }
+
+    def _write(self, description, method, *args, **kwargs):
+        if self.module.check_mode:
+            return
+        try:
+            method(*args, **kwargs)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to {0}: {1}".format(description, e))
+
+    def ensure(self, poolid, comment=None, vms=None, storages=None, allow_move=False):
+        """
+        Create the pool if needed and set its members with at most one request to add and one to remove
+
+        :param poolid: str - the pool ID
+        :param comment: str - the comment, None to keep it
+        :param vms: list - VMIDs of all the guests of the pool, None to keep them
+        :param storages: list - all the storages of the pool, None to keep them
+        :param allow_move: bool - move guests that are members of another pool
+        :return: tuple - if the pool was created, dict of the changes
+        """
+        current = self.get(poolid)
+        created = current is None
+        if created:
+            self._write("create pool {0}".format(poolid), self.proxmox_api.pools.create, poolid=poolid, comment=comment)
+            current = {'comment': comment or '', 'vms': [], 'storages': []}
+
+        changes = {
+            'add_vms': sorted(set(vms) - set(current['vms'])) if vms is not None else [],
+            'remove_vms': sorted(set(current['vms']) - set(vms)) if vms is not None else [],
+            'add_storages': sorted(set(storages) - set(current['storages'])) if storages is not None else [],
+            'remove_storages': sorted(set(current['storages']) - set(storages)) if storages is not None else [],
+        }
+        if comment is not None and comment != current['comment']:
+            changes['comment'] = comment
+
+        if changes['remove_vms'] or changes['remove_storages']:
+            self._write("remove members from pool {0}".format(poolid), self.proxmox_api.pools(poolid).set, delete=1,
+                        vms=','.join(str(vmid) for vmid in changes['remove_vms']) or None,
+                        storage=','.join(changes['remove_storages']) or None)
+        if changes['add_vms'] or changes['add_storages'] or 'comment' in changes:
+            params = {}
+            if allow_move and changes['add_vms']:
+                params['allow-move'] = 1
+            self._write("add members to pool {0}".format(poolid), self.proxmox_api.pools(poolid).set,
+                        comment=changes.get('comment'),
+                        vms=','.join(str(vmid) for vmid in changes['add_vms']) or None,
+                        storage=','.join(changes['add_storages']) or None, **params)
+        return created, changes
+
+    def delete(self, poolid):
+        """
+        Empty and delete the pool
+
+        :param poolid: str - the pool ID
+        :return: dict - the members removed, None when the pool doesn't exist
+        """
+        current = self.get(poolid)
+        if current is None:
+            return None
+        changes = {'remove_vms': current['vms'], 'remove_storages': current['storages']}
+        if current['vms'] or current['storages']:
+            self._write("remove members from pool {0}".format(poolid), self.proxmox_api.pools(poolid).set, delete=1,
+                        vms=','.join(str(vmid) for vmid in current['vms']) or None,
+                        storage=','.join(current['storages']) or None)
+        self._write("delete pool {0}".format(poolid), self.proxmox_api.pools(poolid).delete)
+        return changes
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import fcntl
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_fake import (ProxmoxOpenSSHResponse)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage_schema import (SECRET_STORAGE_OPTIONS)
+
+# Parameters and JSON fields whose values never go to a cassette, with the secret storage options
+SECRET_KEYS = tuple(sorted(set(('secret', 'value', 'keys', 'ticket', 'CSRFPreventionToken', 'token_value', 'api_token_secret')
+                               + SECRET_STORAGE_OPTIONS)))
+
+REDACTED = '**REDACTED**'
+
+_SECRET_FIELDS = re.compile(r'"({0})"(\s*:\s*)"(?:[^"\\]|\\.)*"'.format('|'.join(re.escape(key) for key in SECRET_KEYS)))
+
+
+def redact_text(text):
+    """Replace the string values of the secret fields of a JSON text"""
+    return _SECRET_FIELDS.sub(r'"\1"\2"{0}"'.format(REDACTED), text)
+
+
+def redact_args(args):
+    """Parameters of a request with the secret values replaced"""
+    return dict((key, REDACTED if key in SECRET_KEYS else str(value)) for key, value in (args or {}).items())
+
+
+def redact_cmd(cmd):
+    """A remote command with the values of secret options replaced"""
+    redacted = []
+    for arg in cmd:
+        redacted.append(REDACTED if redacted and redacted[-1].lstrip('-') in SECRET_KEYS else str(arg))
+    return redacted
+
+
+def _text(data):
+    if isinstance(data, bytes):
+        return data.decode('utf-8', 'replace')
+    return '' if data is None else str(data)
+
+
+def _request_key(host, method, path, args):
+    return json.dumps(['request', host, method.upper(), '/' + path.strip('/'), redact_args(args)], sort_keys=True)
+
+
+def _command_key(host, kind, cmd):
+    return json.dumps([kind, host, redact_cmd(cmd)])
+
+
+class _RecordedStream(object):
+    """Passes a remote command stream through and records what was read from it"""
+
+    def __init__(self, recorder, cmd, stream):
+        self.recorder = recorder
+        self.cmd = cmd
+        self.stream = stream
+        self.start = time.time()
+        self.chunks = []
+        self.result = None
+        self.recorded = False
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def read(self, size, timeout=None):
+        data = self.stream.read(size, timeout=timeout)
+        self.chunks.append(data)
+        return data
+
+    def wait(self):
+        self.result = self.stream.wait()
+        return self.result
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            if not self.recorded:
+                self.recorded = True
+                returncode, stderr = self.result or (None, '')
+                # A stream closed before its end is replayed as far as it was read
+                self.recorder.write({
+                    'type': 'stream',
+                    'cmd': redact_cmd(self.cmd),
+                    'stdout': redact_text(_text(b''.join(self.chunks))),
+                    'stderr': redact_text(_text(stderr)),
+                    'returncode': returncode,
+                    'elapsed': round(time.time() - self.start, 4),
+                })
+
+
+class ProxmoxOpenSSHRecordSession(object):
+    """Wraps a proxmoxer session and records every call made through it in a cassette
+
+    Requests with their response, and the remote commands of remote_exec and
+    iter_get with their output, are appended as JSON lines to the cassette
+    file, with the time each took. Secrets in parameters, command options and
+    responses are redacted, see SECRET_KEYS. Several module runs, in parallel
+    or one after the other, append to the same cassette under a lock.
+    ProxmoxOpenSSHReplaySession serves the calls back.
+    """
+
+    def __init__(self, session, cassette_path, host, backend, base_url=''):
+        self.session = session
+        self.cassette_path = os.path.expanduser(cassette_path)
+        self.host = host
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.write({
+            'type': 'session',
+            'backend': backend,
+            'persistent': bool(getattr(session, 'persistent', False)),
+            'resident': bool(getattr(session, 'resident', False)),
+        })
+
+    def __getattr__(self, name):
+        attr = getattr(self.session, name)
+        # Only backends that run remote commands have them
+        if name == '_exec':
+            return functools.partial(self._recorded_exec, attr)
+        if name == 'stream_command':
+            return functools.partial(self._recorded_stream, attr)
+        return attr
+
+    def write(self, entry):
+        """
+        Append an entry of the host to the cassette
+
+        :param entry: dict - the call, see ProxmoxOpenSSHReplaySession
+        :return: None
+        """
+        line = json.dumps(dict(entry, host=self.host), sort_keys=True) + '\n'
+        directory = os.path.dirname(self.cassette_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self.lock:
+            fd = os.open(self.cassette_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(line)
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        start = time.time()
+        response = self.session.request(method, url, data=data, params=params, headers=headers)
+        path = url[len(self.base_url):] if self.base_url and url.startswith(self.base_url) else url
+        self.write({
+            'type': 'request',
+            'method': method.upper(),
+            'path': '/' + path.strip('/'),
+            'args': redact_args(dict(params or {}, **(data or {}))),
+            'status': response.status_code,
+            'content': redact_text(_text(response.content)),
+            'elapsed': round(time.time() - start, 4),
+        })
+        return response
+
+    def _recorded_exec(self, exec_method, cmd):
+        start = time.time()
+        result = exec_method(cmd)
+        self.write({
+            'type': 'exec',
+            'cmd': redact_cmd(cmd),
+            'stdout': redact_text(_text(result[0])),
+            'stderr': redact_text(_text(result[1])),
+            'returncode': result[2] if len(result) > 2 else None,
+            'elapsed': round(time.time() - start, 4),
+        })
+        return result
+
+    def _recorded_stream(self, stream_method, cmd, interactive=False):
+        stream = stream_method(cmd, interactive=interactive)
+        if interactive:
+            # The API helper records its requests through request()
+            return stream
+        return _RecordedStream(self, cmd, stream)
+
+
+class _ReplayedStream(object):
+    """Serves the recorded output of a streamed remote command"""
+
+    def __init__(self, entry, delay):
+        self.data = entry['stdout'].encode('utf-8')
+        self.entry = entry
+        self.delay = delay
+
+    def read(self, size, timeout=None):
+        if self.delay:
+            time.sleep(self.delay)
+            self.delay = 0
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+
+    def wait(self):
+        returncode = self.entry['returncode']
+        return 0 if returncode is None else returncode, self.entry['stderr']
+
+    def close(self):
+        pass
+
+
+class ProxmoxOpenSSHReplaySession(object):
+    """Answers the calls of a module from a cassette written by ProxmoxOpenSSHRecordSession
+
+    The recorded calls of the host are matched on the method, path and
+    redacted parameters of a request, or on the redacted command. Identical
+    calls get the recorded answers in the order they were recorded, the last
+    one is repeated once they are used up. Each answer takes the recorded
+    time multiplied by `speed`, 0 answers at once. Writes change nothing, a
+    read after a write gets what was recorded after the write.
+    """
+
+    def __init__(self, cassette_path, host, speed=1.0, sudo=False):
+        self.cassette_path = os.path.expanduser(cassette_path)
+        self.host = host
+        self.speed = speed
+        self.timeout = 0
+        # Commands are built as they were recorded
+        self.sudo = sudo
+        self.persistent = False
+        self.resident = False
+        self.remote_commands = False
+        self.lock = threading.Lock()
+        self.answers = {}
+        with open(self.cassette_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get('host') != host:
+                    continue
+                if entry['type'] == 'session':
+                    self.persistent = entry['persistent']
+                    self.resident = entry['resident']
+                    self.remote_commands = entry['backend'] in ('openssh', 'paramiko')
+                elif entry['type'] == 'request':
+                    self.answers.setdefault(_request_key(host, entry['method'], entry['path'], entry['args']), []).append(entry)
+                else:
+                    self.answers.setdefault(_command_key(host, entry['type'], entry['cmd']), []).append(entry)
+        if not self.answers:
+            raise IOError('No calls of {0} recorded in {1}'.format(host, self.cassette_path))
+
+    def __getattr__(self, name):
+        # Remote commands are answered as the recorded backend ran them
+        if name == '_exec' and self.remote_commands:
+            return self._replay_exec
+        if name == 'stream_command' and self.remote_commands:
+            return self._replay_stream
+        raise AttributeError(name)
+
+    def _answer(self, key, description):
+        with self.lock:
+            answers = self.answers.get(key)
+            if not answers:
+                raise IOError('No recorded answer for {0} on {1} in {2}'.format(description, self.host, self.cassette_path))
+            entry = answers.pop(0) if len(answers) > 1 else answers[0]
+        return entry
+
+    def _wait(self, entry):
+        if self.speed:
+            time.sleep(entry['elapsed'] * self.speed)
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        path = '/' + url.strip().strip('/')
+        entry = self._answer(_request_key(self.host, method, path, dict(params or {}, **(data or {}))),
+                             '{0} {1}'.format(method.upper(), path))
+        self._wait(entry)
+        return ProxmoxOpenSSHResponse(entry['content'], entry['status'])
+
+    def _replay_exec(self, cmd):
+        entry = self._answer(_command_key(self.host, 'exec', cmd), ' '.join(redact_cmd(cmd)))
+        self._wait(entry)
+        return entry['stdout'], entry['stderr'], entry['returncode']
+
+    def _replay_stream(self, cmd, interactive=False):
+        entry = self._answer(_command_key(self.host, 'stream', cmd), ' '.join(redact_cmd(cmd)))
+        return _ReplayedStream(entry, entry['elapsed'] * self.speed)
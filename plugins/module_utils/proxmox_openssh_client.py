@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Converge the access configuration of Proxmox VE clusters from Python or the command line, without a playbook
+
+The client runs the convergence of the proxmox_datacenter module in the calling
+process, without ansible-playbook, a task or a module process per call. It still
+imports ansible-core and the ProxmoxAnsible class of community.general, which
+must be installed. The users, groups, tokens, ACLs and pools of the other access
+modules are managed by the classes of proxmox_openssh_access, which take a
+ProxmoxOpenSSHClientModule in place of the AnsibleModule.
+
+    from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_client import (
+        ProxmoxOpenSSHClient)
+
+    client = ProxmoxOpenSSHClient(api_host='pve1', api_user='root', api_backend='paramiko')
+    result = client.apply({'groups': ['ops'], 'users': ['devops@pve']})
+
+The same document, with the connection options, is applied from the command line with
+
+    python -m ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_client apply access.yml
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import argparse
+import json
+import sys
+import traceback
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    ProxmoxOpenSSHHostExit, proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (
+    ProxmoxOpenSSHDatacenterAnsible, converge_datacenter, normalize_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (cached_api_schema)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (storage_schema)
+
+YAML_IMP_ERR = None
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+    YAML_IMP_ERR = traceback.format_exc()
+
+# Options of the client besides the connection options, with their defaults
+CLIENT_OPTIONS = {'api_hosts': None, 'api_workers': 4, 'state_marker': False}
+
+# Sections of the document converged by apply, as the options of proxmox_datacenter
+SPEC_SECTIONS = ('storages', 'groups', 'users', 'tokens', 'acls')
+
+
+class ProxmoxOpenSSHClientModule(object):
+    """Stands in for AnsibleModule so the ProxmoxOpenSSH*Ansible classes run from plain Python
+
+    Options not given take the defaults of proxmox_openssh_argument_spec.
+    exit_json and fail_json raise ProxmoxOpenSSHHostExit with the result,
+    warnings are collected in `warnings`.
+    """
+
+    def __init__(self, params, check_mode=False):
+        self.params = dict((name, option.get('default')) for name, option in proxmox_openssh_argument_spec().items())
+        self.params.update(CLIENT_OPTIONS)
+        self.params.update(params)
+        self.check_mode = check_mode
+        self.warnings = []
+
+    def warn(self, warning):
+        self.warnings.append(warning)
+
+    def exit_json(self, **kwargs):
+        kwargs.setdefault('failed', False)
+        raise ProxmoxOpenSSHHostExit(kwargs)
+
+    def fail_json(self, msg, **kwargs):
+        raise ProxmoxOpenSSHHostExit(dict(kwargs, failed=True, msg=msg))
+
+
+class ProxmoxOpenSSHClient(object):
+    """Applies access documents to a cluster, keeping the connection between calls
+
+    The connection to api_host is made by the first call and reused by the
+    following ones, with the pooled SSH and HTTPS connections and the API
+    helper of the backend, so a long running service only pays for the API
+    calls. The pre-flight, schema and route caches on disk are shared with the
+    Ansible modules. A client is used from one thread at a time.
+    """
+
+    def __init__(self, **params):
+        """
+        :param params: dict - the api_* connection options of the modules, and api_hosts, api_workers and state_marker
+        """
+        unknown = set(params) - set(proxmox_openssh_argument_spec()) - set(CLIENT_OPTIONS)
+        if unknown:
+            raise ValueError("Unknown options: {0}".format(', '.join(sorted(unknown))))
+        self.module = ProxmoxOpenSSHClientModule(params)
+        self.proxmox_datacenter = None
+
+    def _connected(self):
+        if self.proxmox_datacenter is None:
+            try:
+                self.proxmox_datacenter = ProxmoxOpenSSHDatacenterAnsible(self.module)
+            except ProxmoxOpenSSHHostExit:
+                # The next call connects again and reports its own metrics
+                for name in ('exit_json', 'fail_json', '_proxmox_metrics'):
+                    self.module.__dict__.pop(name, None)
+                raise
+        else:
+            # The metrics of a result are those of its own calls
+            self.proxmox_datacenter.api_session.calls = []
+            self.proxmox_datacenter.api_session.connections = 0
+            if self.proxmox_datacenter.governor_session is not None:
+                self.proxmox_datacenter.governor_session.wait = 0.0
+                self.proxmox_datacenter.governor_session.writes = 0
+        return self.proxmox_datacenter
+
+    def apply(self, document, check=False):
+        """
+        Converge the cluster, or each cluster of api_hosts, to a document
+
+        :param document: dict - the storages, groups, users, tokens and acls, in the format of proxmox_datacenter
+        :param check: bool - only report the actions, as in check mode
+        :return: dict - the result of proxmox_datacenter, with `failed` and `warnings`
+        """
+        self.module.check_mode = check
+        self.module.warnings = []
+        try:
+            spec = normalize_spec(schema=storage_schema(cached_api_schema(self.module)[1]),
+                                  **dict((section, document.get(section) or []) for section in SPEC_SECTIONS))
+            if self.module.params['api_hosts']:
+                converge_datacenter(self.module, spec)
+            else:
+                converge_datacenter(self.module, spec, self._connected())
+            result = {'failed': True, 'msg': 'No result'}
+        except ProxmoxOpenSSHHostExit as e:
+            result = e.result
+        except (KeyError, TypeError, ValueError) as e:
+            result = {'failed': True, 'msg': "Invalid datacenter definition: {0}".format(e)}
+        result['warnings'] = self.module.warnings
+        return result
+
+    def plan(self, document):
+        """
+        Report the actions that apply would take, without changing anything
+
+        :param document: dict - see apply
+        :return: dict - see apply
+        """
+        return self.apply(document, check=True)
+
+
+def main(argv=None):
+    """
+    Apply or plan a YAML document holding the connection options and the access configuration
+
+    Prints the result as JSON. Exits with 1 on failure, and with 2 when plan
+    finds changes.
+    """
+    parser = argparse.ArgumentParser(description="Converge the access configuration of Proxmox VE clusters")
+    parser.add_argument('command', choices=['apply', 'plan'])
+    parser.add_argument('document', help="YAML file with the api_* options and the storages, groups, users, tokens and acls")
+    args = parser.parse_args(argv)
+    if not HAS_YAML:
+        parser.exit(1, "PyYAML is required to read {0}\n".format(args.document))
+
+    with open(args.document) as f:
+        document = yaml.safe_load(f) or {}
+    params = dict((key, value) for key, value in document.items() if key not in SPEC_SECTIONS)
+    try:
+        client = ProxmoxOpenSSHClient(**params)
+    except ValueError as e:
+        parser.exit(1, "{0}: {1}\n".format(args.document, e))
+
+    result = client.plan(document) if args.command == 'plan' else client.apply(document)
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    if result['failed']:
+        return 1
+    return 2 if args.command == 'plan' and result.get('changed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import json
+import re
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    PMXCFS_VERSION_FILE, config_versions, run_on_hosts)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (
+    ProxmoxOpenSSHStorageAnsible, validate_storage_options)
+
+# ACL principal kinds, as the option name in a desired ACL and the `type` of an ACL entry
+ACL_TYPES = (('groups', 'group'), ('tokens', 'token'), ('users', 'user'))
+
+# Written on the cluster by a run that found the datacenter in the declared state
+STATE_MARKER_FILE = '/etc/pve/priv/proxmox_openssh_datacenter.json'
+
+
+def split_list(value):
+    """
+    Accept a list or a comma separated string
+
+    :param value: list, str or None
+    :return: list - the items, without empty ones
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item for item in re.split(r'[, ]+', str(value)) if item]
+
+
+def normalize_spec(storages=None, groups=None, users=None, tokens=None, acls=None, schema=None):
+    """
+    Normalize a desired datacenter document
+
+    Groups may be given as names, tokens as `user@realm!token` strings and the
+    principals of ACLs as lists or comma separated strings. Storages are
+    validated against the storage schema. The first definition of a user or
+    token wins over later duplicates.
+
+    :param schema: dict - storage schema as returned by storage_schema, STORAGE_SCHEMA when not given
+    :return: dict - the normalized document
+    :raises ValueError: for invalid entries
+    """
+    spec = {'storages': [], 'groups': [], 'users': [], 'tokens': [], 'acls': []}
+
+    for storage in storages or []:
+        storage = dict(storage)
+        storageid = storage.pop('storage', None) or storage.pop('storageid', None)
+        if not storageid:
+            raise ValueError("Storage without a storage ID: {0}".format(storage))
+        storage_type = storage.pop('type', 'dir')
+        options = dict(storage.pop('options', None) or {})
+        options.update(storage)
+        spec['storages'].append({'storage': storageid, 'type': storage_type,
+                                 'options': validate_storage_options(storage_type, options, schema)})
+
+    seen = set()
+    for group in groups or []:
+        group = {'groupid': group} if isinstance(group, str) else dict(group)
+        if group['groupid'] not in seen:
+            seen.add(group['groupid'])
+            spec['groups'].append(group)
+
+    seen = set()
+    for user in users or []:
+        user = {'userid': user} if isinstance(user, str) else dict(user)
+        user['groups'] = split_list(user.get('groups'))
+        if user['userid'] not in seen:
+            seen.add(user['userid'])
+            spec['users'].append(user)
+
+    seen = set()
+    for token in tokens or []:
+        if isinstance(token, str):
+            if '!' not in token:
+                raise ValueError("Token '{0}' is not in the user@realm!token format".format(token))
+            userid, tokenid = token.split('!', 1)
+            token = {'userid': userid, 'tokenid': tokenid}
+        token = dict(token)
+        if (token['userid'], token['tokenid']) not in seen:
+            seen.add((token['userid'], token['tokenid']))
+            spec['tokens'].append(token)
+
+    for acl in acls or []:
+        acl = dict(acl)
+        for option, acl_type in ACL_TYPES:
+            acl[option] = split_list(acl.get(option))
+        acl['propagate'] = bool(acl.get('propagate', True))
+        spec['acls'].append(acl)
+
+    return spec
+
+
+def spec_fingerprint(spec):
+    """sha256 hex digest of a normalized datacenter document"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ProxmoxOpenSSHDatacenterAnsible(ProxmoxOpenSSHStorageAnsible):
+
+    def read_state_marker(self, spec):
+        """
+        Compare the state marker with the desired document in one remote call
+
+        The marker holds the fingerprint of the document of the last run that
+        found nothing to change, with the pmxcfs versions of user.cfg and
+        storage.cfg it read before its snapshot. Any write to those files since
+        then, by anyone, raises a version and the marker no longer matches.
+
+        :param spec: dict - normalized document, see normalize_spec
+        :return: tuple - True when the marker matches, the marker to write if this run changes nothing
+        """
+        files = self.read_config_files([PMXCFS_VERSION_FILE, STATE_MARKER_FILE])
+        marker = {'fingerprint': spec_fingerprint(spec), 'versions': config_versions(files[PMXCFS_VERSION_FILE])}
+        try:
+            stored = json.loads(files[STATE_MARKER_FILE]) if files[STATE_MARKER_FILE] else None
+        except ValueError:
+            stored = None
+        if None in marker['versions'].values():
+            # Without the version of a file a marker can't tell whether it changed
+            return False, None
+        return stored == marker, marker
+
+    def write_state_marker(self, marker):
+        """
+        Store the marker returned by read_state_marker
+
+        :param marker: dict - the marker
+        """
+        self.write_config_file(STATE_MARKER_FILE, json.dumps(marker, sort_keys=True))
+
+    def snapshot(self):
+        """
+        Read storages, groups, users with their tokens and ACLs with one remote call
+
+        :return: dict - the current datacenter state
+        """
+        try:
+            storages, groups, users, acls = self.get_many([
+                '/storage',
+                '/access/groups',
+                ('/access/users', {'full': 1}),
+                '/access/acl',
+            ])
+        except Exception as e:
+            self.module.fail_json(msg="Unable to read the datacenter configuration: {0}".format(e))
+
+        for user in users:
+            user['groups'] = split_list(user.get('groups'))
+        return {
+            'storages': dict((storage['storage'], storage) for storage in storages),
+            'groups': dict((group['groupid'], group) for group in groups),
+            'users': dict((user['userid'], user) for user in users),
+            'tokens': dict(((user['userid'], token['tokenid']), token) for user in users for token in user.get('tokens') or []),
+            'acls': dict(((acl['path'], acl['roleid'], acl['type'], acl['ugid']), acl['propagate']) for acl in acls),
+        }
+
+    def _write(self, description, method, *args, **kwargs):
+        if self.module.check_mode:
+            return None
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to {0}: {1}".format(description, e))
+
+    def converge(self, spec, current=None):
+        """
+        Bring the datacenter to the desired state from a single snapshot
+
+        :param spec: dict - normalized document, see normalize_spec
+        :param current: dict - snapshot to start from, read when not given
+        :return: tuple - list of the actions taken, list of the token results
+        """
+        if current is None:
+            current = self.snapshot()
+        actions = []
+
+        for storage in spec['storages']:
+            storageid = storage['storage']
+            existing = current['storages'].get(storageid)
+            if existing is None:
+                self._write("create storage {0}".format(storageid), self.proxmox_api.storage.create,
+                            storage=storageid, type=storage['type'], **storage['options'])
+                actions.append({'action': 'create', 'kind': 'storage', 'id': storageid})
+                continue
+            if existing['type'] != storage['type']:
+                self.module.fail_json(msg="Storage {0} exists with type {1}, not {2}".format(storageid, existing['type'], storage['type']))
+            changes = self.diff(storage['type'], existing, storage['options'])
+            if changes:
+                # The digest of the snapshot covers all of storage.cfg and is outdated by the first write
+                self._write("update storage {0}".format(storageid), self.proxmox_api.storage(storageid).set, **changes)
+                actions.append({'action': 'update', 'kind': 'storage', 'id': storageid, 'changes': changes})
+
+        for group in spec['groups']:
+            groupid = group['groupid']
+            existing = current['groups'].get(groupid)
+            if existing is None:
+                self._write("create group {0}".format(groupid), self.proxmox_api.access.groups.create,
+                            groupid=groupid, comment=group.get('comment'))
+                actions.append({'action': 'create', 'kind': 'group', 'id': groupid})
+            elif group.get('comment') is not None and group['comment'] != existing.get('comment', ''):
+                self._write("update group {0}".format(groupid), self.proxmox_api.access.groups(groupid).set,
+                            comment=group['comment'])
+                actions.append({'action': 'update', 'kind': 'group', 'id': groupid})
+
+        for user in spec['users']:
+            userid = user['userid']
+            fields = dict((key, user.get(key)) for key in ('comment', 'email', 'firstname', 'lastname') if user.get(key) is not None)
+            existing = current['users'].get(userid)
+            if existing is None:
+                self._write("create user {0}".format(userid), self.proxmox_api.access.users.create,
+                            userid=userid, groups=','.join(user['groups']) or None, **fields)
+                actions.append({'action': 'create', 'kind': 'user', 'id': userid})
+                continue
+            # Groups are only added, memberships managed elsewhere are kept
+            missing = [group for group in user['groups'] if group not in existing['groups']]
+            fields = dict((key, value) for key, value in fields.items() if existing.get(key, '') != value)
+            if missing or fields:
+                if missing:
+                    fields.update(groups=','.join(missing), append=1)
+                self._write("update user {0}".format(userid), self.proxmox_api.access.users(userid).set, **fields)
+                actions.append({'action': 'update', 'kind': 'user', 'id': userid})
+
+        tokens = []
+        for token in spec['tokens']:
+            userid, tokenid = token['userid'], token['tokenid']
+            fields = dict((key, token[key]) for key in ('comment', 'expire', 'privsep') if token.get(key) is not None)
+            existing = current['tokens'].get((userid, tokenid))
+            if existing is None:
+                created = self._write("create token {0}!{1}".format(userid, tokenid),
+                                      self.proxmox_api.access.users(userid).token(tokenid).create, **fields)
+                actions.append({'action': 'create', 'kind': 'token', 'id': '{0}!{1}'.format(userid, tokenid)})
+                tokens.append({'userid': userid, 'tokenid': tokenid, 'changed': True,
+                               'token': created['value'] if created else None})
+                continue
+            if 'privsep' in fields:
+                fields['privsep'] = int(fields['privsep'])
+            fields = dict((key, value) for key, value in fields.items() if existing.get(key) != value)
+            if fields:
+                self._write("update token {0}!{1}".format(userid, tokenid),
+                            self.proxmox_api.access.users(userid).token(tokenid).set, **fields)
+                actions.append({'action': 'update', 'kind': 'token', 'id': '{0}!{1}'.format(userid, tokenid)})
+            tokens.append({'userid': userid, 'tokenid': tokenid, 'changed': False})
+
+        for path, roleid, propagate, principals in self.missing_acls(spec['acls'], current['acls']):
+            self._write("set ACLs for path {0} and role {1}".format(path, roleid), self.proxmox_api.access.acl.set,
+                        path=path, roles=roleid, propagate=propagate,
+                        **dict((option, ','.join(ugids)) for option, ugids in principals.items()))
+            actions.append({'action': 'update', 'kind': 'acl', 'id': '{0}:{1}'.format(path, roleid), 'principals': principals})
+
+        return actions, tokens
+
+    def missing_acls(self, acls, current_acls):
+        """
+        Find the desired ACL entries that are missing or propagate differently
+
+        :param acls: list - normalized desired ACLs
+        :param current_acls: dict - (path, roleid, type, ugid) to propagate, from the snapshot
+        :return: list - tuples of path, roleid, propagate and a dict of option to ugids, one per request to send
+        """
+        grouped = {}
+        for acl in acls:
+            propagate = int(acl['propagate'])
+            for option, acl_type in ACL_TYPES:
+                for ugid in acl[option]:
+                    if current_acls.get((acl['path'], acl['roleid'], acl_type, ugid)) == propagate:
+                        continue
+                    key = (acl['path'], acl['roleid'], propagate)
+                    ugids = grouped.setdefault(key, {}).setdefault(option, [])
+                    if ugid not in ugids:
+                        ugids.append(ugid)
+        return [(path, roleid, propagate, grouped[(path, roleid, propagate)]) for path, roleid, propagate in sorted(grouped)]
+
+
+def _converge_cluster(module, spec, proxmox_datacenter):
+    marker = None
+    if module.params['state_marker'] and not proxmox_datacenter.has_config_files:
+        module.warn("Ignoring state_marker, the {0} backend can't read files on the node".format(proxmox_datacenter.api_session.backend))
+    elif module.params['state_marker']:
+        try:
+            unchanged, marker = proxmox_datacenter.read_state_marker(spec)
+        except Exception as e:
+            module.fail_json(msg="Unable to read the state marker: {0}".format(e))
+        if unchanged:
+            tokens = [{'userid': token['userid'], 'tokenid': token['tokenid'], 'changed': False} for token in spec['tokens']]
+            module.exit_json(changed=False, unchanged=True, actions=[], tokens=tokens,
+                             msg="Datacenter unchanged since the state marker was written")
+
+    actions, tokens = proxmox_datacenter.converge(spec)
+
+    # The versions were read before the snapshot, a write made since then makes the marker stale
+    if marker and not actions and not module.check_mode and not module.params.get('api_plan'):
+        try:
+            proxmox_datacenter.write_state_marker(marker)
+        except Exception as e:
+            module.warn("Unable to write the state marker: {0}".format(e))
+
+    module.exit_json(changed=bool(actions), unchanged=False, actions=actions, tokens=tokens,
+                     msg="Datacenter converged with {0} changes".format(len(actions)))
+
+
+def converge_datacenter(module, spec, proxmox_datacenter=None):
+    """
+    Converge the cluster of api_host, or each cluster of api_hosts, and end with exit_json or fail_json
+
+    Shared by the proxmox_datacenter module and ProxmoxOpenSSHClient.
+
+    :param module: AnsibleModule or a stand-in - with the connection options, api_hosts, api_workers and state_marker
+    :param spec: dict - normalized document, see normalize_spec
+    :param proxmox_datacenter: ProxmoxOpenSSHDatacenterAnsible - connected to api_host, to reuse it
+    :return: None
+    """
+    if not module.params.get('api_hosts'):
+        _converge_cluster(module, spec, proxmox_datacenter or ProxmoxOpenSSHDatacenterAnsible(module))
+
+    api_hosts = module.params['api_hosts']
+    clusters = run_on_hosts(module, api_hosts,
+                            lambda host_module: _converge_cluster(host_module, spec, ProxmoxOpenSSHDatacenterAnsible(host_module)),
+                            workers=module.params['api_workers'])
+    changed = any(cluster.get('changed') for cluster in clusters)
+    failed = [cluster['api_host'] for cluster in clusters if cluster['failed']]
+    if failed:
+        module.fail_json(changed=changed, clusters=clusters,
+                         msg="Failed to converge {0} of {1} clusters: {2}".format(len(failed), len(api_hosts), ', '.join(failed)))
+
+    module.exit_json(changed=changed, clusters=clusters,
+                     msg="Converged {0} clusters".format(len(api_hosts)))
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+import time
+import traceback
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (ACL_TYPES, split_list)
+
+YAML_IMP_ERR = None
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+    YAML_IMP_ERR = traceback.format_exc()
+
+# Kinds of drift, in the order they are reported
+DRIFT_KINDS = ('missing_groups', 'unmanaged_groups', 'missing_users', 'unmanaged_users', 'missing_tokens',
+               'unmanaged_tokens', 'expired_tokens', 'missing_acls', 'extra_acls', 'changed_acls')
+
+# Fields of the exported objects, the state is exported in the format of proxmox_datacenter where it can
+GROUP_EXPORT_FIELDS = ('groupid', 'comment')
+USER_EXPORT_FIELDS = ('userid', 'groups', 'comment', 'email', 'enable', 'expire', 'firstname', 'lastname')
+TOKEN_EXPORT_FIELDS = ('userid', 'tokenid', 'comment', 'expire', 'privsep')
+
+
+class CappedList(object):
+    """Keeps the smallest items added, in order, and counts all of them
+
+    Memory stays bounded by twice the limit however many items are added,
+    the kept items are sorted and cut back to the limit when it is exceeded.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.items = []
+
+    def add(self, item):
+        self.count += 1
+        self.items.append(item)
+        if len(self.items) >= 2 * self.limit:
+            self.items = sorted(self.items)[:self.limit]
+
+    def report(self):
+        """:return: dict - the number of items and the smallest ones, sorted"""
+        return {'count': self.count, 'items': sorted(self.items)[:self.limit]}
+
+
+class _Export(object):
+    """Writes the access state as YAML while it is read, one section after the other"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path) or '.'
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, self.tmp = tempfile.mkstemp(dir=directory)
+        self.out = os.fdopen(fd, 'w')
+        # Tokens are read with the users but exported after them
+        self.tokens = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+')
+        self.sections = set()
+
+    def add(self, section, entry):
+        if section == 'acls':
+            self._flush_tokens()
+        out = self.tokens if section == 'tokens' else self.out
+        if section not in self.sections:
+            self.sections.add(section)
+            out.write('{0}:\n'.format(section))
+        out.write(yaml.safe_dump([entry], default_flow_style=False, sort_keys=True))
+
+    def _flush_tokens(self):
+        if self.tokens is not None:
+            self.tokens.seek(0)
+            shutil.copyfileobj(self.tokens, self.out)
+            self.tokens.close()
+            self.tokens = None
+
+    def close(self, keep):
+        self._flush_tokens()
+        for section in ('groups', 'users', 'tokens', 'acls'):
+            if section not in self.sections:
+                self.out.write('{0}: []\n'.format(section))
+        self.out.close()
+        if keep:
+            os.rename(self.tmp, self.path)
+        else:
+            os.remove(self.tmp)
+
+
+class ProxmoxOpenSSHDriftAnsible(ProxmoxOpenSSHAnsible):
+
+    def drift(self, spec, ignore_users=(), limit=100, export=None):
+        """
+        Compare the access configuration with a desired document
+
+        The desired groups, users, tokens and ACL entries are indexed in sets
+        and each current object is looked up as it is streamed from the node,
+        so the ACL list is never held in memory. Only the desired objects that
+        were found and the reported items, at most `limit` of each kind, are
+        kept.
+
+        :param spec: dict - normalized document, see normalize_spec
+        :param ignore_users: list - users, with their tokens, left out of the comparison
+        :param limit: int - maximum number of items reported for each kind of drift
+        :param export: str - path of a YAML file the current state is written to
+        :return: dict - count and sorted items for each kind of drift, see DRIFT_KINDS
+        """
+        report = dict((kind, CappedList(limit)) for kind in DRIFT_KINDS)
+        ignored = set(ignore_users)
+        desired_groups = set(group['groupid'] for group in spec['groups'])
+        desired_users = set(user['userid'] for user in spec['users'])
+        desired_tokens = set('{0}!{1}'.format(token['userid'], token['tokenid']) for token in spec['tokens'])
+        desired_acls = {}
+        for acl in spec['acls']:
+            for option, acl_type in ACL_TYPES:
+                for ugid in acl[option]:
+                    desired_acls[(acl['path'], acl['roleid'], acl_type, ugid)] = int(acl['propagate'])
+        found = set()
+        now = time.time()
+
+        writer = _Export(export) if export else None
+        try:
+            for group in self.get_groups() or []:
+                if writer:
+                    writer.add('groups', dict((key, group[key]) for key in GROUP_EXPORT_FIELDS if group.get(key) not in (None, '')))
+                if group['groupid'] in desired_groups:
+                    found.add(('group', group['groupid']))
+                else:
+                    report['unmanaged_groups'].add(group['groupid'])
+
+            for user in self.iter_users(full=1):
+                userid = user['userid']
+                if writer:
+                    entry = dict((key, user[key]) for key in USER_EXPORT_FIELDS if user.get(key) not in (None, ''))
+                    entry['groups'] = split_list(user.get('groups'))
+                    writer.add('users', entry)
+                for token in user.get('tokens') or []:
+                    full_tokenid = '{0}!{1}'.format(userid, token['tokenid'])
+                    if writer:
+                        writer.add('tokens', dict([('userid', userid)] + [(key, token[key]) for key in TOKEN_EXPORT_FIELDS[1:]
+                                                                          if token.get(key) not in (None, '')]))
+                    if userid in ignored:
+                        continue
+                    if full_tokenid in desired_tokens:
+                        found.add(('token', full_tokenid))
+                    else:
+                        report['unmanaged_tokens'].add(full_tokenid)
+                    if token.get('expire') and int(token['expire']) < now:
+                        report['expired_tokens'].add(full_tokenid)
+                if userid in ignored:
+                    continue
+                if userid in desired_users:
+                    found.add(('user', userid))
+                else:
+                    report['unmanaged_users'].add(userid)
+
+            for acl in self.iter_acls():
+                if writer:
+                    writer.add('acls', dict((key, acl[key]) for key in ('path', 'roleid', 'type', 'ugid', 'propagate')))
+                key = (acl['path'], acl['roleid'], acl['type'], acl['ugid'])
+                if acl['ugid'] in ignored or (acl['type'] == 'token' and acl['ugid'].split('!')[0] in ignored):
+                    continue
+                if key not in desired_acls:
+                    report['extra_acls'].add(':'.join(key))
+                    continue
+                found.add(('acl', key))
+                if int(acl['propagate']) != desired_acls[key]:
+                    report['changed_acls'].add(':'.join(key))
+        except BaseException:
+            if writer:
+                writer.close(False)
+            raise
+        if writer:
+            writer.close(True)
+
+        for groupid in desired_groups:
+            if ('group', groupid) not in found:
+                report['missing_groups'].add(groupid)
+        for userid in desired_users - ignored:
+            if ('user', userid) not in found:
+                report['missing_users'].add(userid)
+        for full_tokenid in desired_tokens:
+            if ('token', full_tokenid) not in found and full_tokenid.split('!')[0] not in ignored:
+                report['missing_tokens'].add(full_tokenid)
+        for key in desired_acls:
+            if ('acl', key) not in found:
+                report['missing_acls'].add(':'.join(key))
+
+        return dict((kind, report[kind].report()) for kind in DRIFT_KINDS)
@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import copy
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+# Seconds a write waits for the lock of the state file, like cfs_lock_file on a node
+FAKE_LOCK_TIMEOUT = 10
+
+FAKE_ROLES = {
+    'Administrator': 'Datastore.Allocate,Datastore.AllocateSpace,Datastore.Audit,Group.Allocate,Permissions.Modify,'
+                     'Pool.Allocate,Pool.Audit,Realm.Allocate,Sys.Audit,Sys.Modify,User.Modify,VM.Allocate,VM.Audit',
+    'NoAccess': '',
+    'PVEAdmin': 'Datastore.Allocate,Datastore.AllocateSpace,Datastore.Audit,Pool.Allocate,Pool.Audit,Sys.Audit,VM.Allocate,VM.Audit',
+    'PVEAuditor': 'Datastore.Audit,Pool.Audit,Sys.Audit,VM.Audit',
+    'PVEDatastoreAdmin': 'Datastore.Allocate,Datastore.AllocateSpace,Datastore.Audit',
+    'PVEDatastoreUser': 'Datastore.AllocateSpace,Datastore.Audit',
+    'PVEPoolAdmin': 'Pool.Allocate,Pool.Audit',
+    'PVEUserAdmin': 'Group.Allocate,User.Modify',
+    'PVEVMAdmin': 'VM.Allocate,VM.Audit',
+}
+
+USER_FIELDS = ('comment', 'email', 'enable', 'expire', 'firstname', 'keys', 'lastname')
+TOKEN_FIELDS = ('comment', 'expire', 'privsep')
+
+
+def fake_initial_state():
+    """
+    State of a freshly installed node
+
+    :return: dict - the state, see ProxmoxOpenSSHFakeSession
+    """
+    return {
+        'version': {'version': '8.2.4', 'release': '8.2', 'repoid': 'fake'},
+        'roles': dict(FAKE_ROLES),
+        'users': {'root@pam': {'enable': 1, 'expire': 0, 'comment': '', 'groups': [], 'tokens': {}}},
+        'groups': {},
+        'acl': [],
+        'pools': {},
+        'storage': {
+            'local': {'type': 'dir', 'path': '/var/lib/vz', 'content': 'backup,iso,vztmpl'},
+        },
+        'serial': 0,
+        'latency': 0,
+        'failures': [],
+    }
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _split(value):
+    return [item for item in re.split(r'[,;\s]+', str(value or '')) if item]
+
+
+class ProxmoxOpenSSHResponse(object):
+    """Response of a request answered without running pvesh
+
+    Has what proxmoxer reads from the responses of its command backends, whose
+    own Response class changed its signature between proxmoxer releases.
+    """
+
+    def __init__(self, content, status_code):
+        self.status_code = status_code
+        self.content = content
+        self.text = str(content)
+        self.headers = {'content-type': 'application/json'}
+
+
+class FakeAPIError(Exception):
+    """An API error, answered with the status code and message the API would use"""
+
+    def __init__(self, status_code, message):
+        super(FakeAPIError, self).__init__(message)
+        self.status_code = status_code
+
+
+class ProxmoxOpenSSHFakeSession(object):
+    """Answers API requests from a JSON state file instead of a cluster
+
+    Implements the parts of the API used by this collection: `/version`,
+    `/access/roles`, `/access/users` with their tokens, `/access/groups`,
+    `/access/acl`, `/pools`, `/cluster/resources` and `/storage`. The fake
+    holds no guests, any VMID can be added to a pool. Every module run on the
+    same state file sees the changes of the previous ones, so playbooks can be
+    run repeatedly without a cluster.
+
+    Writes are serialized with a lock on the state file and check the
+    `digest` parameter against the digest of the `user.cfg` or `storage.cfg`
+    section they change, as pmxcfs does.
+
+    Besides the API objects, the state file may hold `latency`, the seconds
+    each request takes, or a dict of them by node, `down`, the nodes of an
+    api_host list that can't be reached, and `failures`, a list of injected
+    errors. A failure is a dict with a `path` regex, and optionally `method`,
+    `status` (default 500), `message` and `times`, the number of matching
+    requests that fail before the failure is used up. Files written on the
+    node, like the state marker of proxmox_datacenter, are kept in `files`.
+    """
+
+    # No connection is made for a request
+    persistent = True
+
+    def __init__(self, state_path, timeout=FAKE_LOCK_TIMEOUT, node=None):
+        self.state_path = os.path.expanduser(state_path)
+        self.timeout = timeout
+        # The node of the cluster the requests are sent to
+        self.node = node
+        self.sudo = False
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+
+    def _lock(self, exclusive):
+        lock = open(self.state_path + '.lock', 'a')
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fcntl.flock(lock, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+                return lock
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES) or time.time() > deadline:
+                    lock.close()
+                    raise FakeAPIError(500, "can't lock file '{0}' - got timeout".format(self.state_path))
+                time.sleep(0.05)
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, OSError):
+            return fake_initial_state()
+
+    def _save(self, state):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.state_path) or '.')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.rename(tmp, self.state_path)
+
+    @staticmethod
+    def digest(state, section):
+        """
+        Digest of the part of the state held in one pmxcfs file
+
+        :param section: str - `user.cfg` or `storage.cfg`
+        :return: str - sha1 hex digest
+        """
+        if section == 'storage.cfg':
+            content = state['storage']
+        else:
+            content = [state['users'], state['groups'], state['acl'], state.get('pools', {})]
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def config_digests(self, files):
+        """
+        Digests of the pmxcfs configuration files, as ProxmoxOpenSSHAnsible.config_digests
+
+        :param files: list - absolute paths of the files
+        :return: dict - digest for each file, None for a file the fake does not hold
+        """
+        lock = self._lock(False)
+        try:
+            state = self._load()
+        finally:
+            lock.close()
+        return dict((path, self.digest(state, os.path.basename(path))
+                     if os.path.basename(path) in ('user.cfg', 'storage.cfg') else None) for path in files)
+
+    def read_config_files(self, files):
+        """
+        Files of the node, as ProxmoxOpenSSHAnsible.read_config_files
+
+        `/etc/pve/.version` holds the number of writes to `user.cfg` and
+        `storage.cfg` as their versions, other files are the ones written by
+        write_config_file.
+
+        :param files: list - absolute paths of the files
+        :return: dict - content of each file, None for a missing file
+        """
+        lock = self._lock(False)
+        try:
+            state = self._load()
+        finally:
+            lock.close()
+        contents = {}
+        for path in files:
+            if path == '/etc/pve/.version':
+                contents[path] = json.dumps(dict((section, state.get('versions', {}).get(section, 0)) for section in ('user.cfg', 'storage.cfg')))
+            else:
+                contents[path] = state.get('files', {}).get(path)
+        return contents
+
+    def write_config_file(self, path, content):
+        """Keep a file in the state, as ProxmoxOpenSSHAnsible.write_config_file"""
+        lock = self._lock(True)
+        try:
+            state = self._load()
+            state.setdefault('files', {})[path] = content
+            self._save(state)
+        finally:
+            lock.close()
+
+    def _injected(self, state, method, url):
+        for failure in state.get('failures', []):
+            if failure.get('method', method).upper() != method or not re.search(failure['path'], url):
+                continue
+            if failure.get('times') is not None and failure['times'] <= 0:
+                continue
+            return failure
+        return None
+
+    @staticmethod
+    def _failure(failure, method, url):
+        return FakeAPIError(failure.get('status', 500), failure.get('message', 'injected failure for {0} {1}'.format(method, url)))
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        method = method.upper()
+        path = '/' + url.strip().strip('/')
+        args = dict(params or {}, **(data or {}))
+        try:
+            # Reads share the lock unless they use up an injected failure
+            lock = self._lock(method != 'GET')
+            try:
+                state = self._load()
+                failure = self._injected(state, method, path)
+                if method == 'GET' and failure and failure.get('times') is not None:
+                    lock.close()
+                    lock = self._lock(True)
+                    state = self._load()
+                    failure = self._injected(state, method, path)
+                if method == 'GET' and (not failure or failure.get('times') is None):
+                    lock.close()
+                if self.node in state.get('down', []):
+                    raise IOError('ssh: connect to host {0} port 22: Connection refused'.format(self.node))
+                # A write holds the lock while the node would be working on it
+                latency = state.get('latency', 0)
+                time.sleep(latency.get(self.node, 0) if isinstance(latency, dict) else latency)
+                if failure:
+                    if failure.get('times') is not None:
+                        failure['times'] -= 1
+                        self._save(state)
+                    raise self._failure(failure, method, path)
+                if method == 'GET':
+                    result = self.read(state, path, args)
+                else:
+                    result = self.write(state, method, path, args)
+                    self._save(state)
+            finally:
+                lock.close()
+        except FakeAPIError as e:
+            return ProxmoxOpenSSHResponse(str(e), e.status_code)
+        return ProxmoxOpenSSHResponse(json.dumps(result), 200)
+
+    def read(self, state, path, args):
+        """
+        Answer a GET request
+
+        :param state: dict - the current state
+        :param path: str - the API path
+        :param args: dict - the request parameters
+        :return: the decoded response
+        """
+        parts = path.strip('/').split('/')
+        if path == '/version':
+            return state['version']
+        if path == '/access/roles':
+            return [{'roleid': roleid, 'privs': privs, 'special': 1 if roleid in FAKE_ROLES else 0}
+                    for roleid, privs in sorted(state['roles'].items())]
+        if path == '/access/users':
+            users = []
+            for userid, user in sorted(state['users'].items()):
+                entry = dict((key, user[key]) for key in USER_FIELDS if key in user)
+                entry.update(userid=userid, groups=','.join(user['groups']))
+                if _flag(args.get('full', 0)):
+                    entry['tokens'] = [dict(token, tokenid=tokenid) for tokenid, token in sorted(user['tokens'].items())]
+                if not _flag(args.get('enabled', 0)) or _flag(entry.get('enable', 1)):
+                    users.append(entry)
+            return users
+        if parts[:2] == ['access', 'users'] and len(parts) == 3:
+            user = self._user(state, parts[2])
+            return dict(dict((key, user[key]) for key in USER_FIELDS if key in user),
+                        groups=list(user['groups']), tokens=copy.deepcopy(user['tokens']))
+        if parts[:2] == ['access', 'users'] and len(parts) == 4 and parts[3] == 'token':
+            return [dict(token, tokenid=tokenid) for tokenid, token in sorted(self._user(state, parts[2])['tokens'].items())]
+        if parts[:2] == ['access', 'users'] and len(parts) == 5 and parts[3] == 'token':
+            return dict(self._token(state, parts[2], parts[4]))
+        if path == '/access/groups':
+            return [dict(state['groups'][groupid], groupid=groupid, users=','.join(self._members(state, groupid)))
+                    for groupid in sorted(state['groups'])]
+        if parts[:2] == ['access', 'groups'] and len(parts) == 3:
+            return dict(self._group(state, parts[2]), members=self._members(state, parts[2]))
+        if path == '/access/acl':
+            return copy.deepcopy(state['acl'])
+        if path == '/pools':
+            return [{'poolid': poolid, 'comment': pool.get('comment', '')} for poolid, pool in sorted(state.get('pools', {}).items())]
+        if parts[0] == 'pools' and len(parts) == 2:
+            pool = self._pool(state, parts[1])
+            members = [{'id': 'qemu/{0}'.format(vmid), 'vmid': vmid, 'type': 'qemu', 'node': 'fake'} for vmid in pool['vms']]
+            members += [{'id': 'storage/fake/{0}'.format(storageid), 'storage': storageid, 'type': 'storage', 'node': 'fake'}
+                        for storageid in pool['storage']]
+            return {'comment': pool.get('comment', ''), 'members': members}
+        if path == '/cluster/resources':
+            # Only the guests of pools, as the fake holds no other guests
+            guests = [{'id': 'qemu/{0}'.format(vmid), 'vmid': vmid, 'type': 'qemu', 'node': 'fake', 'pool': poolid}
+                      for poolid, pool in sorted(state.get('pools', {}).items()) for vmid in pool['vms']]
+            return guests if args.get('type', 'vm') == 'vm' else []
+        if path == '/storage':
+            return [dict(storage, storage=storageid, digest=self.digest(state, 'storage.cfg'))
+                    for storageid, storage in sorted(state['storage'].items())
+                    if not args.get('type') or storage['type'] == args['type']]
+        if parts[0] == 'storage' and len(parts) == 2:
+            return dict(self._storage(state, parts[1]), storage=parts[1], digest=self.digest(state, 'storage.cfg'))
+        raise FakeAPIError(501, "Method 'GET {0}' not implemented".format(path))
+
+    def write(self, state, method, path, args):
+        """
+        Apply a POST, PUT or DELETE request to the state
+
+        :param state: dict - the current state, changed in place
+        :param method: str - the HTTP method
+        :param path: str - the API path
+        :param args: dict - the request parameters
+        :return: the decoded response
+        """
+        parts = path.strip('/').split('/')
+        section = 'storage.cfg' if parts[0] == 'storage' else 'user.cfg'
+        if args.get('digest') and args['digest'] != self.digest(state, section):
+            raise FakeAPIError(500, 'detected modified configuration - file changed by other user? Try again.')
+        # Like the version counters of pmxcfs, only kept when the write succeeds
+        versions = state.setdefault('versions', {})
+        versions[section] = versions.get(section, 0) + 1
+
+        if (method, path) == ('POST', '/access/users'):
+            userid = self._required(args, 'userid')
+            if userid in state['users']:
+                raise FakeAPIError(500, "create user failed: user '{0}' already exists".format(userid))
+            groups = _split(args.get('groups'))
+            for groupid in groups:
+                self._group(state, groupid)
+            user = dict((key, args[key]) for key in USER_FIELDS if key in args)
+            user.setdefault('enable', 1)
+            user.setdefault('expire', 0)
+            user.update(groups=groups, tokens={})
+            state['users'][userid] = user
+            return None
+        if parts[:2] == ['access', 'users'] and len(parts) == 3 and method == 'PUT':
+            user = self._user(state, parts[2])
+            if 'groups' in args:
+                groups = _split(args['groups'])
+                for groupid in groups:
+                    self._group(state, groupid)
+                if _flag(args.get('append', 0)):
+                    groups = user['groups'] + [groupid for groupid in groups if groupid not in user['groups']]
+                user['groups'] = groups
+            user.update((key, args[key]) for key in USER_FIELDS if key in args)
+            return None
+        if parts[:2] == ['access', 'users'] and len(parts) == 3 and method == 'DELETE':
+            self._user(state, parts[2])
+            del state['users'][parts[2]]
+            state['acl'] = [acl for acl in state['acl'] if acl['ugid'] != parts[2] and not acl['ugid'].startswith(parts[2] + '!')]
+            return None
+
+        if parts[:2] == ['access', 'users'] and len(parts) == 5 and parts[3] == 'token':
+            userid, tokenid = parts[2], parts[4]
+            user = self._user(state, userid)
+            if method == 'POST':
+                if tokenid in user['tokens']:
+                    raise FakeAPIError(500, 'Token already exists.')
+                token = dict((key, args[key]) for key in TOKEN_FIELDS if key in args)
+                token.setdefault('expire', 0)
+                token['privsep'] = int(_flag(token.get('privsep', 1)))
+                user['tokens'][tokenid] = token
+                state['serial'] = state.get('serial', 0) + 1
+                full_tokenid = '{0}!{1}'.format(userid, tokenid)
+                value = str(uuid.uuid5(uuid.NAMESPACE_URL, '{0}#{1}'.format(full_tokenid, state['serial'])))
+                return {'full-tokenid': full_tokenid, 'info': dict(token), 'value': value}
+            token = self._token(state, userid, tokenid)
+            if method == 'PUT':
+                token.update((key, args[key]) for key in TOKEN_FIELDS if key in args)
+                if 'privsep' in args:
+                    token['privsep'] = int(_flag(args['privsep']))
+                return dict(token)
+            del user['tokens'][tokenid]
+            full_tokenid = '{0}!{1}'.format(userid, tokenid)
+            state['acl'] = [acl for acl in state['acl'] if acl['ugid'] != full_tokenid]
+            return None
+
+        if (method, path) == ('POST', '/access/groups'):
+            groupid = self._required(args, 'groupid')
+            if groupid in state['groups']:
+                raise FakeAPIError(500, "create group failed: group '{0}' already exists".format(groupid))
+            state['groups'][groupid] = dict((key, args[key]) for key in ('comment',) if key in args)
+            return None
+        if parts[:2] == ['access', 'groups'] and len(parts) == 3 and method == 'PUT':
+            self._group(state, parts[2]).update((key, args[key]) for key in ('comment',) if key in args)
+            return None
+        if parts[:2] == ['access', 'groups'] and len(parts) == 3 and method == 'DELETE':
+            self._group(state, parts[2])
+            del state['groups'][parts[2]]
+            for user in state['users'].values():
+                user['groups'] = [groupid for groupid in user['groups'] if groupid != parts[2]]
+            state['acl'] = [acl for acl in state['acl'] if not (acl['type'] == 'group' and acl['ugid'] == parts[2])]
+            return None
+
+        if (method, path) == ('PUT', '/access/acl'):
+            self._set_acl(state, args)
+            return None
+
+        if (method, path) == ('POST', '/pools'):
+            poolid = self._required(args, 'poolid')
+            if poolid in state.setdefault('pools', {}):
+                raise FakeAPIError(500, "create pool failed: pool '{0}' already exists".format(poolid))
+            state['pools'][poolid] = {'comment': args.get('comment') or '', 'vms': [], 'storage': []}
+            return None
+        if parts[0] == 'pools' and len(parts) == 2 and method == 'PUT':
+            self._update_pool(state, parts[1], args)
+            return None
+        if parts[0] == 'pools' and len(parts) == 2 and method == 'DELETE':
+            pool = self._pool(state, parts[1])
+            if pool['vms'] or pool['storage']:
+                raise FakeAPIError(500, "delete pool failed: pool '{0}' is not empty".format(parts[1]))
+            del state['pools'][parts[1]]
+            state['acl'] = [acl for acl in state['acl'] if acl['path'] != '/pool/{0}'.format(parts[1])]
+            return None
+
+        if (method, path) == ('POST', '/storage'):
+            storageid = self._required(args, 'storage')
+            storage_type = self._required(args, 'type')
+            if storageid in state['storage']:
+                raise FakeAPIError(500, "create storage failed: storage ID '{0}' already defined".format(storageid))
+            options = dict((key, value) for key, value in args.items() if key not in ('storage', 'type', 'digest'))
+            state['storage'][storageid] = dict(options, type=storage_type)
+            return {'storage': storageid, 'type': storage_type}
+        if parts[0] == 'storage' and len(parts) == 2 and method == 'PUT':
+            storage = self._storage(state, parts[1])
+            for key in _split(args.get('delete')):
+                storage.pop(key, None)
+            storage.update((key, value) for key, value in args.items() if key not in ('delete', 'digest', 'type'))
+            return {'storage': parts[1], 'type': storage['type']}
+        if parts[0] == 'storage' and len(parts) == 2 and method == 'DELETE':
+            self._storage(state, parts[1])
+            del state['storage'][parts[1]]
+            return None
+
+        raise FakeAPIError(501, "Method '{0} {1}' not implemented".format(method, path))
+
+    def _set_acl(self, state, args):
+        path = self._required(args, 'path')
+        roles = _split(self._required(args, 'roles'))
+        propagate = int(_flag(args.get('propagate', 1)))
+        delete = _flag(args.get('delete', 0))
+        principals = []
+        for option, acl_type in (('groups', 'group'), ('tokens', 'token'), ('users', 'user')):
+            for ugid in _split(args.get(option)):
+                if not delete:
+                    if acl_type == 'group':
+                        self._group(state, ugid)
+                    elif acl_type == 'token' and '!' in ugid:
+                        self._token(state, *ugid.split('!', 1))
+                    else:
+                        self._user(state, ugid)
+                principals.append((acl_type, ugid))
+        for roleid in roles:
+            if roleid not in state['roles']:
+                raise FakeAPIError(500, "role '{0}' does not exist".format(roleid))
+
+        keys = set((path, roleid, acl_type, ugid) for roleid in roles for acl_type, ugid in principals)
+        state['acl'] = [acl for acl in state['acl'] if (acl['path'], acl['roleid'], acl['type'], acl['ugid']) not in keys]
+        if not delete:
+            state['acl'].extend({'path': path, 'roleid': roleid, 'type': acl_type, 'ugid': ugid, 'propagate': propagate}
+                                for path, roleid, acl_type, ugid in sorted(keys))
+        state['acl'].sort(key=lambda acl: (acl['path'], acl['type'], acl['ugid'], acl['roleid']))
+
+    def _update_pool(self, state, poolid, args):
+        pool = self._pool(state, poolid)
+        if 'comment' in args:
+            pool['comment'] = args['comment'] or ''
+        delete = _flag(args.get('delete', 0))
+        for vmid in [int(vmid) for vmid in _split(args.get('vms'))]:
+            if delete:
+                if vmid not in pool['vms']:
+                    raise FakeAPIError(500, "update pools failed: VM {0} is not a pool member".format(vmid))
+                pool['vms'].remove(vmid)
+                continue
+            for other, other_pool in state['pools'].items():
+                if other != poolid and vmid in other_pool['vms']:
+                    if not _flag(args.get('allow-move', 0)):
+                        raise FakeAPIError(500, "update pools failed: VM {0} belongs already to pool '{1}' "
+                                                "and allow-move is not set".format(vmid, other))
+                    other_pool['vms'].remove(vmid)
+            if vmid not in pool['vms']:
+                pool['vms'] = sorted(pool['vms'] + [vmid])
+        for storageid in _split(args.get('storage')):
+            if delete:
+                if storageid not in pool['storage']:
+                    raise FakeAPIError(500, "update pools failed: storage '{0}' is not a pool member".format(storageid))
+                pool['storage'].remove(storageid)
+                continue
+            self._storage(state, storageid)
+            if storageid not in pool['storage']:
+                pool['storage'] = sorted(pool['storage'] + [storageid])
+
+    @staticmethod
+    def _required(args, key):
+        if args.get(key) in (None, ''):
+            raise FakeAPIError(400, 'Parameter verification failed.\n{0}: property is missing and it is not optional'.format(key))
+        return args[key]
+
+    @staticmethod
+    def _members(state, groupid):
+        return sorted(userid for userid, user in state['users'].items() if groupid in user['groups'])
+
+    @staticmethod
+    def _user(state, userid):
+        if userid not in state['users']:
+            raise FakeAPIError(500, "no such user ('{0}')".format(userid))
+        return state['users'][userid]
+
+    @classmethod
+    def _token(cls, state, userid, tokenid):
+        user = cls._user(state, userid)
+        if tokenid not in user['tokens']:
+            raise FakeAPIError(500, "no such token '{0}' for user '{1}'".format(tokenid, userid))
+        return user['tokens'][tokenid]
+
+    @staticmethod
+    def _group(state, groupid):
+        if groupid not in state['groups']:
+            raise FakeAPIError(500, "group '{0}' does not exist".format(groupid))
+        return state['groups'][groupid]
+
+    @staticmethod
+    def _pool(state, poolid):
+        if poolid not in state.get('pools', {}):
+            raise FakeAPIError(500, "pool '{0}' does not exist".format(poolid))
+        return state['pools'][poolid]
+
+    @staticmethod
+    def _storage(state, storageid):
+        if storageid not in state['storage']:
+            raise FakeAPIError(500, "storage '{0}' does not exist".format(storageid))
+        return state['storage'][storageid]
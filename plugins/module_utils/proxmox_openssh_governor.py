@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import contextlib
+import errno
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Seconds between two attempts to take a write slot, doubled up to the maximum
+SLOT_POLL = 0.02
+SLOT_POLL_MAX = 0.5
+
+
+class ProxmoxOpenSSHGovernor(object):
+    """Limits the writes made to one cluster by all the module runs of the controller
+
+    Every Ansible fork runs its module in its own process, so the limits are
+    kept in files below `lock_dir`, one set for each cluster key. A write
+    first takes a token from a bucket refilled at `rate` tokens per second,
+    holding at most one second of tokens, then one of `concurrency` slots,
+    each a file locked with flock for the length of the write. The locks are
+    released by the system when a process dies. Threads of one run are
+    limited as well, each opens its own slot file.
+    """
+
+    def __init__(self, lock_dir, cluster, concurrency=None, rate=None):
+        """
+        :param lock_dir: str - directory of the slot and bucket files, on the controller
+        :param cluster: str - key of the cluster, file name safe
+        :param concurrency: int - writes at the same time, None for no limit
+        :param rate: float - writes per second, None for no limit
+        """
+        self.lock_dir = os.path.expanduser(lock_dir)
+        self.cluster = cluster
+        self.concurrency = concurrency
+        self.rate = rate
+        if not os.path.isdir(self.lock_dir):
+            try:
+                os.makedirs(self.lock_dir, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def _open(self, name):
+        fd = os.open(os.path.join(self.lock_dir, '{0}.{1}'.format(self.cluster, name)), os.O_RDWR | os.O_CREAT, 0o600)
+        return os.fdopen(fd, 'r+')
+
+    def _take_token(self):
+        """Reserve a token of the bucket and return the seconds to wait for it"""
+        with self._open('bucket') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                bucket = json.loads(f.read())
+                tokens = min(max(1.0, self.rate), bucket['tokens'] + (now - bucket['time']) * self.rate)
+            except (ValueError, KeyError, TypeError):
+                tokens = max(1.0, self.rate)
+            # A deficit is waited out by the run that made it, the next run waits behind it
+            tokens -= 1
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps({'tokens': tokens, 'time': now}))
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def _take_slot(self):
+        """Lock one of the slot files, waiting until one is free"""
+        poll = SLOT_POLL
+        while True:
+            for slot in range(self.concurrency):
+                f = self._open('slot{0}'.format(slot))
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return f
+                except (IOError, OSError) as e:
+                    f.close()
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+            time.sleep(poll)
+            poll = min(poll * 2, SLOT_POLL_MAX)
+
+    @contextlib.contextmanager
+    def write(self):
+        """
+        Hold the cluster for one write
+
+        :return: context manager - yields the seconds waited once the write may start
+        """
+        start = time.time()
+        if self.rate:
+            delay = self._take_token()
+            if delay:
+                time.sleep(delay)
+        slot = self._take_slot() if self.concurrency else None
+        try:
+            yield time.time() - start
+        finally:
+            if slot is not None:
+                slot.close()
+
+
+class ProxmoxOpenSSHGovernorSession(object):
+    """Wraps a proxmoxer session and passes its writes through a ProxmoxOpenSSHGovernor
+
+    Reads are not limited. The seconds writes waited for the governor are
+    added up in `wait`.
+    """
+
+    def __init__(self, session, governor):
+        self.session = session
+        self.governor = governor
+        self.wait = 0.0
+        self.writes = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def governed(self, write, *args, **kwargs):
+        """
+        Make a write once the governor allows it
+
+        :param write: callable - the write
+        :return: the result of the write
+        """
+        with self.governor.write() as waited:
+            with self.lock:
+                self.wait += waited
+                self.writes += 1
+            return write(*args, **kwargs)
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        if method.upper() == 'GET':
+            return self.session.request(method, url, data=data, params=params, headers=headers)
+        return self.governed(self.session.request, method, url, data=data, params=params, headers=headers)
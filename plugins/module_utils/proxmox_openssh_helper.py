@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import threading
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_fake import (ProxmoxOpenSSHResponse)
+
+# Serves API requests read as JSON lines from stdin with the API handlers pvesh uses,
+# without loading the Perl API stack again for every request. Output of the handlers
+# goes to stderr so stdout only carries responses.
+HELPER_SCRIPT = r'''
+use strict;
+use warnings;
+use IO::Handle;
+use JSON;
+use PVE::API2;
+use PVE::Cluster;
+use PVE::Exception;
+use PVE::RPCEnvironment;
+
+open(my $out, '>&', \*STDOUT) or die "unable to dup stdout: $!\n";
+open(STDOUT, '>&', \*STDERR) or die "unable to redirect stdout: $!\n";
+$out->autoflush(1);
+
+PVE::RPCEnvironment->setup_default_cli_env();
+my $rpcenv = PVE::RPCEnvironment::get();
+my $json = JSON->new->utf8->canonical->allow_nonref->allow_blessed->convert_blessed;
+
+print $out $json->encode({ id => 0, status => 200, data => { helper => 1 } }), "\n";
+
+while (defined(my $line = <STDIN>)) {
+    next if $line !~ m/\S/;
+    my $request = eval { $json->decode($line) };
+    if (!$request) {
+        print $out $json->encode({ id => undef, status => 400, message => "invalid request: $@" }), "\n";
+        next;
+    }
+    my $response = { id => $request->{id} };
+    eval {
+        PVE::Cluster::cfs_update();
+        $rpcenv->init_request();
+        my $uri_param = {};
+        my ($handler, $info) = PVE::API2->find_handler($request->{method}, $request->{path}, $uri_param);
+        die PVE::Exception->new("Method '$request->{method} $request->{path}' not implemented\n", code => 501)
+            if !$handler || !$info;
+        my $param = { %{ $request->{params} || {} }, %$uri_param };
+        $response->{data} = $handler->handle($info, $param);
+        $response->{status} = 200;
+    };
+    if (my $err = $@) {
+        my $message = ref($err) && defined($err->{msg}) ? $err->{msg} : "$err";
+        chomp $message;
+        if (ref($err) && ref($err->{errors}) eq 'HASH') {
+            $message .= join('', map { "\n$_: $err->{errors}->{$_}" } sort keys %{ $err->{errors} });
+        }
+        $response->{status} = ref($err) && $err->{code} ? $err->{code} : 500;
+        $response->{message} = $message;
+    }
+    print $out $json->encode($response), "\n";
+}
+'''
+
+
+class ProxmoxOpenSSHHelperSession(object):
+    """Sends API requests to a helper process on the node instead of running pvesh for each
+
+    The helper is started over the SSH connection of the backend and stays
+    alive until the module ends. Requests and responses are JSON lines, one
+    request is in flight at a time. Everything else, like the remote commands
+    of remote_exec, still goes to the wrapped pvesh session.
+
+    When the helper breaks during a request it is ended with a warning and the
+    requests go to pvesh. A read that was in flight is sent again with pvesh,
+    the outcome of a write that was in flight is unknown and it fails.
+    """
+
+    # Requests reuse the connection of the helper and are answered by a process already running
+    persistent = True
+    resident = True
+
+    def __init__(self, session, timeout=None, warn=None):
+        self.session = session
+        # Each request may take as long as a request sent with pvesh
+        self.timeout = timeout or session.timeout
+        self.warn = warn
+        self.lock = threading.Lock()
+        self.buffer = b''
+        self.next_id = 1
+        self.broken = False
+        cmd = ['perl', '-e', HELPER_SCRIPT]
+        if session.sudo:
+            cmd = ['sudo'] + cmd
+        self.stream = session.stream_command(cmd, interactive=True)
+        try:
+            # Loading the API stack takes a few seconds
+            ready = self._receive(max(self.timeout, 30))
+        except Exception:
+            self.close()
+            raise
+        if ready.get('status') != 200:
+            self.close()
+            raise IOError('Unexpected answer from the API helper: {0}'.format(ready))
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def _receive(self, timeout):
+        while b'\n' not in self.buffer:
+            data = self.stream.read(65536, timeout=timeout)
+            if not data:
+                returncode, stderr = self.stream.wait()
+                raise IOError('The API helper ended with status {0}: {1}'.format(returncode, stderr))
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return json.loads(line.decode('utf-8'))
+
+    def request(self, method, url, data=None, params=None, headers=None):
+        # Values are passed as strings, as pvesh gets them on its command line
+        args = dict((key, str(value)) for key, value in dict(params or {}, **(data or {})).items())
+        with self.lock:
+            if self.broken:
+                return self.session.request(method, url, data=data, params=params, headers=headers)
+            request_id = self.next_id
+            self.next_id += 1
+            response = None
+            try:
+                self.stream.send(json.dumps({'id': request_id, 'method': method.upper(), 'path': url, 'params': args}).encode('utf-8') + b'\n')
+                response = self._receive(self.timeout)
+                if response.get('id') != request_id:
+                    raise IOError('The API helper answered request {0} instead of {1}'.format(response.get('id'), request_id))
+            except Exception as e:
+                # A late answer would be taken for the next request, later requests use pvesh
+                self.broken = True
+                self.close()
+                if self.warn is not None:
+                    self.warn('The API helper failed on {0} {1}, using pvesh: {2}'.format(method.upper(), url, e))
+                if method.upper() != 'GET':
+                    raise IOError('The API helper failed during {0} {1}, whether it was applied is unknown: {2}'.format(
+                        method.upper(), url, e))
+        if response is None:
+            return self.session.request(method, url, data=data, params=params, headers=headers)
+        if response['status'] >= 400:
+            return ProxmoxOpenSSHResponse(response.get('message', ''), response['status'])
+        return ProxmoxOpenSSHResponse(json.dumps(response.get('data')), response['status'])
+
+    def close(self):
+        """End the helper, it also ends by itself when the connection closes"""
+        self.stream.close()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (split_list)
+
+
+class _PathNode(object):
+    """A path component of the ACL tree with the roles set on it, by principal type and ID"""
+
+    __slots__ = ('children', 'acls')
+
+    def __init__(self):
+        self.children = {}
+        # type -> ugid -> roleid -> propagate
+        self.acls = {'token': {}, 'user': {}, 'group': {}}
+
+
+def _components(path):
+    """Components of an ACL path from the root, '/' itself is ['']"""
+    return [''] + [part for part in path.strip('/').split('/') if part]
+
+
+class PermissionTrie(object):
+    """Effective privileges of users and API tokens computed from one snapshot
+
+    Follows PVE::AccessControl::roles: the path is walked from `/` and at
+    every level that grants roles to the principal, the roles found there
+    replace the ones inherited from above. Entries of a level above the path
+    only count when they propagate. At a level, roles of a token or user
+    override the roles of the groups of the user, and `NoAccess` overrides
+    every other role. `root@pam` has every privilege. A token without
+    `privsep` has the privileges of its user, with `privsep` only the
+    privileges both the token and its user have.
+
+    A guest that is member of a pool is also checked on the `/pool/<poolid>`
+    path. As in PVE::RPCEnvironment::check_vm_perm the two paths are checked
+    one by one, the required privileges must all be granted on one of them.
+    """
+
+    def __init__(self, acls, roles, users, pools=None):
+        """
+        :param acls: list - ACL entries as returned by /access/acl
+        :param roles: list - roles as returned by /access/roles
+        :param users: list - users as returned by /access/users with full=1
+        :param pools: dict - pool ID of the guests that are members of a pool, by VMID
+        """
+        self.root = _PathNode()
+        for acl in acls:
+            node = self.root
+            for part in _components(acl['path'])[1:]:
+                node = node.children.setdefault(part, _PathNode())
+            node.acls[acl['type']].setdefault(acl['ugid'], {})[acl['roleid']] = int(acl['propagate'])
+
+        self.role_privileges = dict((role['roleid'], frozenset(split_list(role.get('privs')))) for role in roles)
+        self.all_privileges = frozenset(privilege for privileges in self.role_privileges.values() for privilege in privileges)
+        self.user_groups = {}
+        self.tokens = {}
+        for user in users:
+            self.user_groups[user['userid']] = frozenset(split_list(user.get('groups')))
+            for token in user.get('tokens') or []:
+                self.tokens['{0}!{1}'.format(user['userid'], token['tokenid'])] = bool(int(token.get('privsep', 1)))
+        self.pools = dict((str(vmid), poolid) for vmid, poolid in (pools or {}).items())
+        self._cache = {}
+
+    def roles(self, principal, path):
+        """
+        Roles of a user or API token on a path
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :param path: str - ACL path, for example /vms/123
+        :return: dict - propagate flag by role ID
+        """
+        if principal == 'root@pam':
+            return {'Administrator': 1}
+        if '!' in principal:
+            if principal not in self.tokens:
+                return {}
+            if not self.tokens[principal]:
+                return self.roles(principal.split('!', 1)[0], path)
+            kind = 'token'
+            groups = frozenset()
+        else:
+            if principal not in self.user_groups:
+                return {}
+            kind = 'user'
+            groups = self.user_groups[principal]
+
+        roles = {}
+        node = self.root
+        parts = _components(path)
+        for depth, part in enumerate(parts):
+            if depth:
+                node = node.children.get(part)
+                if node is None:
+                    break
+            final = depth == len(parts) - 1
+            found = self._level(node.acls[kind].get(principal, {}), final)
+            if found is None:
+                for groupid in groups & set(node.acls['group']):
+                    for roleid, propagate in (self._level(node.acls['group'][groupid], final) or {}).items():
+                        found = found or {}
+                        found[roleid] = propagate
+            if found is not None:
+                roles = found
+
+        if 'NoAccess' in roles:
+            return {'NoAccess': roles['NoAccess']}
+        return roles
+
+    @staticmethod
+    def _level(acls, final):
+        found = dict((roleid, propagate) for roleid, propagate in acls.items() if final or propagate)
+        return found or None
+
+    def _path_privileges(self, principal, path):
+        if principal == 'root@pam':
+            return self.all_privileges
+        privileges = set()
+        for roleid in self.roles(principal, path):
+            privileges |= self.role_privileges.get(roleid, frozenset())
+        if '!' in principal and self.tokens.get(principal):
+            privileges &= self._path_privileges(principal.split('!', 1)[0], path)
+        return frozenset(privileges)
+
+    def checked_paths(self, path):
+        """
+        Paths the API checks for a path
+
+        :param path: str - ACL path, for example /vms/123
+        :return: list - the path, and the path of its pool for a guest that is member of one
+        """
+        path = '/' + path.strip('/')
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'vms' and parts[1] in self.pools:
+            return [path, '/pool/' + self.pools[parts[1]]]
+        return [path]
+
+    def path_privileges(self, principal, path):
+        """
+        Effective privileges of a user or API token on each path the API checks
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :param path: str - ACL path, for example /vms/123
+        :return: list - tuples of a checked path and its privileges as a frozenset
+        """
+        result = []
+        for checked in self.checked_paths(path):
+            key = (principal, checked)
+            if key not in self._cache:
+                self._cache[key] = self._path_privileges(principal, checked)
+            result.append((checked, self._cache[key]))
+        return result
+
+    def privileges(self, principal, path):
+        """
+        Privileges of a user or API token on a path or on the pool of a guest
+
+        Use check() to know if privileges are granted together, they may be
+        split across the two paths of a guest.
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :param path: str - ACL path, for example /vms/123
+        :return: frozenset - the privileges
+        """
+        return frozenset().union(*[privileges for checked, privileges in self.path_privileges(principal, path)])
+
+    def path_roles(self, principal, path):
+        """
+        Roles of a user or API token on a path and on the pool of a guest
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :param path: str - ACL path, for example /vms/123
+        :return: set - the role IDs
+        """
+        return set(roleid for checked in self.checked_paths(path) for roleid in self.roles(principal, checked))
+
+    def check(self, principal, path, required):
+        """
+        Check if a user or API token has all the required privileges on one of the paths the API checks
+
+        :param principal: str - user ID, or token ID as user@realm!token
+        :param path: str - ACL path, for example /vms/123
+        :param required: iterable - privilege names
+        :return: tuple - bool if allowed, sorted list of the privileges missing on the checked path that lacks the fewest
+        """
+        required = set(required)
+        missing = min((sorted(required - privileges) for checked, privileges in self.path_privileges(principal, path)), key=len)
+        return not missing, missing
+
+
+class ProxmoxOpenSSHPermissionAnsible(ProxmoxOpenSSHAnsible):
+
+    def permission_trie(self, pools=False):
+        """
+        Read the ACLs, roles and users with one remote call and index them
+
+        :param pools: bool - also read the pools of the guests from /cluster/resources
+        :return: PermissionTrie - the engine for any number of queries
+        """
+        paths = ['/access/acl', '/access/roles', ('/access/users', {'full': 1})]
+        if pools:
+            paths.append(('/cluster/resources', {'type': 'vm'}))
+        try:
+            results = self.get_many(paths)
+        except Exception as e:
+            self.module.fail_json(msg="Unable to read the access configuration: {0}".format(e))
+
+        guest_pools = None
+        if pools:
+            guest_pools = dict((guest['vmid'], guest['pool']) for guest in results[3] or [] if guest.get('pool'))
+        return PermissionTrie(results[0] or [], results[1] or [], results[2] or [], guest_pools)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import re
+import time
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    ProxmoxOpenSSHCache, api_host_nodes, default_cache_dir, resolve_api_port)
+
+# The API viewer shipped on every PVE node embeds the full API schema, pveproxy serves it below /pve-docs
+APIDOC_PATH = '/usr/share/pve-docs/api-viewer/apidoc.js'
+APIDOC_URL_PATH = '/pve-docs/api-viewer/apidoc.js'
+
+# Only the parts of the schema used by this collection are kept in the cache
+SCHEMA_PREFIXES = ('/access', '/pools', '/storage')
+
+# Schemas never change for a pve-manager version, the version of a host is checked again after a day
+HOST_TTL = 24 * 60 * 60
+
+PARAMETER_KEYS = ('type', 'enum', 'format', 'pattern', 'optional', 'minimum', 'maximum', 'maxLength', 'typetext', 'default')
+
+# Version of the parsed schema format, schemas cached in an older format are read again
+SCHEMA_FORMAT = 2
+
+# Named formats of the PVE JSON schema, `-list` variants are validated item by item
+FORMATS = {
+    'pve-groupid': r'^[-_\.a-zA-Z0-9]+$',
+    'pve-poolid': r'^[A-Za-z0-9\-_]+(/[A-Za-z0-9\-_]+){0,2}$',
+    'pve-roleid': r'^[-_\.a-zA-Z0-9]+$',
+    'pve-storage-id': r'^[a-z][a-z0-9\-_\.]*[a-z0-9]$',
+    'pve-tokenid': r'^[^\s:/]+@[A-Za-z][A-Za-z0-9\.\-_]+![A-Za-z][A-Za-z0-9\.\-_]+$',
+    'pve-userid': r'^[^\s:/]+@[A-Za-z][A-Za-z0-9\.\-_]+$',
+    'pve-storage-content': r'^(backup|images|import|iso|none|rootdir|snippets|vztmpl)$',
+}
+
+# The general form of an ACL path. The API normalizes slashes and keeps its own list of valid
+# paths, which grows with every PVE release (SDN, resource mappings, ...), so only the form is checked.
+ACL_PATH = re.compile(r'^/\S*\Z')
+
+# Parameters that name an existing role, checked against the roles cached for the host
+ROLE_PARAMETERS = ('roles', 'roleid')
+
+
+def parse_apidoc(content, prefixes=SCHEMA_PREFIXES):
+    """
+    Extract the method parameters from the API viewer source
+
+    :param content: str - content of apidoc.js
+    :param prefixes: tuple - API path prefixes to keep
+    :return: dict - '<METHOD> <path>' to a dict of parameter name to its schema
+    """
+    start = content.index('[', content.index('apiSchema'))
+    tree, end = json.JSONDecoder().raw_decode(content, start)
+
+    schema = {}
+    nodes = list(tree)
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('children') or [])
+        path = node.get('path', '')
+        if not path.startswith(prefixes):
+            continue
+        for method, info in (node.get('info') or {}).items():
+            properties = (info.get('parameters') or {}).get('properties') or {}
+            schema['{0} {1}'.format(method, path)] = dict(
+                (name, dict((key, value) for key, value in prop.items() if key in PARAMETER_KEYS))
+                for name, prop in properties.items())
+    return schema
+
+
+def check_acl_path(path):
+    """
+    Check the general form of an ACL path, the API checks the path itself
+
+    :param path: str - the access control path
+    :return: bool - if the path is absolute and without whitespace
+    """
+    return ACL_PATH.match(path) is not None
+
+
+def _match_pattern(pattern, value):
+    # Schema patterns are Perl regular expressions that the API anchors at both ends
+    pattern = re.sub(r'\(\?\^(\w*):', lambda m: '(?{0}:'.format(m.group(1)) if m.group(1) else '(?:', pattern)
+    try:
+        return re.match('^(?:{0})$'.format(pattern), value) is not None
+    except re.error:
+        return True
+
+
+def _check_format(name, fmt, value):
+    if not isinstance(fmt, str):
+        return
+    base = fmt[:-5] if fmt.endswith('-list') else fmt
+    if base not in FORMATS:
+        return
+    items = re.split(r'[,; ]+', value) if fmt.endswith('-list') else [value]
+    for item in items:
+        if item and not re.match(FORMATS[base], item):
+            raise ValueError("Parameter '{0}': '{1}' is not a valid {2}".format(name, item, base))
+
+
+class UnknownRoleError(ValueError):
+    """Raised for a role missing from the cached roles, it may have been created since"""
+
+
+def validate_api_params(schema, method, path, params, roles=None):
+    """
+    Validate and coerce the parameters of an API call
+
+    :param schema: dict - parsed schema as returned by parse_apidoc
+    :param method: str - HTTP method
+    :param path: str - API path template, for example '/access/users/{userid}/token/{tokenid}'
+    :param params: dict - parameter values, None values are ignored
+    :param roles: list - known role IDs, roles are not checked when None
+    :return: dict - the coerced parameters
+    :raises ValueError: for unknown parameters or invalid values
+    """
+    properties = schema.get('{0} {1}'.format(method.upper(), path))
+    if properties is None:
+        return dict((name, value) for name, value in params.items() if value is not None)
+
+    coerced = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        prop = properties.get(name)
+        if prop is None:
+            raise ValueError("Parameter '{0}' is not accepted by {1} {2}".format(name, method.upper(), path))
+
+        prop_type = prop.get('type', 'string')
+        if prop_type == 'boolean':
+            if isinstance(value, bool) or str(value).lower() in ('0', '1', 'true', 'false', 'yes', 'no', 'on', 'off'):
+                value = 1 if value is True or str(value).lower() in ('1', 'true', 'yes', 'on') else 0
+            else:
+                raise ValueError("Parameter '{0}': '{1}' is not a boolean".format(name, value))
+        elif prop_type in ('integer', 'number'):
+            try:
+                value = int(value) if prop_type == 'integer' else float(value)
+            except (TypeError, ValueError):
+                raise ValueError("Parameter '{0}': '{1}' is not an {2}".format(name, value, prop_type))
+            if 'minimum' in prop and value < prop['minimum']:
+                raise ValueError("Parameter '{0}': {1} is lower than {2}".format(name, value, prop['minimum']))
+            if 'maximum' in prop and value > prop['maximum']:
+                raise ValueError("Parameter '{0}': {1} is greater than {2}".format(name, value, prop['maximum']))
+        else:
+            value = str(value)
+            if 'enum' in prop and value not in prop['enum']:
+                raise ValueError("Parameter '{0}': '{1}' is not one of {2}".format(name, value, ', '.join(prop['enum'])))
+            if 'maxLength' in prop and len(value) > prop['maxLength']:
+                raise ValueError("Parameter '{0}' is longer than {1} characters".format(name, prop['maxLength']))
+            if 'pattern' in prop and not _match_pattern(prop['pattern'], value):
+                raise ValueError("Parameter '{0}': '{1}' does not match {2}".format(name, value, prop['pattern']))
+            _check_format(name, prop.get('format'), value)
+
+        if roles is not None and name in ROLE_PARAMETERS:
+            unknown = [role for role in re.split(r'[,; ]+', str(value)) if role and role not in roles]
+            if unknown:
+                raise UnknownRoleError("Parameter '{0}': role {1} doesn't exist".format(name, ', '.join(unknown)))
+        coerced[name] = value
+
+    if path == '/access/acl' and 'path' in coerced and not check_acl_path(coerced['path']):
+        raise ValueError("Parameter 'path': '{0}' is not a valid ACL path".format(coerced['path']))
+
+    missing = [name for name, prop in sorted(properties.items()) if not prop.get('optional') and name not in coerced]
+    if missing:
+        raise ValueError("{0} {1} requires {2}".format(method.upper(), path, ', '.join(missing)))
+
+    return coerced
+
+
+class ProxmoxOpenSSHSchemaCache(object):
+    """API schemas cached per pve-manager version, with the version and roles last seen per host"""
+
+    def __init__(self, cache_dir=None):
+        cache_dir = os.path.join(cache_dir or default_cache_dir(), 'schema')
+        self.schemas = ProxmoxOpenSSHCache(cache_dir, ttl=None)
+        self.hosts = ProxmoxOpenSSHCache(cache_dir, ttl=HOST_TTL)
+
+    def host(self, api_host, api_port):
+        """
+        Get what was last seen on a host
+
+        :return: dict - with the pve-manager version and the role IDs, None when unknown
+        """
+        return self.hosts.get(self.hosts.key('host', api_host, api_port))
+
+    def set_host(self, api_host, api_port, version, roles):
+        self.hosts.set(self.hosts.key('host', api_host, api_port), {'version': version, 'roles': roles})
+
+    def schema(self, version):
+        """
+        Get the cached schema for a pve-manager version
+
+        :return: dict - the schema, None when not cached
+        """
+        return self.schemas.get(self.schemas.key('schema', SCHEMA_FORMAT, version))
+
+    def set_schema(self, version, schema):
+        self.schemas.set(self.schemas.key('schema', SCHEMA_FORMAT, version), schema)
+
+
+def read_apidoc(proxmox):
+    """
+    Read the API viewer source of the connected node
+
+    :param proxmox: ProxmoxOpenSSHAnsible - the connected module helper
+    :return: str - the content of apidoc.js
+    """
+    session = proxmox.api_session
+    if session.backend != 'https':
+        stdout, stderr = proxmox.remote_exec(['cat', APIDOC_PATH], read=True)
+        return stdout
+
+    start = time.time()
+    response = session.session.get(session.base_url.rsplit('/api2/', 1)[0] + APIDOC_URL_PATH)
+    session.record('GET', APIDOC_URL_PATH, None, response.status_code, time.time() - start)
+    response.raise_for_status()
+    return response.text
+
+
+def cached_api_schema(module):
+    """
+    Get the schema cached for the host of a module by an earlier run, without connecting
+
+    :param module: AnsibleModule - the module
+    :return: tuple - what was last seen on the host and its schema, None for both when unknown
+    """
+    cache = ProxmoxOpenSSHSchemaCache()
+    # Before connecting the primary of an api_host list is not known, its first node usually is
+    host = cache.host((api_host_nodes(module.params.get('api_host')) or [None])[0], resolve_api_port(module.params))
+    schema = cache.schema(host['version']) if host else None
+    if schema is None:
+        return None, None
+    return host, schema
+
+
+def preflight_validate(module, calls):
+    """
+    Validate the API calls of a module before connecting to the host
+
+    Uses the schema and roles cached for the host by an earlier run. Without
+    a cached schema, or for a role that may have been created since, the
+    calls are validated by validate_api_calls once connected.
+
+    :param module: AnsibleModule - the module
+    :param calls: list - tuples of HTTP method, API path template and parameters
+    :return: bool - if the calls were validated
+    """
+    host, schema = cached_api_schema(module)
+    if schema is None:
+        return False
+
+    for method, path, params in calls:
+        try:
+            validate_api_params(schema, method, path, params, roles=host['roles'])
+        except UnknownRoleError:
+            return False
+        except ValueError as e:
+            module.fail_json(msg="Invalid parameters: {0}".format(e))
+    return True
+
+
+def validate_api_calls(proxmox, calls, validated=False):
+    """
+    Validate the API calls of a module against the schema of the connected cluster version
+
+    The schema is fetched once per pve-manager version and the roles once per
+    host, both are then reused by preflight_validate on the following runs.
+
+    :param proxmox: ProxmoxOpenSSHAnsible - the connected module helper
+    :param calls: list - tuples of HTTP method, API path template and parameters
+    :param validated: bool - if preflight_validate already validated the calls
+    :return: None
+    """
+    module = proxmox.module
+    cache = ProxmoxOpenSSHSchemaCache()
+    api_host = module.params['api_host']
+    api_port = resolve_api_port(module.params)
+    version = proxmox.pve_version.get('version')
+    host = cache.host(api_host, api_port)
+    if validated and host and host['version'] == version:
+        return
+
+    schema = cache.schema(version)
+    if schema is None and proxmox.api_session.backend == 'fake':
+        return
+    if schema is None:
+        try:
+            schema = parse_apidoc(read_apidoc(proxmox))
+        except Exception as e:
+            # Without the API viewer the calls are left to the API to validate
+            module.warn("Unable to read the API schema from {0}: {1}".format(APIDOC_PATH, e))
+            return
+        cache.set_schema(version, schema)
+
+    roles = host['roles'] if host and host['version'] == version else None
+    for attempt in range(2):
+        if roles is None:
+            try:
+                roles = sorted(role['roleid'] for role in proxmox.proxmox_api.access.roles.get())
+            except Exception as e:
+                module.fail_json(msg="Unable to retrieve roles: {0}".format(e))
+            cache.set_host(api_host, api_port, version, roles)
+        try:
+            for method, path, params in calls:
+                validate_api_params(schema, method, path, params, roles=roles)
+            break
+        except UnknownRoleError as e:
+            if attempt:
+                module.fail_json(msg="Invalid parameters: {0}".format(e))
+            roles = None
+        except ValueError as e:
+            module.fail_json(msg="Invalid parameters: {0}".format(e))
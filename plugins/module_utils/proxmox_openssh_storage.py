@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (ProxmoxOpenSSHSchemaCache)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage_schema import (
+    SECRET_STORAGE_OPTIONS, STORAGE_SCHEMA)
+
+# Parameters of POST /storage that are not storage options
+STORAGE_PARAMETERS = ('digest', 'storage', 'type')
+
+
+def normalize_storage_value(option_type, value):
+    """
+    Normalize a storage option to the form it is compared and sent in
+
+    :param option_type: str - string, boolean, integer or list
+    :param value: the value as given in the task or returned by the API
+    :return: str - the normalized value
+    """
+    if option_type == 'list':
+        if isinstance(value, (list, tuple)):
+            items = value
+        else:
+            items = str(value).split(',')
+        return ','.join(sorted(set(item.strip().lower() for item in items if str(item).strip())))
+    if option_type == 'boolean':
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if str(value).lower() in ('1', 'true', 'yes', 'on'):
+            return '1'
+        if str(value).lower() in ('0', 'false', 'no', 'off'):
+            return '0'
+        raise ValueError("expected a boolean, got '{0}'".format(value))
+    if option_type == 'integer':
+        return str(int(value))
+    return str(value)
+
+
+def storage_schema(apidoc=None):
+    """
+    Storage types and their options, from the /storage API schema of the cluster version when known
+
+    The API schema has the types, choices and defaults of every option but not
+    the storage types an option applies to, so every option is accepted for
+    every type and the API rejects the ones its type doesn't have. Options
+    that PUT /storage/{storage} doesn't take can only be set on create. The
+    content types and the options required on create come from STORAGE_SCHEMA,
+    the local copy that is used as is without an API schema.
+
+    :param apidoc: dict - parsed schema as returned by parse_apidoc, None when not known
+    :return: dict - in the format of STORAGE_SCHEMA
+    """
+    create = (apidoc or {}).get('POST /storage')
+    if not create:
+        return STORAGE_SCHEMA
+    update = apidoc.get('PUT /storage/{storage}') or {}
+
+    options = {}
+    for name, prop in create.items():
+        if name in STORAGE_PARAMETERS:
+            continue
+        if isinstance(prop.get('format'), str) and prop['format'].endswith('-list'):
+            option = {'type': 'list'}
+        elif prop.get('type') in ('boolean', 'integer'):
+            option = {'type': prop['type']}
+        else:
+            option = {'type': 'string'}
+        if prop.get('enum'):
+            option['choices'] = list(prop['enum'])
+        if prop.get('default') is not None:
+            try:
+                option['default'] = normalize_storage_value(option['type'], prop['default'])
+            except (TypeError, ValueError):
+                pass
+        if name not in update:
+            option['fixed'] = True
+        if name in SECRET_STORAGE_OPTIONS:
+            option['secret'] = True
+        options[name] = option
+
+    schema = {}
+    for storage_type in (create.get('type') or {}).get('enum') or sorted(STORAGE_SCHEMA):
+        local = STORAGE_SCHEMA.get(storage_type, {'content': None, 'options': {}})
+        # Options of the local copy missing from an older API schema are left for the API to reject
+        type_options = dict(local['options'])
+        for name, option in options.items():
+            type_options[name] = dict(option, create=True) if local['options'].get(name, {}).get('create') else option
+        schema[storage_type] = {'content': local['content'], 'options': type_options}
+    return schema
+
+
+def validate_storage_options(storage_type, options, schema=None):
+    """
+    Validate and normalize storage options against the storage schema
+
+    :param storage_type: str - the storage type
+    :param options: dict - option name to value, None values are ignored
+    :param schema: dict - as returned by storage_schema, STORAGE_SCHEMA when not given
+    :return: dict - option name to normalized value
+    :raises ValueError: on unknown options, invalid values or content types
+    """
+    schema = schema or STORAGE_SCHEMA
+    if storage_type not in schema:
+        raise ValueError("Unsupported storage type '{0}', expected one of {1}".format(storage_type, ', '.join(sorted(schema))))
+    schema = schema[storage_type]
+
+    normalized = {}
+    for name, value in options.items():
+        if value is None:
+            continue
+        option = schema['options'].get(name)
+        if option is None:
+            raise ValueError("Option '{0}' is not valid for storage type '{1}'".format(name, storage_type))
+        try:
+            value = normalize_storage_value(option['type'], value)
+        except (TypeError, ValueError) as e:
+            raise ValueError("Option '{0}': {1}".format(name, e))
+        if 'choices' in option and value not in option['choices']:
+            raise ValueError("Option '{0}' must be one of {1}, got '{2}'".format(name, ', '.join(option['choices']), value))
+        normalized[name] = value
+
+    if 'content' in normalized and schema['content'] is not None:
+        invalid = [content for content in normalized['content'].split(',') if content not in schema['content']]
+        if invalid:
+            raise ValueError("Content {0} is not valid for storage type '{1}', expected any of {2}".format(
+                ', '.join(invalid), storage_type, ', '.join(schema['content'])))
+
+    return normalized
+
+
+def public_storage_options(storage_type, options, schema=None):
+    """
+    Storage options without the secret ones, to be returned or reported
+
+    :param storage_type: str - the storage type
+    :param options: dict - validated options
+    :param schema: dict - as returned by storage_schema, STORAGE_SCHEMA when not given
+    :return: dict - the options not marked secret in the schema
+    """
+    schema = (schema or STORAGE_SCHEMA)[storage_type]['options']
+    return dict((name, value) for name, value in options.items()
+                if name not in SECRET_STORAGE_OPTIONS and not schema.get(name, {}).get('secret'))
+
+
+class ProxmoxOpenSSHStorageDirectoryAnsible(ProxmoxOpenSSHAnsible):
+
+    def get(self, storageid):
+        """
+        Get directory type storage info
+
+        :param storageid: str - name of the directory type storage
+        :return: dict - storage info
+        """
+        try:
+            return self.proxmox_api.storage.get(storageid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to get directory type storage with ID {0}: {1}".format(storageid, e))
+
+    def exists(self, storageid):
+        """
+        Check if the storage exists
+
+        :param storageid: str - name of the directory type storage
+        :return: bool - if the storage exists
+        """
+        for storage in self.get_storages(type='dir'):
+            if storage['storage'] == storageid:
+                return True
+        return False
+
+    def create(self, storageid, path, content=None, shared=False):
+        """
+        Create a directory type storage
+
+        :param storageid: str - name of the directory type storage
+        :param path: str - file system path
+        :param content: str - comma seperated list of allowed content types
+        :param shared: bool - mark the storage as shared
+        :return: None
+        """
+        changed = False
+
+        if self.exists(storageid):
+            storage_item = self.get(storageid)
+            if content is not None and not set(storage_item['content']) == set(content):
+                self.proxmox_api.storage(storageid).set(content=content)
+                changed = True
+            if 'shared' not in storage_item or storage_item['shared'] != int(shared):
+                self.proxmox_api.storage(storageid).set(shared=shared)
+                changed = True
+            if changed:
+                return
+            self.module.exit_json(changed=False, storage_id=storageid, storage_content=content, msg="Storage {0} exists".format(storageid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.storage.create(storage=storageid, type='dir', path=path, content=content, shared=shared)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to create storage with ID {0} and path {1}: {2}".format(storageid, path, e))
+
+    def delete(self, storageid):
+        """
+        Delete directory type storage
+
+        :param storageid: str - name of the directory type storage
+        :return: None
+        """
+        if not self.exists(storageid):
+            self.module.exit_json(changed=False, storage_id=storageid, msg="storage {0} doesn't exist".format(storageid))
+
+        if self.module.check_mode:
+            return
+
+        try:
+            self.proxmox_api.storage.delete(storageid)
+        except Exception as e:
+            self.module.fail_json(msg="Failed to delete directory type storage with ID {0}: {1}".format(storageid, e))
+
+
+class ProxmoxOpenSSHStorageAnsible(ProxmoxOpenSSHStorageDirectoryAnsible):
+    """Storage of any type in the storage schema, all options are diffed and applied in one request"""
+
+    _storage_schema = None
+
+    @property
+    def storage_schema(self):
+        """The storage schema of the connected version, from the cached API schema or STORAGE_SCHEMA"""
+        if self._storage_schema is None:
+            self._storage_schema = storage_schema(ProxmoxOpenSSHSchemaCache().schema(self.pve_version.get('version')))
+        return self._storage_schema
+
+    def find(self, storageid):
+        """
+        Find a storage of any type
+
+        :param storageid: str - the storage ID
+        :return: dict - the storage config, None when it doesn't exist
+        """
+        for storage in self.get_storages(type=None):
+            if storage['storage'] == storageid:
+                return storage
+        return None
+
+    def exists(self, storageid):
+        return self.find(storageid) is not None
+
+    def diff(self, storage_type, current, desired):
+        """
+        Compare the desired options with the current storage config
+
+        :param storage_type: str - the storage type
+        :param current: dict - storage config as returned by the API
+        :param desired: dict - validated options
+        :return: dict - option name to new value for every option that differs
+        """
+        schema = self.storage_schema[storage_type]['options']
+        changes = {}
+        for name, value in desired.items():
+            option = schema.get(name, {'type': 'string'})
+            if option.get('secret'):
+                continue
+            current_value = current.get(name)
+            if current_value is not None:
+                current_value = normalize_storage_value(option['type'], current_value)
+            elif 'default' in option:
+                current_value = option['default']
+            elif option['type'] == 'boolean':
+                # A flag without a known default is off when missing from storage.cfg
+                current_value = '0'
+            if current_value == value:
+                continue
+            if option.get('fixed'):
+                self.module.fail_json(msg="Option '{0}' of storage {1} is '{2}' and can't be changed to '{3}'".format(
+                    name, current['storage'], current_value, value))
+            changes[name] = value
+        return changes
+
+    def ensure(self, storageid, storage_type, options):
+        """
+        Create the storage or update every option that differs with one request
+
+        :param storageid: str - the storage ID
+        :param storage_type: str - the storage type
+        :param options: dict - validated options
+        :return: tuple - bool if the storage was created, dict of the changed options without the secret ones
+        """
+        current = self.find(storageid)
+
+        if current is None:
+            missing = [name for name, option in sorted(self.storage_schema[storage_type]['options'].items())
+                       if option.get('create') and name not in options]
+            if missing:
+                self.module.fail_json(msg="Storage {0} of type {1} requires {2} to be created".format(storageid, storage_type, ', '.join(missing)))
+            if not self.module.check_mode:
+                try:
+                    self.proxmox_api.storage.create(storage=storageid, type=storage_type, **options)
+                except Exception as e:
+                    self.module.fail_json(msg="Failed to create storage with ID {0}: {1}".format(storageid, e))
+            return True, public_storage_options(storage_type, options, self.storage_schema)
+
+        if current['type'] != storage_type:
+            self.module.fail_json(msg="Storage {0} exists with type {1}, not {2}".format(storageid, current['type'], storage_type))
+
+        changes = self.diff(storage_type, current, options)
+        if changes and not self.module.check_mode:
+            try:
+                self.proxmox_api.storage(storageid).set(digest=current.get('digest'), **changes)
+            except Exception as e:
+                self.module.fail_json(msg="Failed to update storage with ID {0}: {1}".format(storageid, e))
+        return False, changes
+
+    def reconcile(self, storage_type, storages, exclusive=False, workers=4, state='present'):
+        """
+        Bring many storages of one type to their desired options from a single /storage listing
+
+        Every storage is diffed against the listing and the creates, updates
+        and deletes are then sent with at most `workers` requests at a time.
+        The digest of the listing covers all of storage.cfg and would be
+        outdated by the first write, so updates are sent without it.
+
+        :param storage_type: str - the storage type
+        :param storages: list - tuples of the storage ID and its validated options
+        :param exclusive: bool - also delete the storages of the type that are not listed
+        :param workers: int - maximum number of writes sent at the same time
+        :param state: str - present, or absent to delete the listed storages that exist, their options are ignored
+        :return: list - the actions, dicts with `action`, `id` and the `changes` of an update
+        """
+        current = dict((storage['storage'], storage) for storage in self.get_storages(type=None) or [])
+        writes = []
+        for storageid, options in storages:
+            existing = current.get(storageid)
+            if state == 'absent':
+                if existing is not None and existing['type'] != storage_type:
+                    self.module.fail_json(msg="Storage {0} exists with type {1}, not {2}".format(storageid, existing['type'], storage_type))
+                if existing is not None:
+                    writes.append(({'action': 'delete', 'id': storageid}, self.proxmox_api.storage(storageid).delete, {}))
+                continue
+            if existing is None:
+                missing = [name for name, option in sorted(self.storage_schema[storage_type]['options'].items())
+                           if option.get('create') and name not in options]
+                if missing:
+                    self.module.fail_json(msg="Storage {0} of type {1} requires {2} to be created".format(storageid, storage_type, ', '.join(missing)))
+                writes.append(({'action': 'create', 'id': storageid}, self.proxmox_api.storage.create,
+                               dict(storage=storageid, type=storage_type, **options)))
+                continue
+            if existing['type'] != storage_type:
+                self.module.fail_json(msg="Storage {0} exists with type {1}, not {2}".format(storageid, existing['type'], storage_type))
+            changes = self.diff(storage_type, existing, options)
+            if changes:
+                writes.append(({'action': 'update', 'id': storageid, 'changes': changes}, self.proxmox_api.storage(storageid).set, changes))
+
+        if exclusive:
+            listed = set(storageid for storageid, options in storages)
+            for storageid in sorted(current):
+                if current[storageid]['type'] == storage_type and storageid not in listed:
+                    writes.append(({'action': 'delete', 'id': storageid}, self.proxmox_api.storage(storageid).delete, {}))
+
+        if self.module.check_mode or not writes:
+            return [action for action, method, kwargs in writes]
+
+        def send(write):
+            action, method, kwargs = write
+            try:
+                method(**kwargs)
+                return None
+            except Exception as e:
+                return "Failed to {0} storage {1}: {2}".format(action['action'], action['id'], e)
+
+        # Failures are reported once all writes are done, fail_json can't end the module from a worker thread
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            errors = list(executor.map(send, writes))
+        finally:
+            executor.shutdown()
+        actions = [write[0] for write, error in zip(writes, errors) if error is None]
+        failed = [error for error in errors if error is not None]
+        if failed:
+            self.module.fail_json(actions=actions, msg='; '.join(failed))
+        return actions
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+# Local copy of the parts of the PVE /storage API schema used by the storage modules,
+# used as is when the API schema of the cluster version is not cached.
+# For every storage type: the allowed content types and the type specific options with
+#   type   - one of string, boolean, integer or list (comma separated in the API)
+#   create - required when the storage is created
+#   fixed  - can only be set when the storage is created
+#   secret - never returned by the API, only sent when the storage is created
+#   default - normalized value of the option when it is missing from storage.cfg
+_COMMON_OPTIONS = {
+    'content': {'type': 'list'},
+    'disable': {'type': 'boolean'},
+    'nodes': {'type': 'list'},
+}
+_BACKUP_OPTIONS = {
+    'max-protected-backups': {'type': 'integer'},
+    'prune-backups': {'type': 'string'},
+}
+_FILE_OPTIONS = dict(_BACKUP_OPTIONS, **{
+    'content-dirs': {'type': 'string'},
+    'create-base-path': {'type': 'boolean', 'default': '1'},
+    'create-subdirs': {'type': 'boolean', 'default': '1'},
+    'format': {'type': 'string', 'choices': ['raw', 'qcow2', 'vmdk']},
+    'preallocation': {'type': 'string', 'choices': ['off', 'metadata', 'falloc', 'full']},
+})
+_FILE_CONTENT = ['backup', 'images', 'import', 'iso', 'rootdir', 'snippets', 'vztmpl']
+
+STORAGE_SCHEMA = {
+    'dir': {
+        'content': _FILE_CONTENT,
+        'options': dict(_COMMON_OPTIONS, **dict(_FILE_OPTIONS, **{
+            'path': {'type': 'string', 'create': True, 'fixed': True},
+            'is_mountpoint': {'type': 'string'},
+            'shared': {'type': 'boolean'},
+        })),
+    },
+    'nfs': {
+        'content': _FILE_CONTENT,
+        'options': dict(_COMMON_OPTIONS, **dict(_FILE_OPTIONS, **{
+            'export': {'type': 'string', 'create': True, 'fixed': True},
+            'options': {'type': 'string'},
+            'path': {'type': 'string', 'create': True, 'fixed': True},
+            'server': {'type': 'string', 'create': True, 'fixed': True},
+        })),
+    },
+    'lvmthin': {
+        'content': ['images', 'rootdir'],
+        'options': dict(_COMMON_OPTIONS, **{
+            'thinpool': {'type': 'string', 'create': True, 'fixed': True},
+            'vgname': {'type': 'string', 'create': True, 'fixed': True},
+        }),
+    },
+    'zfspool': {
+        'content': ['images', 'rootdir'],
+        'options': dict(_COMMON_OPTIONS, **{
+            'blocksize': {'type': 'string'},
+            'mountpoint': {'type': 'string'},
+            'pool': {'type': 'string', 'create': True, 'fixed': True},
+            'sparse': {'type': 'boolean'},
+        }),
+    },
+    'pbs': {
+        'content': ['backup'],
+        'options': dict(_COMMON_OPTIONS, **dict(_BACKUP_OPTIONS, **{
+            'datastore': {'type': 'string', 'create': True, 'fixed': True},
+            'encryption-key': {'type': 'string', 'secret': True},
+            'fingerprint': {'type': 'string'},
+            'master-pubkey': {'type': 'string', 'secret': True},
+            'namespace': {'type': 'string'},
+            'password': {'type': 'string', 'secret': True},
+            'port': {'type': 'integer'},
+            'server': {'type': 'string', 'create': True, 'fixed': True},
+            'username': {'type': 'string'},
+        })),
+    },
+}
+
+# Options of any storage type marked secret, they are never returned or recorded
+SECRET_STORAGE_OPTIONS = tuple(sorted(set(name for storage in STORAGE_SCHEMA.values()
+                                          for name, option in storage['options'].items() if option.get('secret'))))
@@ -0,0 +1,230 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_access_drift
+
+short_description:
+  - Report the drift of the Proxmox VE access configuration from a declared state
+
+version_added: "2.1.0"
+
+description:
+  - Compares the groups, users, API tokens and ACLs of a Proxmox VE Datacenter with a declared state and reports the differences.
+  - The declared state is the complete wanted access configuration, in the format of
+    M(cloudcodger.proxmox_openssh.proxmox_datacenter), and anything else found is reported as unmanaged or extra.
+  - Users and ACLs are compared while they are streamed from the node, so large ACL lists are never held in memory.
+  - Each kind of drift is reported with its count and at most I(max_items) sorted items.
+  - Never changes anything.
+  - With I(api_hosts) several independent clusters are compared concurrently.
+  - Uses the proxmoxer openssh backend.
+
+options:
+    api_host:
+        description:
+        - The target host of the Proxmox VE cluster, or a list of nodes of the cluster.
+        - Required unless I(api_hosts) is given.
+        type: raw
+    api_hosts:
+        description:
+        - Target hosts of several independent Proxmox VE clusters, one host per cluster.
+        - Each cluster is compared separately and reported in C(clusters).
+        - Mutually exclusive with I(api_host).
+        type: list
+        elements: str
+    api_workers:
+        description: Maximum number of clusters of I(api_hosts) compared at the same time.
+        type: int
+        default: 4
+    groups:
+        description: Groups, each a group name or a dict with C(groupid).
+        type: list
+        elements: raw
+        default: []
+    users:
+        description: Users, each a user ID or a dict with C(userid).
+        type: list
+        elements: raw
+        default: []
+    tokens:
+        description: API tokens, each a C(user@realm!token) string or a dict with C(userid) and C(tokenid).
+        type: list
+        elements: raw
+        default: []
+    acls:
+        description:
+        - ACLs, each a dict with C(path), C(roleid), C(propagate) (default C(true)) and lists of
+          C(groups), C(tokens) and/or C(users).
+        type: list
+        elements: dict
+        default: []
+    ignore_users:
+        description: Users left out of the comparison, together with their tokens and ACLs.
+        type: list
+        elements: str
+        default: [root@pam]
+    max_items:
+        description: Maximum number of items reported for each kind of drift, the counts are always complete.
+        type: int
+        default: 100
+    export_dir:
+        description:
+        - Directory on the node running the module where the current access configuration is written
+          as C(<api_host>.yml), with sorted keys, in sections C(groups), C(users), C(tokens) and C(acls).
+        - The file is written while the configuration is read and replaced when it is complete.
+        type: path
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+
+requirements: [ "PyYAML" ]
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Report the access drift of every cluster."
+  cloudcodger.proxmox_openssh.proxmox_access_drift:
+    api_hosts: ["pve1", "pve-lab1", "pve-dr1"]
+    api_user: "root"
+    groups: [Admin, Auditor]
+    users: [devops@pve, exporter@pve]
+    tokens: ['devops@pve!ansible', 'devops@pve!inventory', 'exporter@pve!prometheus']
+    acls:
+      - path: /
+        roleid: Administrator
+        groups: [Admin]
+        tokens: ['devops@pve!ansible']
+      - path: /
+        roleid: PVEAuditor
+        groups: [Auditor]
+        tokens: ['devops@pve!inventory', 'exporter@pve!prometheus']
+    export_dir: "{{ lookup('env', 'HOME') }}/pve_access"
+  register: access_drift
+
+- name: "Fail the nightly run on drift."
+  ansible.builtin.fail:
+    msg: "{{ access_drift.clusters | selectattr('drifted') | map(attribute='api_host') | list }} drifted"
+  when: access_drift.drifted
+'''
+
+RETURN = r'''
+drift:
+    description:
+    - For each kind of drift, C(count) and the sorted C(items), at most I(max_items).
+    - The kinds are C(missing_groups), C(unmanaged_groups), C(missing_users), C(unmanaged_users), C(missing_tokens),
+      C(unmanaged_tokens), C(expired_tokens), C(missing_acls), C(extra_acls) and C(changed_acls), where ACLs are
+      C(path:roleid:type:ugid) and C(changed_acls) are declared ACLs that propagate differently.
+    returned: unless I(api_hosts) is given
+    type: dict
+    sample: '{"unmanaged_users": {"count": 1, "items": ["olduser@pve"]}, "extra_acls": {"count": 0, "items": []}}'
+drifted:
+    description: Whether any drift was found, on any cluster.
+    returned: success
+    type: bool
+    sample: true
+clusters:
+    description:
+    - One result for each host of I(api_hosts), in the same order, with C(api_host), C(failed),
+      C(msg), C(drift), C(drifted) and C(proxmox_metrics) of that cluster.
+    returned: when I(api_hosts) is given
+    type: list
+    sample: '[{"api_host": "pve1", "changed": false, "failed": false, "drifted": false, "drift": {}, "msg": "No drift"}]'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: unless I(api_hosts) is given
+    type: dict
+    sample: '{"backend": "openssh", "connections": 3, "elapsed": 1.02, "host": "pve1", "calls": []}'
+msg:
+    description: A short message on what the module found.
+    returned: always
+    type: str
+    sample: "Found 3 drifted items"
+'''
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec, run_on_hosts)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (normalize_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_drift import (
+    HAS_YAML, YAML_IMP_ERR, ProxmoxOpenSSHDriftAnsible)
+
+def compare(module, spec):
+    proxmox_drift = ProxmoxOpenSSHDriftAnsible(module)
+    export = None
+    if module.params['export_dir']:
+        export = os.path.join(module.params['export_dir'], '{0}.yml'.format(module.params['api_host']))
+    try:
+        drift = proxmox_drift.drift(spec, ignore_users=module.params['ignore_users'],
+                                    limit=module.params['max_items'], export=export)
+    except (IOError, OSError) as e:
+        module.fail_json(msg="Unable to export the access configuration: {0}".format(e))
+
+    count = sum(kind['count'] for kind in drift.values())
+    module.exit_json(changed=False, drift=drift, drifted=bool(count),
+                     msg="Found {0} drifted items".format(count) if count else "No drift")
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    module_args['api_host']['required'] = False
+    drift_args = dict(
+        api_hosts=dict(type='list', elements='str'),
+        api_workers=dict(type='int', default=4),
+        groups=dict(type='list', elements='raw', default=[]),
+        users=dict(type='list', elements='raw', default=[]),
+        tokens=dict(type='list', elements='raw', default=[], no_log=False),
+        acls=dict(type='list', elements='dict', default=[]),
+        ignore_users=dict(type='list', elements='str', default=['root@pam']),
+        max_items=dict(type='int', default=100),
+        export_dir=dict(type='path'),
+    )
+    module_args.update(drift_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[('api_host', 'api_hosts')],
+        mutually_exclusive=[('api_host', 'api_hosts')],
+        supports_check_mode=True
+    )
+
+    if module.params['export_dir'] and not HAS_YAML:
+        module.fail_json(msg=missing_required_lib('PyYAML'), exception=YAML_IMP_ERR)
+    if module.params['max_items'] < 1:
+        module.fail_json(msg="max_items must be at least 1")
+
+    try:
+        spec = normalize_spec(
+            groups=module.params['groups'],
+            users=module.params['users'],
+            tokens=module.params['tokens'],
+            acls=module.params['acls'],
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        module.fail_json(msg="Invalid access definition: {0}".format(e))
+
+    if not module.params['api_hosts']:
+        compare(module, spec)
+
+    api_hosts = module.params['api_hosts']
+    clusters = run_on_hosts(module, api_hosts, lambda host_module: compare(host_module, spec),
+                            workers=module.params['api_workers'])
+    failed = [cluster['api_host'] for cluster in clusters if cluster['failed']]
+    if failed:
+        module.fail_json(clusters=clusters,
+                         msg="Failed to compare {0} of {1} clusters: {2}".format(len(failed), len(api_hosts), ', '.join(failed)))
+
+    drifted = [cluster['api_host'] for cluster in clusters if cluster.get('drifted')]
+    module.exit_json(changed=False, clusters=clusters, drifted=bool(drifted),
+                     msg="{0} of {1} clusters drifted".format(len(drifted), len(api_hosts)))
+
+if __name__ == '__main__':
+
+    main()
@@ -17,7 +17,9 @@ version_added: "1.0.0"
 description:
   - Create or delete ACL (permissions) for Proxmox VE Datacenter.
   - Uses the proxmoxer openssh backend.
-  - Requires one of groups, tokens, and/or users.
+  - Requires one of groups, tokens, and/or users, unless I(exclusive=true).
+  - With I(exclusive=true) the ACLs are read once, the entries in scope that are not for the given principals are
+    found as a set difference and deleted with one request for each path and role.
 
 options:
     path:
@@ -45,6 +47,23 @@ options:
         required: false
         type: bool
         default: True
+    exclusive:
+        description:
+        - Also remove the ACLs in scope that are not for the given I(groups), I(tokens) and I(users).
+        - The scope is the ACLs of I(path) for I(roleid), see I(exclusive_prefix) and I(exclusive_all_roles).
+        - Without principals every ACL in scope is removed.
+        - Requires I(state=present).
+        type: bool
+        default: false
+    exclusive_prefix:
+        description:
+        - Remove the ACLs of this path and of all the paths below it instead of only those of I(path).
+        - C(/vms) covers C(/vms) and C(/vms/100) but not C(/vmstore).
+        type: str
+    exclusive_all_roles:
+        description: Remove the ACLs in scope of every role instead of only those of I(roleid).
+        type: bool
+        default: false
     state:
         description: The desired state of the group.
         choices: [ 'present', 'absent' ]
@@ -53,6 +72,7 @@ options:
 
 extends_documentation_fragment:
     - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
 
 author:
     - Cloud Codger (@cloudcodger) <cloud@codger.site>
@@ -87,6 +107,21 @@ EXAMPLES = r'''
     roles: ["Administrator"]
     groups: ["Admin"]
     state: absent
+
+- name: "Make the ops group the only one with PVEVMAdmin on the guests, removing other grants below /vms."
+  cloudcodger.proxmox_openssh.proxmox_acl:
+    api_host: "pve1"
+    api_user: "root"
+    path: "/vms"
+    roleid: "PVEVMAdmin"
+    groups: "ops"
+    exclusive: true
+    exclusive_prefix: "/vms"
+  register: acl
+
+- name: "Show the grants removed."
+  ansible.builtin.debug:
+    var: acl.removed
 '''
 
 RETURN = r'''
@@ -105,6 +140,21 @@ removed_acls:
     returned: success i(state=absent)
     type: list
     sample: '[{"path": "/", "propagate": 1, "roleid": "Administrator", "type": "user", "ugid": "devops@pve"}]'
+removed:
+    description: The ACLs removed by I(exclusive=true), as C(path:roleid:type:ugid).
+    returned: success i(exclusive=true)
+    type: list
+    sample: '["/vms/100:PVEVMAdmin:user:olduser@pve", "/vms:PVEVMAdmin:group:contractors"]'
+removed_count:
+    description: The number of ACLs removed by I(exclusive=true).
+    returned: success i(exclusive=true)
+    type: int
+    sample: 2
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/access/users", "params": {}, "status": 200, "elapsed": 0.51}]}'
 msg:
     description: A short message on what the module did.
     returned: always
@@ -112,195 +162,10 @@ msg:
     sample: "Group Admin successfully created"
 '''
 
-import re
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
-
-class ProxmoxOpenSSHACLAnsible(ProxmoxOpenSSHAnsible):
-
-    def all_exist(self, path, roleid, **kwargs):
-        """
-        Check if all the ACLs for a path and roleid for specified groups, tokens, and users exist
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param propagate: bool - allow to propagate (inherit) permissions
-        :param groups: str - comman seperated list of group names
-        :param tokens: str - comman seperated list of tokens as user@real!token
-        :param users: str - comman seperated list of users as user@real
-        :return: bool - if the ACLs exist for all groups, tokens and users
-        """
-        current_acls = self.proxmox_api.access.acl.get()
-        if not current_acls:
-            return False
-
-        matching_groups = []
-        matching_tokens = []
-        matching_users = []
-
-        for acl in current_acls:
-            if acl['path'] != path:
-                continue
-            if acl['propagate'] != kwargs['propagate']:
-                continue
-            if acl['roleid'] != roleid:
-                continue
-            if acl['type'] == 'group':
-                matching_groups.append(acl['ugid'])
-            if acl['type'] == 'token':
-                matching_tokens.append(acl['ugid'])
-            if acl['type'] == 'user':
-                matching_users.append(acl['ugid'])
-
-        if 'groups' in kwargs and kwargs['groups']:
-            if not matching_groups:
-                return False
-            for ugid in re.split(r'[, ]+', kwargs['groups']):
-                if ugid not in matching_groups:
-                    return False
-
-        if 'tokens' in kwargs and kwargs['tokens']:
-            if not matching_tokens:
-                return False
-            for ugid in re.split(r'[, ]+', kwargs['tokens']):
-                if ugid not in matching_tokens:
-                    return False
-
-        if 'users' in kwargs and kwargs['users']:
-            if not matching_users:
-                return False
-            for ugid in re.split(r'[, ]+', kwargs['users']):
-                if ugid not in matching_users:
-                    return False
-
-        return True
-
-    def matching_acls(self, path, roleid, **kwargs):
-        """
-        Check if all the ACLs for a path and roleid for specified groups, tokens, and users exist
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param groups: str - comman seperated list of group names
-        :param tokens: str - comman seperated list of tokens as user@real!token
-        :param users: str - comman seperated list of users as user@real
-        :return: list - a list of matching ACLs
-        """
-        matched_acls = []
-
-        current_acls = self.proxmox_api.access.acl.get()
-        if not current_acls:
-            self.module.exit_json(changed=False, msg="No ACLs exist.")
-
-        for acl in current_acls:
-            if acl['path'] != path or acl['roleid'] != roleid:
-                continue
-            if acl['type'] == 'group' and 'groups' in kwargs and kwargs['groups']:
-                for ugid in re.split(r'[, ]+', kwargs['groups']):
-                    if acl['ugid'] == ugid:
-                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'group', 'ugid': ugid})
-            if acl['type'] == 'token' and 'tokens' in kwargs and kwargs['tokens']:
-                for ugid in re.split(r'[, ]+', kwargs['tokens']):
-                    if acl['ugid'] == ugid:
-                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'token', 'ugid': ugid})
-            if acl['type'] == 'user' and 'users' in kwargs and kwargs['users']:
-                for ugid in re.split(r'[, ]+', kwargs['users']):
-                    if acl['ugid'] == ugid:
-                        matched_acls.append({'path': path, 'roleid': roleid, 'propagate': acl['propagate'], 'type': 'user', 'ugid': ugid})
-
-        return matched_acls
-
-    def group_acl_exists(self, path, roleid, groupid):
-        """
-        Check if the ACL for a group exists
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param groupid: str - name of the group
-        :return: bool - if the acl exists
-        """
-        for item in self.proxmox_api.access.acl.get():
-            if item['path'] == path and item['roleid'] == roleid and item['type'] == "group" and item['ugid'] == groupid:
-                return True
-        return False
-
-    def token_acl_exists(self, path, roleid, tokenid):
-        """
-        Check if the ACL for a token exists
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param tokenid: str - name of the token
-        :return: bool - if the acl exists
-        """
-        for item in self.proxmox_api.access.acl.get():
-            if item['path'] == path and item['roleid'] == roleid and item['type'] == "token" and item['ugid'] == tokenid:
-                return True
-        return False
-
-    def user_acl_exists(self, path, roleid, userid):
-        """
-        Check if the ACL for a user exists
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param userid: str - name of the user
-        :return: bool - if the acl exists
-        """
-        for item in self.proxmox_api.access.acl.get():
-            if item['path'] == path and item['roleid'] == roleid and item['type'] == "user" and item['ugid'] == userid:
-                return True
-        return False
-
-    def create(self, path, roleid, **kwargs):
-        """
-        Create permissions ACLs
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param groups: str - list of the group names
-        :param tokens: str - list of the tokens as user@realm!token
-        :param users: str - list of the users as user@realm
-        :param propagate: bool
-        :return: None
-        """
-        if self.all_exist(path, roleid, **kwargs):
-            self.module.exit_json(changed=False, roleid=roleid, msg="All requested ACLs for path '{0}' and roleid '{1}' exist".format(path, roleid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.acl.set(path=path, roles=roleid, **kwargs)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to create ACL for {0}: {1}".format(kwargs, e))
-
-    def delete(self, path, roleid, **kwargs):
-        """
-        Delete permissions ACLs
-
-        :param path: str - the access control path
-        :param roleid: str - name of the role
-        :param propagate: bool - allow to propagate (inherit) permissions
-        :param groups: str - list of the group names
-        :param tokens: str - list of the tokens as user@realm!token
-        :param users: str - list of the users as user@realm
-        :return: list - list of ACL dicts removed
-        """
-
-        removing = self.matching_acls(path, roleid, **kwargs)
-
-        if not removing:
-            self.module.exit_json(changed=False, msg="No requested ACLs for path '{0}' and roleid '{1}' exist".format(path, roleid))
-
-        if self.module.check_mode:
-            return removing
-
-        try:
-            self.proxmox_api.access.acl.set(path=path, roles=roleid, delete=True, **kwargs)
-            return removing
-        except Exception as e:
-            self.module.fail_json(msg="Failed to delete ACLs for {0}: {1}".format(removing, e))
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (ProxmoxOpenSSHACLAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
 
 def main():
 
@@ -312,24 +177,58 @@ def main():
         tokens=dict(type="str"),
         users=dict(type="str"),
         propagate=dict(type="bool", default=True),
+        exclusive=dict(type='bool', default=False),
+        exclusive_prefix=dict(type='str'),
+        exclusive_all_roles=dict(type='bool', default=False),
         state=dict(type='str', choices=['present', 'absent'], default='present'),
     )
     module_args.update(acl_args)
 
     module = AnsibleModule(
         argument_spec=module_args,
-        required_one_of=[
-            ('groups', 'tokens', 'users')
-        ],
         supports_check_mode=True
     )
 
-    proxmox_acl = ProxmoxOpenSSHACLAnsible(module)
     path = module.params['path']
     roleid = module.params['roleid']
     state = module.params['state']
+    exclusive = module.params['exclusive']
+
+    # Without principals an exclusive ACL removes every entry in scope
+    if not exclusive and not any(module.params[option] for option in ('groups', 'tokens', 'users')):
+        module.fail_json(msg="one of the following is required: groups, tokens, users")
+    if exclusive and state == 'absent':
+        module.fail_json(msg="exclusive requires state=present")
+    if not exclusive and (module.params['exclusive_prefix'] or module.params['exclusive_all_roles']):
+        module.fail_json(msg="exclusive_prefix and exclusive_all_roles require exclusive")
+
+    api_calls = [('PUT', '/access/acl', dict(
+        path=path,
+        roles=roleid,
+        groups=module.params['groups'],
+        tokens=module.params['tokens'],
+        users=module.params['users'],
+        propagate=module.params['propagate'] if state == 'present' else None,
+        delete=True if state == 'absent' else None))]
+    validated = preflight_validate(module, api_calls)
 
-    if state == 'present':
+    proxmox_acl = ProxmoxOpenSSHACLAnsible(module)
+    validate_api_calls(proxmox_acl, api_calls, validated)
+
+    if exclusive:
+        setting, removed = proxmox_acl.exclusive(path, roleid, module.params['propagate'],
+                                                 prefix=module.params['exclusive_prefix'],
+                                                 all_roles=module.params['exclusive_all_roles'],
+                                                 groups=module.params['groups'],
+                                                 tokens=module.params['tokens'],
+                                                 users=module.params['users'])
+        changed = bool(setting or removed)
+        if changed:
+            msg = "ACLs for path {0} and roleid {1} successfully set, {2} other ACLs removed".format(path, roleid, len(removed))
+        else:
+            msg = "ACLs for path {0} and roleid {1} are exclusive".format(path, roleid)
+        module.exit_json(changed=changed, acl_path=path, roleid=roleid, removed=removed, removed_count=len(removed), msg=msg)
+    elif state == 'present':
         proxmox_acl.create(path, roleid,
                            groups=module.params['groups'],
                            tokens=module.params['tokens'],
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_datacenter
+
+short_description:
+  - Converge Proxmox VE Datacenter storages, groups, users, tokens and ACLs in one task
+
+version_added: "2.1.0"
+
+description:
+  - Brings the storages, groups, users, API tokens and ACLs of a Proxmox VE Datacenter to a declared state.
+  - The current state is read with a single remote call and every change is computed from that snapshot.
+  - Objects that are not declared are left untouched and declared objects are never removed.
+  - Returns the secrets of new API tokens.
+  - With I(api_hosts) the same state is brought to several independent clusters concurrently,
+    a cluster that fails does not stop the others.
+  - Uses the proxmoxer openssh backend.
+
+options:
+    api_host:
+        description:
+        - The target host of the Proxmox VE cluster, or a list of nodes of the cluster.
+        - Required unless I(api_hosts) is given.
+        type: raw
+    api_hosts:
+        description:
+        - Target hosts of several independent Proxmox VE clusters, one host per cluster.
+        - Each cluster is converged separately and reported in C(clusters).
+        - Mutually exclusive with I(api_host).
+        type: list
+        elements: str
+    api_workers:
+        description: Maximum number of clusters of I(api_hosts) converged at the same time.
+        type: int
+        default: 4
+    storages:
+        description:
+        - Storages, each a dict with C(storage), C(type) (default C(dir)) and any option accepted by
+          M(cloudcodger.proxmox_openssh.proxmox_storage), for example C(content), C(path) and C(shared).
+        type: list
+        elements: dict
+        default: []
+    groups:
+        description: Groups, each a group name or a dict with C(groupid) and C(comment).
+        type: list
+        elements: raw
+        default: []
+    users:
+        description:
+        - Users, each a dict with C(userid), C(groups) and optionally C(comment), C(email), C(firstname) and C(lastname).
+        - Missing groups are added to existing users, other group memberships are kept.
+        type: list
+        elements: raw
+        default: []
+    tokens:
+        description:
+        - API tokens, each a C(user@realm!token) string or a dict with C(userid), C(tokenid)
+          and optionally C(comment), C(expire) and C(privsep).
+        type: list
+        elements: raw
+        default: []
+    acls:
+        description:
+        - ACLs, each a dict with C(path), C(roleid), C(propagate) (default C(true)) and lists of
+          C(groups), C(tokens) and/or C(users).
+        type: list
+        elements: dict
+        default: []
+    state_marker:
+        description:
+        - Skip the snapshot and all changes when the cluster is unchanged since a previous run found it in the declared state.
+        - A run that changes nothing stores the fingerprint of the declared state and the pmxcfs versions of
+          C(/etc/pve/user.cfg) and C(/etc/pve/storage.cfg) in C(/etc/pve/priv/proxmox_openssh_datacenter.json).
+          A later run with the same declared state only reads that file and C(/etc/pve/.version), in one remote call.
+        - Any change to those files, also one made outside of Ansible, makes the next run read and converge the datacenter again.
+        - Ignored with a warning by the C(https) backend, which can not read the files.
+        type: bool
+        default: false
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Configure the datacenter."
+  cloudcodger.proxmox_openssh.proxmox_datacenter:
+    api_host: "pve1"
+    api_user: "root"
+    storages:
+      - storage: local
+        content: images,iso,vztmpl,backup
+        path: /var/lib/vz
+    groups: [Admin, Auditor]
+    users:
+      - userid: devops@pve
+        groups: [Admin]
+    tokens: ['devops@pve!ansible', 'devops@pve!inventory']
+    acls:
+      - path: /
+        roleid: Administrator
+        groups: [Admin]
+        tokens: ['devops@pve!ansible']
+      - path: /
+        roleid: PVEAuditor
+        tokens: ['devops@pve!inventory']
+    state_marker: true
+  register: datacenter
+
+- name: "Apply the baseline access to every cluster."
+  cloudcodger.proxmox_openssh.proxmox_datacenter:
+    api_hosts: ["pve1", "pve-lab1", "pve-dr1"]
+    api_user: "root"
+    api_workers: 8
+    groups: [Admin]
+    acls:
+      - path: /
+        roleid: Administrator
+        groups: [Admin]
+'''
+
+RETURN = r'''
+actions:
+    description: The changes made, in order.
+    returned: success
+    type: list
+    sample: '[{"action": "create", "kind": "user", "id": "devops@pve"}]'
+tokens:
+    description:
+    - One entry for each declared token, with the secret in C(token) when the token was created.
+    returned: success
+    type: list
+    sample: '[{"userid": "devops@pve", "tokenid": "ansible", "changed": true, "token": "20a357ce-9a49-4c17-96ab-7afb7cd81b21"}]'
+clusters:
+    description:
+    - One result for each host of I(api_hosts), in the same order, with C(api_host), C(changed), C(failed),
+      C(msg), C(actions), C(tokens) and C(proxmox_metrics) of that cluster.
+    returned: when I(api_hosts) is given
+    type: list
+    sample: '[{"api_host": "pve1", "changed": true, "failed": false, "actions": [], "tokens": [], "msg": "Datacenter converged with 1 changes"}]'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: unless I(api_hosts) is given
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": []}'
+unchanged:
+    description: Whether the run was skipped because the state marker matched.
+    returned: success
+    type: bool
+    sample: false
+msg:
+    description: A short message on what the module did.
+    returned: always
+    type: str
+    sample: "Datacenter converged with 4 changes"
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (
+    converge_datacenter, normalize_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (cached_api_schema)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (storage_schema)
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    module_args['api_host']['required'] = False
+    datacenter_args = dict(
+        api_hosts=dict(type='list', elements='str'),
+        api_workers=dict(type='int', default=4),
+        storages=dict(type='list', elements='dict', default=[]),
+        groups=dict(type='list', elements='raw', default=[]),
+        users=dict(type='list', elements='raw', default=[]),
+        tokens=dict(type='list', elements='raw', default=[], no_log=False),
+        acls=dict(type='list', elements='dict', default=[]),
+        state_marker=dict(type='bool', default=False),
+    )
+    module_args.update(datacenter_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[('api_host', 'api_hosts')],
+        mutually_exclusive=[('api_host', 'api_hosts')],
+        supports_check_mode=True
+    )
+
+    try:
+        spec = normalize_spec(
+            storages=module.params['storages'],
+            groups=module.params['groups'],
+            users=module.params['users'],
+            tokens=module.params['tokens'],
+            acls=module.params['acls'],
+            schema=storage_schema(cached_api_schema(module)[1]),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        module.fail_json(msg="Invalid datacenter definition: {0}".format(e))
+
+    converge_datacenter(module, spec)
+
+if __name__ == '__main__':
+
+    main()
@@ -37,6 +37,7 @@ options:
 
 extends_documentation_fragment:
     - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
 
 author:
     - Cloud Codger (@cloudcodger) <cloud@codger.site>
@@ -72,6 +73,11 @@ group_id:
     returned: success
     type: str
     sample: 'Admin'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/access/users", "params": {}, "status": 200, "elapsed": 0.51}]}'
 msg:
     description: A short message on what the module did.
     returned: always
@@ -80,79 +86,9 @@ msg:
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
-
-class ProxmoxOpenSSHGroupAnsible(ProxmoxOpenSSHAnsible):
-
-    def get(self, groupid):
-        """
-        Get group info
-
-        :param groupid: str - name of the group
-        :return: dict - group info
-        """
-        try:
-            return self.proxmox_api.access.groups.get(groupid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to get group with ID {0}: {1}".format(groupid, e))
-
-    def exists(self, groupid):
-        """
-        Check if the group exists
-
-        :param groupid: str - name of the group
-        :return: bool - if the group exists
-        """
-        for group in self.get_groups():
-            if group['groupid'] == groupid:
-                return True
-        return False
-
-    def is_empty(self, groupid):
-        """
-        Check whether group has users
-
-        :param groupid: str - name of the group
-        :return: bool - if the group is empty
-        """
-        return True if not self.get(groupid)['members'] else False
-
-    def create(self, groupid, comment=None):
-        """
-        Create group
-
-        :param groupid: str - name of the group
-        :param comment: str
-        :return: None
-        """
-        if self.exists(groupid):
-            self.module.exit_json(changed=False, groupid=groupid, msg="Group {0} exists".format(groupid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.groups.create(groupid=groupid, comment=comment)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to create group with ID {0}: {1}".format(groupid, e))
-
-    def delete(self, groupid):
-        """
-        Delete group
-
-        :param groupid: str - name of the group
-        :return: None
-        """
-        if not self.exists(groupid):
-            self.module.exit_json(changed=False, groupid=groupid, msg="Group {0} doesn't exist".format(groupid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.groups.delete(groupid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to delete group with ID {0}: {1}".format(groupid, e))
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (ProxmoxOpenSSHGroupAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
 
 def main():
 
@@ -169,11 +105,19 @@ def main():
         supports_check_mode=True
     )
 
-    proxmox_group = ProxmoxOpenSSHGroupAnsible(module)
     comment = module.params['comment']
     groupid = module.params['groupid']
     state = module.params['state']
 
+    if state == 'present':
+        api_calls = [('POST', '/access/groups', dict(groupid=groupid, comment=comment))]
+    else:
+        api_calls = [('DELETE', '/access/groups/{groupid}', dict(groupid=groupid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_group = ProxmoxOpenSSHGroupAnsible(module)
+    validate_api_calls(proxmox_group, api_calls, validated)
+
     if state == 'present':
         proxmox_group.create(groupid, comment)
         module.exit_json(changed=True, groupid=groupid, msg="Group {0} successfully created".format(groupid))
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_permission_info
+
+short_description:
+  - Effective privileges of Proxmox VE users and API tokens on ACL paths
+
+version_added: "2.1.0"
+
+description:
+  - Computes what users and API tokens can do on ACL paths, for any number of queries.
+  - The ACLs, roles, users with their groups and tokens are read with one remote call, and the privileges of every
+    query are computed on the node running the module instead of with one C(/access/permissions) request each.
+  - Roles propagate down the path and are replaced by the roles set deeper, the roles of a user or token replace
+    those of its groups, C(NoAccess) wins over other roles, and a token with C(privsep) only has the privileges
+    it shares with its user, as the Proxmox VE API computes them.
+  - Uses the proxmoxer openssh backend.
+
+options:
+    queries:
+        description: Queries, each a dict with the C(principal), a user ID or C(user@realm!token), and the C(path).
+        type: list
+        elements: dict
+        default: []
+    principals:
+        description: Users and API tokens queried on every path of I(paths), in addition to I(queries).
+        type: list
+        elements: str
+        default: []
+    paths:
+        description: ACL paths queried for every principal of I(principals).
+        type: list
+        elements: str
+        default: []
+    privileges:
+        description:
+        - Privileges to check, each result then tells in C(allowed) whether the principal has all of them
+          and in C(missing) the ones it lacks.
+        type: list
+        elements: str
+    pools:
+        description:
+        - Also read the pools of the guests, so a guest on C(/vms/<vmid>) is also checked on the path of its pool.
+        - As with the API, the privileges of I(privileges) must all be granted on one of the two paths.
+        type: bool
+        default: false
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Check which tokens can power manage the production guests."
+  cloudcodger.proxmox_openssh.proxmox_permission_info:
+    api_host: "pve1"
+    api_user: "root"
+    principals: "{{ lookup('cloudcodger.proxmox_openssh.proxmox_access', 'tokens', host='pve1') | map(attribute='full_tokenid') }}"
+    paths: ["/vms/100", "/vms/101", "/storage/local"]
+    privileges: [VM.PowerMgmt]
+    pools: true
+  register: permissions
+
+- name: "List the tokens allowed to."
+  ansible.builtin.debug:
+    msg: "{{ permissions.permissions | selectattr('allowed') | map(attribute='principal') | unique }}"
+'''
+
+RETURN = r'''
+permissions:
+    description:
+    - One result for each query, in order, with C(principal), C(path), the C(roles) found on the path
+      and the sorted C(privileges), and C(allowed) and C(missing) when I(privileges) is given.
+    - For a guest in a pool with I(pools), C(roles) and C(privileges) include those on the pool, and
+      C(missing) lists what lacks on the path or the pool, whichever lacks the fewest privileges.
+    - C(roles) are those of the user for a token without C(privsep).
+    returned: success
+    type: list
+    sample: '[{"principal": "devops@pve!ansible", "path": "/vms/100", "roles": ["PVEAuditor"], "privileges": ["VM.Audit"], "allowed": false, "missing": ["VM.PowerMgmt"]}]'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": []}'
+msg:
+    description: A short message on what the module did.
+    returned: always
+    type: str
+    sample: "Computed 3 permissions"
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_permissions import (ProxmoxOpenSSHPermissionAnsible)
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    permission_args = dict(
+        queries=dict(type='list', elements='dict', default=[]),
+        principals=dict(type='list', elements='str', default=[]),
+        paths=dict(type='list', elements='str', default=[]),
+        privileges=dict(type='list', elements='str'),
+        pools=dict(type='bool', default=False),
+    )
+    module_args.update(permission_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    queries = []
+    for query in module.params['queries']:
+        if not query.get('principal') or not query.get('path'):
+            module.fail_json(msg="Query without a principal and a path: {0}".format(query))
+        queries.append((query['principal'], query['path']))
+    queries += [(principal, path) for principal in module.params['principals'] for path in module.params['paths']]
+    required = module.params['privileges']
+
+    proxmox_permission = ProxmoxOpenSSHPermissionAnsible(module)
+    trie = proxmox_permission.permission_trie(pools=module.params['pools'])
+
+    permissions = []
+    for principal, path in queries:
+        result = dict(principal=principal, path=path, roles=sorted(trie.path_roles(principal, path)),
+                      privileges=sorted(trie.privileges(principal, path)))
+        if required is not None:
+            result['allowed'], result['missing'] = trie.check(principal, path, required)
+        permissions.append(result)
+
+    module.exit_json(changed=False, permissions=permissions, msg="Computed {0} permissions".format(len(permissions)))
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_plan_apply
+
+short_description:
+  - Apply a reviewed plan of Proxmox VE Datacenter API writes
+
+version_added: "2.1.0"
+
+description:
+  - Runs the API writes recorded by the modules of this collection when called with I(api_plan).
+  - The writes for I(api_host) are sent back to back without reading the current state again.
+  - Aborts before the first write when the digests of C(/etc/pve/user.cfg) or C(/etc/pve/storage.cfg)
+    no longer match the ones the plan was computed from.
+  - Uses the proxmoxer openssh backend.
+
+options:
+    plan:
+        description: Path of the plan file written by the modules with I(api_plan).
+        required: true
+        type: path
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Plan the devops user and token."
+  cloudcodger.proxmox_openssh.proxmox_token:
+    api_host: "pve1"
+    api_user: "root"
+    api_plan: "/tmp/pve1.plan"
+    token: "ansible"
+    user: "devops@pve"
+
+- name: "Apply the reviewed plan."
+  cloudcodger.proxmox_openssh.proxmox_plan_apply:
+    api_host: "pve1"
+    api_user: "root"
+    plan: "/tmp/pve1.plan"
+'''
+
+RETURN = r'''
+applied:
+    description: The writes sent, in order, with the response of each one.
+    returned: success
+    type: list
+    sample: '[{"method": "POST", "path": "/access/users", "data": {"userid": "devops@pve"}, "params": {}, "response": null}]'
+msg:
+    description: A short message on what the module did.
+    returned: always
+    type: str
+    sample: "Applied 3 planned writes to pve1"
+'''
+
+import json
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
+
+class ProxmoxOpenSSHPlanApplyAnsible(ProxmoxOpenSSHAnsible):
+
+    def load(self, plan_path, host):
+        """
+        Load the part of a plan that targets a host
+
+        :param plan_path: str - path of the plan file
+        :param host: str - the API host
+        :return: tuple - the recorded digests and the list of writes
+        """
+        try:
+            with open(plan_path) as f:
+                plan = json.load(f)
+        except Exception as e:
+            self.module.fail_json(msg="Unable to read plan {0}: {1}".format(plan_path, e))
+
+        if host not in plan.get('hosts', {}):
+            self.module.exit_json(changed=False, applied=[], msg="Plan {0} has no writes for {1}".format(plan_path, host))
+
+        writes = [write for write in plan.get('writes', []) if write['host'] == host]
+        return plan['hosts'][host]['digests'], writes
+
+    def verify(self, digests):
+        """
+        Abort when the configuration changed since the plan was computed
+
+        :param digests: dict - sha1 digest per configuration file recorded in the plan
+        :return: None
+        """
+        try:
+            current = self.config_digests(sorted(digests))
+        except Exception as e:
+            self.module.fail_json(msg="Unable to verify the plan digests: {0}".format(e))
+
+        changed_files = [path for path in sorted(digests) if current.get(path) != digests[path]]
+        if changed_files:
+            self.module.fail_json(msg="Configuration changed since the plan was computed: {0}".format(', '.join(changed_files)))
+
+    def apply(self, writes):
+        """
+        Send the planned writes back to back
+
+        :param writes: list - the planned writes
+        :return: list - the writes with the response of each one
+        """
+        applied = []
+        for write in writes:
+            resource = self.proxmox_api(write['path'].strip('/'))
+            try:
+                if write['method'] == 'POST':
+                    response = resource.create(**write['data'])
+                elif write['method'] == 'PUT':
+                    response = resource.set(**write['data'])
+                else:
+                    response = resource.delete(**write['params'])
+            except Exception as e:
+                self.module.fail_json(msg="Failed to apply {0} {1} after {2} of {3} writes: {4}".format(
+                    write['method'], write['path'], len(applied), len(writes), e), applied=applied)
+            applied.append(dict(write, response=response))
+        return applied
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    # Applying a plan never records a new one
+    del module_args['api_plan']
+    plan_args = dict(
+        plan=dict(type='path', required=True),
+    )
+    module_args.update(plan_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    proxmox_plan = ProxmoxOpenSSHPlanApplyAnsible(module)
+    api_host = module.params['api_host']
+    plan = module.params['plan']
+
+    digests, writes = proxmox_plan.load(plan, api_host)
+    proxmox_plan.verify(digests)
+
+    if module.check_mode or not writes:
+        module.exit_json(changed=bool(writes), applied=[], msg="{0} planned writes for {1}".format(len(writes), api_host))
+
+    applied = proxmox_plan.apply(writes)
+    module.exit_json(changed=True, applied=applied, msg="Applied {0} planned writes to {1}".format(len(applied), api_host))
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_pool
+
+short_description:
+  - Proxmox Resource Pool management for Proxmox VE Datacenter
+
+version_added: "2.1.0"
+
+description:
+  - Create, update or delete a resource pool of Proxmox VE Datacenter and set its members.
+  - The guests and storages of the pool are read once and the members to add and remove are computed from that read.
+  - All members are added with one request and all members are removed with one request.
+  - Permissions on a pool are set with M(cloudcodger.proxmox_openssh.proxmox_acl) on the C(/pool/<poolid>) path.
+  - Uses the proxmoxer openssh backend.
+
+options:
+    poolid:
+        aliases: [ 'pool', 'name' ]
+        description: The pool ID.
+        required: true
+        type: str
+    comment:
+        description: A description text for the pool.
+        required: false
+        type: str
+    vms:
+        description:
+        - The complete list of the VMIDs of the guests, VMs and containers, that are members of the pool.
+        - Guests of the pool that are not listed are removed from it. When not given the guests of the pool are kept.
+        required: false
+        type: list
+        elements: int
+    storages:
+        description:
+        - The complete list of the storages that are members of the pool.
+        - Storages of the pool that are not listed are removed from it. When not given the storages of the pool are kept.
+        required: false
+        type: list
+        elements: str
+    allow_move:
+        description: Move listed guests that are members of another pool instead of failing.
+        type: bool
+        default: false
+    state:
+        description:
+        - The desired state of the pool.
+        - An absent pool is emptied before it is deleted.
+        choices: [ 'present', 'absent' ]
+        default: present
+        type: str
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Assign the guests and storage of a tenant to its pool."
+  cloudcodger.proxmox_openssh.proxmox_pool:
+    api_host: "pve1"
+    api_user: "root"
+    pool: "tenant-a"
+    comment: "Tenant A"
+    vms: "{{ range(1000, 1300) | list }}"
+    storages: [tenant-a-data]
+    allow_move: true
+
+- name: "Give the tenant group access to its pool."
+  cloudcodger.proxmox_openssh.proxmox_acl:
+    api_host: "pve1"
+    api_user: "root"
+    path: "/pool/tenant-a"
+    roleid: "PVEVMAdmin"
+    groups: "tenant-a"
+
+- name: "Delete the pool, its guests and storages are kept."
+  cloudcodger.proxmox_openssh.proxmox_pool:
+    api_host: "pve1"
+    api_user: "root"
+    pool: "tenant-a"
+    state: absent
+'''
+
+RETURN = r'''
+pool_id:
+    description: The pool ID.
+    returned: success
+    type: str
+    sample: 'tenant-a'
+created:
+    description: If the pool was created.
+    returned: success i(state=present)
+    type: bool
+    sample: false
+changes:
+    description: The VMIDs and storages added to and removed from the pool, and the new comment.
+    returned: success
+    type: dict
+    sample: '{"add_vms": [1001, 1002], "remove_vms": [999], "add_storages": [], "remove_storages": []}'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 3, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/pools/tenant-a", "params": {}, "status": 200, "elapsed": 0.51}]}'
+msg:
+    description: A short message on what the module did.
+    returned: always
+    type: str
+    sample: "Pool tenant-a successfully updated"
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (ProxmoxOpenSSHPoolAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    pool_args = dict(
+        poolid=dict(type='str', aliases=['pool', 'name'], required=True),
+        comment=dict(type='str'),
+        vms=dict(type='list', elements='int'),
+        storages=dict(type='list', elements='str'),
+        allow_move=dict(type='bool', default=False),
+        state=dict(type='str', choices=['present', 'absent'], default='present'),
+    )
+    module_args.update(pool_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    poolid = module.params['poolid']
+    comment = module.params['comment']
+    vms = module.params['vms']
+    storages = module.params['storages']
+    state = module.params['state']
+
+    if state == 'present':
+        update = dict(poolid=poolid, comment=comment, vms=','.join(str(vmid) for vmid in vms or []) or None,
+                      storage=','.join(storages or []) or None)
+        if module.params['allow_move']:
+            update['allow-move'] = 1
+        api_calls = [('POST', '/pools', dict(poolid=poolid, comment=comment)), ('PUT', '/pools/{poolid}', update)]
+    else:
+        api_calls = [('DELETE', '/pools/{poolid}', dict(poolid=poolid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_pool = ProxmoxOpenSSHPoolAnsible(module)
+    validate_api_calls(proxmox_pool, api_calls, validated)
+
+    if state == 'present':
+        created, changes = proxmox_pool.ensure(poolid, comment, vms, storages, module.params['allow_move'])
+        changed = created or any(changes.values())
+        if created:
+            msg = "Pool {0} successfully created".format(poolid)
+        elif changed:
+            msg = "Pool {0} successfully updated".format(poolid)
+        else:
+            msg = "Pool {0} exists".format(poolid)
+        module.exit_json(changed=changed, pool_id=poolid, created=created, changes=changes, msg=msg)
+    else:
+        changes = proxmox_pool.delete(poolid)
+        if changes is None:
+            module.exit_json(changed=False, pool_id=poolid, changes={}, msg="Pool {0} doesn't exist".format(poolid))
+        module.exit_json(changed=True, pool_id=poolid, changes=changes, msg="Pool {0} successfully deleted".format(poolid))
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2026, Cloud Codger <cloud@codger.site>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: proxmox_storage
+
+short_description:
+  - Proxmox VE Datacenter Storage management for dir, nfs, lvmthin, zfspool and pbs types
+
+version_added: "2.1.0"
+
+description:
+  - Manage Storage of several types for Proxmox VE Datacenter.
+  - Options are validated and normalized against the storage API schema of the cluster version,
+    cached on the control node by an earlier run, so invalid options fail before connecting to the host.
+  - Without a cached API schema a local copy is used, which only knows the options of each type
+    that this collection was written for.
+  - All options that differ from the current config are applied with one request.
+  - Options that can only be set at creation, like I(path) or C(server), fail when they differ.
+  - Secret options, the I(password) and I(encryption_key) of a C(pbs) storage, are only sent when the storage is created
+    and are never returned.
+  - Uses proxmoxer openssh backend.
+
+options:
+    storage:
+        aliases: [ 'name', 'storageid' ]
+        description: The Storage ID (for example, local).
+        required: true
+        type: str
+    type:
+        description:
+        - The storage type.
+        - Required if I(state=present).
+        choices: [ 'dir', 'lvmthin', 'nfs', 'pbs', 'zfspool' ]
+        type: str
+    content:
+        description: List of allowed content types.
+        type: list
+        elements: str
+    disable:
+        description: Disable the storage.
+        type: bool
+    nodes:
+        description: List of cluster nodes the storage is limited to.
+        type: list
+        elements: str
+    path:
+        description: File system path, for C(dir) and C(nfs) storages.
+        type: str
+    shared:
+        description: Mark a C(dir) storage as shared.
+        type: bool
+    password:
+        description: Password of the C(pbs) storage user, only sent when the storage is created.
+        type: str
+    encryption_key:
+        description: Client side encryption key of a C(pbs) storage, only sent when the storage is created.
+        type: str
+    options:
+        description:
+        - Any other option of the storage type, using the API option names.
+        - For example C(server), C(export) and C(options) for C(nfs) or C(vgname) and C(thinpool) for C(lvmthin).
+        - The secret options are set with I(password) and I(encryption_key).
+        type: dict
+        default: {}
+    state:
+        description: The desired state of the storage.
+        choices: [ 'present', 'absent' ]
+        default: present
+        type: str
+
+extends_documentation_fragment:
+    - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
+
+author:
+    - Cloud Codger (@cloudcodger) <cloud@codger.site>
+'''
+
+EXAMPLES = r'''
+- name: "Create an NFS backup storage."
+  cloudcodger.proxmox_openssh.proxmox_storage:
+    api_host: "pve1"
+    api_user: "root"
+    storage: "nas-backup"
+    type: nfs
+    content: [backup]
+    path: "/mnt/pve/nas-backup"
+    options:
+      server: "192.168.1.10"
+      export: "/volume1/backup"
+      prune-backups: "keep-last=7"
+
+- name: "Create an LVM-thin storage on two nodes."
+  cloudcodger.proxmox_openssh.proxmox_storage:
+    api_host: "pve1"
+    api_user: "root"
+    storage: "data"
+    type: lvmthin
+    content: [images, rootdir]
+    nodes: [pve1, pve2]
+    options:
+      vgname: "pve"
+      thinpool: "data"
+
+- name: "Add a Proxmox Backup Server datastore."
+  cloudcodger.proxmox_openssh.proxmox_storage:
+    api_host: "pve1"
+    api_user: "root"
+    storage: "pbs"
+    type: pbs
+    options:
+      server: "pbs.example.com"
+      datastore: "store1"
+      username: "backup@pbs"
+      fingerprint: "{{ pbs_fingerprint }}"
+    password: "{{ pbs_password }}"
+
+- name: "Delete the nas-backup storage."
+  cloudcodger.proxmox_openssh.proxmox_storage:
+    api_host: "pve1"
+    api_user: "root"
+    storage: "nas-backup"
+    state: absent
+'''
+
+RETURN = r'''
+storage_id:
+    description: The storage ID.
+    returned: success
+    type: str
+    sample: 'nas-backup'
+storage_type:
+    description: The storage type.
+    returned: success i(state=present)
+    type: str
+    sample: 'nfs'
+created:
+    description: If the storage was created.
+    returned: success i(state=present)
+    type: bool
+    sample: false
+changes:
+    description: The normalized options that were set, without the secret options.
+    returned: success i(state=present)
+    type: dict
+    sample: '{"content": "backup,iso"}'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/storage", "params": {}, "status": 200, "elapsed": 0.51}]}'
+msg:
+    description: A short message on what the module did.
+    returned: always
+    type: str
+    sample: "Storage nas-backup successfully updated"
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (
+    STORAGE_SCHEMA, ProxmoxOpenSSHStorageAnsible, storage_schema, validate_storage_options)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (
+    cached_api_schema, preflight_validate, validate_api_calls)
+
+def main():
+
+    module_args = proxmox_openssh_argument_spec()
+    storage_args = dict(
+        storageid=dict(type='str', aliases=['storage', 'name'], required=True),
+        type=dict(type='str', choices=sorted(STORAGE_SCHEMA)),
+        content=dict(type='list', elements='str'),
+        disable=dict(type='bool'),
+        nodes=dict(type='list', elements='str'),
+        path=dict(type='str'),
+        shared=dict(type='bool'),
+        password=dict(type='str', no_log=True),
+        encryption_key=dict(type='str', no_log=True),
+        options=dict(type='dict', default={}),
+        state=dict(type='str', choices=['present', 'absent'], default='present'),
+    )
+    module_args.update(storage_args)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_if=[('state', 'present', ['type'])],
+        supports_check_mode=True
+    )
+
+    storageid = module.params['storageid']
+    storage_type = module.params['type']
+    state = module.params['state']
+
+    if state == 'present':
+        # Validate before connecting so mistakes fail without a round trip
+        options = dict(module.params['options'])
+        # Secrets have their own parameters so they are kept out of the logged invocation
+        for name in ('password', 'encryption-key'):
+            if name in options:
+                module.fail_json(msg="Set the {0} of storage {1} with the {2} parameter, not in options".format(
+                    name, storageid, name.replace('-', '_')))
+        for name in ('content', 'disable', 'nodes', 'path', 'shared', 'password', 'encryption_key'):
+            if module.params[name] is not None:
+                options[name.replace('_', '-')] = module.params[name]
+        try:
+            options = validate_storage_options(storage_type, options, storage_schema(cached_api_schema(module)[1]))
+        except ValueError as e:
+            module.fail_json(msg="Invalid options for storage {0}: {1}".format(storageid, e))
+        api_calls = [('POST', '/storage', dict(options, storage=storageid, type=storage_type))]
+    else:
+        api_calls = [('DELETE', '/storage/{storage}', dict(storage=storageid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_storage = ProxmoxOpenSSHStorageAnsible(module)
+    validate_api_calls(proxmox_storage, api_calls, validated)
+
+    if state == 'present':
+        created, changes = proxmox_storage.ensure(storageid, storage_type, options)
+        if created:
+            msg = "Storage {0} successfully created".format(storageid)
+        elif changes:
+            msg = "Storage {0} successfully updated".format(storageid)
+        else:
+            msg = "Storage {0} exists".format(storageid)
+        module.exit_json(changed=created or bool(changes), storage_id=storageid, storage_type=storage_type,
+                         created=created, changes=changes, msg=msg)
+    else:
+        proxmox_storage.delete(storageid)
+        module.exit_json(changed=True, storage_id=storageid, msg="Storage {0} successfully deleted".format(storageid))
+
+if __name__ == '__main__':
+
+    main()
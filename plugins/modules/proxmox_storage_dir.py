@@ -16,14 +16,37 @@ version_added: "1.0.0"
 
 description:
   - Manage directory type Storage for Proxmox VE Datacenter.
+  - With I(storages) many storages are reconciled from one C(/storage) listing, and the creates, updates and deletes
+    are sent with at most I(api_workers) requests at a time.
   - Uses proxmoxer openssh backend.
 
 options:
     storage:
         aliases: [ 'name', 'storageid' ]
-        description: The Storage ID (for example, local).
-        required: true
+        description:
+        - The Storage ID (for example, local).
+        - Required unless I(storages) is given.
         type: str
+    storages:
+        description:
+        - Directory storages to reconcile in one run, each a dict with C(storage), C(path), C(content)
+          (default C(images)) and C(shared) (default C(false)).
+        - Mutually exclusive with I(storage) and I(path), I(content) and I(shared) are ignored.
+        - With I(state=absent) the listed storages are deleted, only their C(storage) is used.
+        type: list
+        elements: dict
+    exclusive:
+        description:
+        - With I(storages), delete the directory storages that are not listed.
+        - This includes the C(local) storage of a new installation unless it is listed.
+        - Fails when I(storages) is empty, rather than deleting every directory storage.
+        - Can't be combined with I(state=absent).
+        type: bool
+        default: false
+    api_workers:
+        description: Maximum number of storages of I(storages) written at the same time.
+        type: int
+        default: 4
     content:
         description: Comma seperated list of content types.
         default: 'images'
@@ -45,6 +68,7 @@ options:
 
 extends_documentation_fragment:
     - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
 
 author:
     - Cloud Codger (@cloudcodger) <cloud@codger.site>
@@ -78,6 +102,32 @@ EXAMPLES = r'''
     storage: "shared"
     state: present
 
+- name: "Reconcile all directory storages, removing the ones not listed."
+  cloudcodger.proxmox_openssh.proxmox_storage_dir:
+    api_host: "pve1"
+    api_user: "root"
+    storages:
+      - storage: local
+        path: /var/lib/vz
+        content: "backup,iso,vztmpl"
+      - storage: shared
+        path: /etc/pve/configs
+        content: snippets
+        shared: true
+      - storage: ci
+        path: /var/lib/ci
+        content: "images,iso"
+    exclusive: true
+
+- name: "Delete the ci and test storages that exist."
+  cloudcodger.proxmox_openssh.proxmox_storage_dir:
+    api_host: "pve1"
+    api_user: "root"
+    storages:
+      - storage: ci
+      - storage: test
+    state: absent
+
 - name: "Delete the test storage."
   cloudcodger.proxmox_openssh.proxmox_storage_dir:
     api_host: "pve1"
@@ -94,9 +144,19 @@ storage_content:
     sample: 'images,iso'
 storage_id:
     description: The storage ID.
-    returned: success
+    returned: success, unless I(storages) is given
     type: str
     sample: 'local-ci'
+actions:
+    description: The storages created, updated with their C(changes) and deleted.
+    returned: when I(storages) is given
+    type: list
+    sample: '[{"action": "create", "id": "ci"}, {"action": "update", "id": "shared", "changes": {"content": "snippets"}}]'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/access/users", "params": {}, "status": 200, "elapsed": 0.51}]}'
 msg:
     description: A short message on what the module did.
     returned: always
@@ -105,109 +165,90 @@ msg:
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
-
-class ProxmoxOpenSSHStorageDirectoryAnsible(ProxmoxOpenSSHAnsible):
-
-    def get(self, storageid):
-        """
-        Get directory type storage info
-
-        :param storageid: str - name of the directory type storage
-        :return: dict - storage info
-        """
-        try:
-            return self.proxmox_api.storage.get(storageid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to get directory type storage with ID {0}: {1}".format(storageid, e))
-
-    def exists(self, storageid):
-        """
-        Check if the storage exists
-
-        :param storageid: str - name of the directory type storage
-        :return: bool - if the storage exists
-        """
-        for storage in self.get_storages(type='dir'):
-            if storage['storage'] == storageid:
-                return True
-        return False
-
-    def create(self, storageid, path, content=None, shared=False):
-        """
-        Create a directory type storage
-
-        :param storageid: str - name of the directory type storage
-        :param path: str - file system path
-        :param content: str - comma seperated list of allowed content types
-        :param shared: bool - mark the storage as shared
-        :return: None
-        """
-        changed = False
-
-        if self.exists(storageid):
-            storage_item = self.get(storageid)
-            if content is not None and not set(storage_item['content']) == set(content):
-                self.proxmox_api.storage(storageid).set(content=content)
-                changed = True
-            if 'shared' not in storage_item or storage_item['shared'] != int(shared):
-                self.proxmox_api.storage(storageid).set(shared=shared)
-                changed = True
-            if changed:
-                return
-            self.module.exit_json(changed=False, storage_id=storageid, storage_content=content, msg="Storage {0} exists".format(storageid))
-
-        if self.module.check_mode:
-            return
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (
+    ProxmoxOpenSSHStorageAnsible, ProxmoxOpenSSHStorageDirectoryAnsible, validate_storage_options)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
 
+def reconcile(module):
+    state = module.params['state']
+    # An empty list, for example from an undefined variable, would delete every directory storage
+    if module.params['exclusive'] and not module.params['storages']:
+        module.fail_json(msg="exclusive requires at least one storage in storages, refusing to delete every directory storage")
+    if module.params['exclusive'] and state == 'absent':
+        module.fail_json(msg="exclusive keeps the listed storages and can't be combined with state=absent")
+
+    storages = []
+    for storage in module.params['storages']:
+        storageid = storage.get('storage') or storage.get('storageid') or storage.get('name')
+        if not storageid:
+            module.fail_json(msg="Storage without a storage ID: {0}".format(storage))
+        if state == 'absent':
+            storages.append((storageid, {}))
+            continue
         try:
-            self.proxmox_api.storage.create(storage=storageid, type='dir', path=path, content=content, shared=shared)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to create storage with ID {0} and path {1}: {2}".format(storageid, path, e))
-
-    def delete(self, storageid):
-        """
-        Delete directory type storage
-
-        :param storageid: str - name of the directory type storage
-        :return: None
-        """
-        if not self.exists(storageid):
-            self.module.exit_json(changed=False, storage_id=storageid, msg="storage {0} doesn't exist".format(storageid))
+            options = validate_storage_options('dir', dict(path=storage.get('path'), content=storage.get('content', 'images'),
+                                                           shared=storage.get('shared', False)))
+        except ValueError as e:
+            module.fail_json(msg="Invalid storage {0}: {1}".format(storageid, e))
+        storages.append((storageid, options))
+
+    if state == 'absent':
+        api_calls = [('DELETE', '/storage/{storage}', dict(storage=storageid)) for storageid, options in storages]
+    else:
+        api_calls = [('POST', '/storage', dict(options, storage=storageid, type='dir')) for storageid, options in storages]
+    validated = preflight_validate(module, api_calls)
 
-        if self.module.check_mode:
-            return
+    proxmox_storage = ProxmoxOpenSSHStorageAnsible(module)
+    validate_api_calls(proxmox_storage, api_calls, validated)
 
-        try:
-            self.proxmox_api.storage.delete(storageid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to delete directory type storage with ID {0}: {1}".format(storageid, e))
+    actions = proxmox_storage.reconcile('dir', storages, exclusive=module.params['exclusive'], workers=module.params['api_workers'],
+                                        state=state)
+    module.exit_json(changed=bool(actions), actions=actions,
+                     msg="Reconciled {0} storages with {1} changes".format(len(storages), len(actions)))
 
 def main():
 
     module_args = proxmox_openssh_argument_spec()
     storage_args = dict(
-        storageid=dict(type='str', aliases=['storage', 'name'], required=True),
+        storageid=dict(type='str', aliases=['storage', 'name']),
         content=dict(type='str', default='images'),
         path=dict(type='str'),
         shared=dict(type="bool", default=False),
         state=dict(type='str', choices=['present', 'absent'], default='present'),
+        storages=dict(type='list', elements='dict'),
+        exclusive=dict(type='bool', default=False),
+        api_workers=dict(type='int', default=4),
     )
     module_args.update(storage_args)
 
     module = AnsibleModule(
         argument_spec=module_args,
-        required_if=[('state', 'present', ['path'])],
+        required_one_of=[('storageid', 'storages')],
+        mutually_exclusive=[('storageid', 'storages'), ('path', 'storages')],
         supports_check_mode=True
     )
 
-    proxmox_storage = ProxmoxOpenSSHStorageDirectoryAnsible(module)
+    if module.params['storages'] is not None:
+        reconcile(module)
+    if module.params['state'] == 'present' and not module.params['path']:
+        module.fail_json(msg="state is present but all of the following are missing: path")
+
     content = module.params['content'].lower()
     path = module.params['path']
     shared = module.params['shared']
     storageid = module.params['storageid']
     state = module.params['state']
 
+    if state == 'present':
+        api_calls = [('POST', '/storage', dict(storage=storageid, type='dir', path=path, content=content, shared=shared))]
+    else:
+        api_calls = [('DELETE', '/storage/{storage}', dict(storage=storageid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_storage = ProxmoxOpenSSHStorageDirectoryAnsible(module)
+    validate_api_calls(proxmox_storage, api_calls, validated)
+
     if state == 'present':
         proxmox_storage.create(storageid, path, content, shared)
         module.exit_json(changed=True, storage_id=storageid, storage_content=content, msg="Storage {0} successfully created".format(storageid))
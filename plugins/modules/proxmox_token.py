@@ -16,6 +16,7 @@ version_added: "1.0.0"
 
 description:
   - Create or delete a user-specific API token for Proxmox VE Datacenter.
+  - With I(cascade=true) a deleted token is removed with its ACLs, with one request for each path and role.
   - Uses the proxmoxer openssh backend.
 
 options:
@@ -40,6 +41,12 @@ options:
         description: Restrict API token privileges with separate ACLs (default), or give full privileges of corresponding user.
         default: true
         type: bool
+    cascade:
+        description:
+        - When deleting the token, first delete the ACLs referencing it.
+        - In check mode the ACLs that would be deleted are reported.
+        type: bool
+        default: false
     state:
         description: The desired state of the user.
         choices: [ 'present', 'absent' ]
@@ -48,6 +55,7 @@ options:
 
 extends_documentation_fragment:
     - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
 
 author:
     - Cloud Codger (@cloudcodger) <cloud@codger.site>
@@ -78,6 +86,15 @@ EXAMPLES = r'''
     token: "ansible"
     user: "devops@pve"
     state: absent
+
+- name: "Delete devops user-specific token and the ACLs referencing it."
+  cloudcodger.proxmox_openssh.proxmox_token:
+    api_host: "pve1"
+    api_user: "root"
+    token: "ansible"
+    user: "devops@pve"
+    cascade: true
+    state: absent
 '''
 
 RETURN = r'''
@@ -96,6 +113,16 @@ userid:
     returned: success
     type: str
     sample: 'devops@pve'
+cascade:
+    description: The ACLs deleted with the token, as C(path:roleid:type:ugid).
+    returned: changed i(cascade=true)
+    type: dict
+    sample: '{"acls": ["/:PVEAuditor:token:devops@pve!ansible"]}'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/access/users", "params": {}, "status": 200, "elapsed": 0.51}]}'
 msg:
     description: A short message on what the module did.
     returned: always
@@ -104,82 +131,9 @@ msg:
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
-
-class ProxmoxOpenSSHTokenAnsible(ProxmoxOpenSSHAnsible):
-
-    def get(self, tokenid, userid):
-        """
-        Get user-specific token info
-
-        :param tokenid: str - the Token ID
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: dict - token info
-        """
-        try:
-            return self.proxmox_api.access.users(userid).get_token(tokenid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to get token ID {0} for user ID {1}: {2}".format(tokenid, userid, e))
-
-    def exists(self, tokenid, userid):
-        """
-        Check if the user-specific token exists
-
-        :param tokenid: str - the Token ID
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: bool - if the user-specific token exists
-        """
-        for user in self.get_users():
-            if user['userid'] == userid:
-                for token in self.proxmox_api.access.users(userid).token.get():
-                    if token['tokenid'] == tokenid:
-                        return True
-        return False
-
-    def create(self, tokenid, userid, comment=None, privsep=True, expire=0):
-        """
-        Create user-specific token
-
-        :param tokenid: str - the Token ID
-        :param userid: str - full User ID, in the `name@realm` format
-        :param comment: str
-        :param privsep: bool
-        :param expire: int - seconds since epoch
-        :return: None
-        """
-        if self.exists(tokenid, userid):
-            self.module.exit_json(changed=False, tokenid=tokenid, userid=userid, msg="Token {0} for user {1} exists".format(tokenid, userid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            return self.proxmox_api.access.users(userid).token(tokenid).create(
-                comment=comment,
-                privsep=privsep,
-                expire=expire,
-                )
-        except Exception as e:
-            self.module.fail_json(msg="Failed to create token with ID {0} for user with ID {1}: {2}".format(tokenid, userid, e))
-
-    def delete(self, tokenid, userid):
-        """
-        Delete user-specific token
-
-        :param tokenid: str - the Token ID
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: None
-        """
-        if not self.exists(tokenid, userid):
-            self.module.exit_json(changed=False, tokenid=tokenid, userid=userid, msg="Token {0} for user {1} doesn't exist".format(tokenid, userid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.users(userid).token(tokenid).delete()
-        except Exception as e:
-            self.module.fail_json(msg="Failed to delete token {0} for user with ID {1}: {2}".format(tokenid, userid, e))
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (ProxmoxOpenSSHTokenAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
 
 def main():
 
@@ -190,6 +144,7 @@ def main():
         comment=dict(type="str"),
         privsep=dict(type="bool", default=True),
         expire=dict(type="int", default=0),
+        cascade=dict(type='bool', default=False),
         state=dict(type='str', choices=['present', 'absent'], default='present'),
     )
     module_args.update(token_args)
@@ -199,7 +154,6 @@ def main():
         supports_check_mode=True
     )
 
-    proxmox_token = ProxmoxOpenSSHTokenAnsible(module)
     tokenid = module.params['tokenid']
     userid = module.params['userid']
     comment = module.params['comment']
@@ -207,6 +161,16 @@ def main():
     expire = module.params['expire']
     state = module.params['state']
 
+    if state == 'present':
+        api_calls = [('POST', '/access/users/{userid}/token/{tokenid}', dict(userid=userid, tokenid=tokenid, comment=comment,
+                                                                             privsep=privsep, expire=expire))]
+    else:
+        api_calls = [('DELETE', '/access/users/{userid}/token/{tokenid}', dict(userid=userid, tokenid=tokenid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_token = ProxmoxOpenSSHTokenAnsible(module)
+    validate_api_calls(proxmox_token, api_calls, validated)
+
     if state == 'present':
         new_token = proxmox_token.create(
             tokenid,
@@ -215,6 +179,10 @@ def main():
             privsep=privsep,
             expire=expire)
         module.exit_json(changed=True, tokenid=tokenid, token=new_token['value'], userid=userid, msg="Token {0} for User {1} successfully created".format(tokenid, userid))
+    elif module.params['cascade']:
+        cascade = proxmox_token.cascade_delete(tokenid, userid)
+        module.exit_json(changed=True, tokenid=tokenid, userid=userid, cascade=cascade,
+                         msg="Token {0} for User {1} successfully deleted with {2} ACLs".format(tokenid, userid, len(cascade['acls'])))
     else:
         proxmox_token.delete(tokenid, userid)
         module.exit_json(changed=True, tokenid=tokenid, userid=userid, msg="Token {0} for User {1} successfully deleted".format(tokenid, userid))
@@ -16,6 +16,8 @@ version_added: "1.0.0"
 
 description:
   - Create or delete a user for Proxmox VE Datacenter.
+  - With I(cascade=true) a deleted user is removed with its API tokens and the ACLs of both, the ACLs with one
+    request for each path and role.
   - Uses the proxmoxer openssh backend.
 
 options:
@@ -39,6 +41,12 @@ options:
     lastname:
         description: The last name for the user.
         type: str
+    cascade:
+        description:
+        - When deleting the user, first delete the ACLs referencing the user and its tokens, then its tokens.
+        - In check mode the ACLs and tokens that would be deleted are reported.
+        type: bool
+        default: false
     state:
         description: The desired state of the user.
         choices: [ 'present', 'absent' ]
@@ -47,6 +55,7 @@ options:
 
 extends_documentation_fragment:
     - cloudcodger.proxmox_openssh.proxmox.documentation
+    - cloudcodger.proxmox_openssh.proxmox.plan
 
 author:
     - Cloud Codger (@cloudcodger) <cloud@codger.site>
@@ -75,6 +84,14 @@ EXAMPLES = r'''
     api_user: "root"
     user: "devops@pve"
     state: absent
+
+- name: "Delete devops user with its tokens and all the ACLs referencing them."
+  cloudcodger.proxmox_openssh.proxmox_user:
+    api_host: "pve1"
+    api_user: "root"
+    user: "devops@pve"
+    cascade: true
+    state: absent
 '''
 
 RETURN = r'''
@@ -83,6 +100,16 @@ user_id:
     returned: success
     type: str
     sample: 'devops@pve'
+cascade:
+    description: The ACLs, as C(path:roleid:type:ugid), and the tokens deleted with the user.
+    returned: changed i(cascade=true)
+    type: dict
+    sample: '{"acls": ["/:PVEAuditor:token:devops@pve!ansible", "/vms:PVEVMAdmin:user:devops@pve"], "tokens": ["devops@pve!ansible"]}'
+proxmox_metrics:
+    description: The Proxmox VE API calls made by the module, used by the C(proxmox_profile) callback plugin.
+    returned: always
+    type: dict
+    sample: '{"backend": "openssh", "connections": 2, "elapsed": 1.02, "host": "pve1", "calls": [{"method": "GET", "path": "/access/users", "params": {}, "status": 200, "elapsed": 0.51}]}'
 msg:
     description: A short message on what the module did.
     returned: always
@@ -91,81 +118,9 @@ msg:
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (ProxmoxOpenSSHAnsible, proxmox_openssh_argument_spec)
-
-class ProxmoxOpenSSHUserAnsible(ProxmoxOpenSSHAnsible):
-
-    def get(self, userid):
-        """
-        Get user info
-
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: dict - user info
-        """
-        try:
-            return self.proxmox_api.access.users.get(userid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to get user with ID {0}: {1}".format(userid, e))
-
-    def exists(self, userid):
-        """
-        Check if the user exists
-
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: bool - if the user exists
-        """
-        for user in self.get_users():
-            if user['userid'] == userid:
-                return True
-        return False
-
-    def create(self, userid, comment=None, email=None, groups=None, firstname=None, lastname=None):
-        """
-        Create user
-
-        :param userid: str - full User ID, in the `name@realm` format
-        :param comment: str
-        :param email: str
-        :param groups: str
-        :param firstname: str
-        :param lastname: str
-        :return: None
-        """
-        if self.exists(userid):
-            self.module.exit_json(changed=False, userid=userid, msg="User {0} exists".format(userid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.users.create(
-                userid=userid,
-                comment=comment,
-                email=email,
-                groups=groups,
-                firstname=firstname,
-                lastname=lastname,
-                )
-        except Exception as e:
-            self.module.fail_json(msg="Failed to create user with ID {0}: {1}".format(userid, e))
-
-    def delete(self, userid):
-        """
-        Delete user
-
-        :param userid: str - full User ID, in the `name@realm` format
-        :return: None
-        """
-        if not self.exists(userid):
-            self.module.exit_json(changed=False, userid=userid, msg="User {0} doesn't exist".format(userid))
-
-        if self.module.check_mode:
-            return
-
-        try:
-            self.proxmox_api.access.users.delete(userid)
-        except Exception as e:
-            self.module.fail_json(msg="Failed to delete user with ID {0}: {1}".format(userid, e))
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (proxmox_openssh_argument_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (ProxmoxOpenSSHUserAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (preflight_validate, validate_api_calls)
 
 def main():
 
@@ -177,6 +132,7 @@ def main():
         groups=dict(type="str"),
         firstname=dict(type="str"),
         lastname=dict(type="str"),
+        cascade=dict(type='bool', default=False),
         state=dict(type='str', choices=['present', 'absent'], default='present'),
     )
     module_args.update(user_args)
@@ -186,7 +142,6 @@ def main():
         supports_check_mode=True
     )
 
-    proxmox_user = ProxmoxOpenSSHUserAnsible(module)
     userid = module.params['userid']
     comment = module.params['comment']
     email = module.params['email']
@@ -195,9 +150,23 @@ def main():
     lastname = module.params['lastname']
     state = module.params['state']
 
+    if state == 'present':
+        api_calls = [('POST', '/access/users', dict(userid=userid, comment=comment, email=email, groups=groups,
+                                                    firstname=firstname, lastname=lastname))]
+    else:
+        api_calls = [('DELETE', '/access/users/{userid}', dict(userid=userid))]
+    validated = preflight_validate(module, api_calls)
+
+    proxmox_user = ProxmoxOpenSSHUserAnsible(module)
+    validate_api_calls(proxmox_user, api_calls, validated)
+
     if state == 'present':
         proxmox_user.create(userid, comment=comment, email=email, groups=groups, firstname=firstname, lastname=lastname)
         module.exit_json(changed=True, userid=userid, msg="User {0} successfully created".format(userid))
+    elif module.params['cascade']:
+        cascade = proxmox_user.cascade_delete(userid)
+        module.exit_json(changed=True, userid=userid, cascade=cascade,
+                         msg="User {0} successfully deleted with {1} tokens and {2} ACLs".format(userid, len(cascade['tokens']), len(cascade['acls'])))
     else:
         proxmox_user.delete(userid)
         module.exit_json(changed=True, userid=userid, msg="User {0} successfully deleted".format(userid))
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+import time
+
+import pytest
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh import (
+    ProxmoxOpenSSHAnsible, ProxmoxOpenSSHCache, ProxmoxOpenSSHHostExit, ProxmoxOpenSSHPlanSession, ProxmoxOpenSSHUnsupportedError,
+    iter_json_array)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_access import (
+    ProxmoxOpenSSHACLAnsible, ProxmoxOpenSSHGroupAnsible)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_client import ProxmoxOpenSSHClientModule
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_datacenter import (
+    ProxmoxOpenSSHDatacenterAnsible, normalize_spec)
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_fake import ProxmoxOpenSSHFakeSession
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import ProxmoxOpenSSHStorageAnsible
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1000])
+def test_iter_json_array_decodes_any_chunking(size):
+    items = [{'userid': 'root@pam', 'tokens': [{'tokenid': 'a'}]}, {'userid': 'x@pve', 'comment': 'a, b ] c'}, 12345, 'text']
+    assert list(iter_json_array(chunked(json.dumps(items), size))) == items
+
+
+def test_iter_json_array_yields_before_the_end():
+    def chunks():
+        yield '[{"a": 1}, '
+        raise AssertionError('read past the first element')
+
+    assert next(iter_json_array(chunks())) == {'a': 1}
+
+
+def test_iter_json_array_other_documents_once():
+    assert list(iter_json_array(chunked('{"version": "8.2"}', 4))) == [{'version': '8.2'}]
+    assert list(iter_json_array(['[]'])) == []
+    assert list(iter_json_array([''])) == []
+
+
+def test_iter_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(['[{"a": 1}, {"b"']))
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ProxmoxOpenSSHCache(str(tmp_path / 'cache'), ttl=60)
+    key = cache.key('pve1', 'users')
+    assert cache.get(key) is None
+    cache.set(key, [{'userid': 'root@pam'}])
+    assert cache.get(key) == [{'userid': 'root@pam'}]
+    assert ProxmoxOpenSSHCache.key('pve1', 'users') == key
+    assert ProxmoxOpenSSHCache.key('pve1', 'groups') != key
+
+
+def test_cache_expires(tmp_path):
+    cache = ProxmoxOpenSSHCache(str(tmp_path), ttl=60)
+    key = cache.key('expired')
+    cache.set(key, 1)
+    old = time.time() - 120
+    os.utime(os.path.join(str(tmp_path), key + '.json'), (old, old))
+    assert cache.get(key) is None
+
+
+def test_cache_revalidates_with_versions(tmp_path):
+    cache = ProxmoxOpenSSHCache(str(tmp_path), ttl=60)
+    key = cache.key('versioned')
+    cache.set(key, 'value', {'/etc/pve/user.cfg': 3})
+    old = time.time() - 120
+    os.utime(os.path.join(str(tmp_path), key + '.json'), (old, old))
+    assert cache.get(key, {'/etc/pve/user.cfg': 3}) == 'value'
+    assert cache.get(key, {'/etc/pve/user.cfg': 4}) is None
+
+
+def test_cache_ignores_broken_entries(tmp_path):
+    cache = ProxmoxOpenSSHCache(str(tmp_path), ttl=60)
+    key = cache.key('broken')
+    with open(os.path.join(str(tmp_path), key + '.json'), 'w') as f:
+        f.write('{"value": ')
+    assert cache.get(key) is None
+
+
+class FakeModule(object):
+    """Stands in for AnsibleModule, exit_json and fail_json return their result"""
+
+    check_mode = False
+
+    def __init__(self, **params):
+        self.params = dict(api_user='root', api_port=None, api_sudo=False, api_plan=None, api_backend='fake',
+                           api_token_id=None, api_token_secret=None, api_validate_certs=False, api_helper=False,
+                           api_cassette=None, api_replay_speed=1.0, api_write_concurrency=None, api_write_rate=None, api_timeout=5,
+                           **params)
+        self.warnings = []
+
+    def warn(self, msg):
+        self.warnings.append(msg)
+
+    def exit_json(self, **kwargs):
+        return kwargs
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROXMOX_OPENSSH_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_fake_backend_call_counts(cache_dir):
+    module = FakeModule(api_host='pve1')
+    proxmox = ProxmoxOpenSSHAnsible(module)
+    proxmox.proxmox_api.access.users.post(userid='devops@pve')
+    assert sorted(user['userid'] for user in proxmox.iter_users()) == ['devops@pve', 'root@pam']
+
+    calls = [(call['method'], call['path']) for call in module.exit_json()['proxmox_metrics']['calls']]
+    assert calls[0] == ('GET', '/version')
+    assert calls[1] == ('POST', '/access/users')
+    assert calls[2] == ('GET', '/access/users')
+
+    # The pre-flight result is cached for the host, the next run does not read /version
+    again = FakeModule(api_host='pve1')
+    ProxmoxOpenSSHAnsible(again)
+    assert again.exit_json()['proxmox_metrics']['calls'] == []
+
+
+def test_fake_backend_has_no_remote_commands(cache_dir):
+    proxmox = ProxmoxOpenSSHAnsible(FakeModule(api_host='pve1'))
+    assert not proxmox.has_remote_exec
+    assert proxmox.has_config_files
+    with pytest.raises(ProxmoxOpenSSHUnsupportedError):
+        proxmox.remote_exec(['true'])
+
+
+def test_plan_writes_to_one_file_apply_back_to_back(tmp_path):
+    session = ProxmoxOpenSSHFakeSession(str(tmp_path / 'pve1.json'))
+    for storageid in ('a1', 'a2'):
+        session.request('POST', '/storage', data={'storage': storageid, 'type': 'dir', 'path': '/srv/' + storageid})
+    plan = ProxmoxOpenSSHPlanSession(session, 'pve1', session.config_digests(['/etc/pve/storage.cfg']))
+    for storageid in ('a1', 'a2'):
+        plan.request('GET', '/storage/' + storageid)
+        plan.request('PUT', '/storage/' + storageid, data={'content': 'backup'})
+
+    # The storage.cfg digest of the reads goes stale after the first write
+    assert all('digest' not in write['data'] for write in plan.writes)
+    for write in plan.writes:
+        assert session.request(write['method'], write['path'], data=write['data']).status_code == 200
+
+
+def test_datacenter_updates_many_storages_from_one_snapshot(cache_dir):
+    datacenter = ProxmoxOpenSSHDatacenterAnsible(FakeModule(api_host='pve1'))
+    storages = [{'storage': storageid, 'type': 'dir', 'path': '/srv/' + storageid} for storageid in ('a1', 'a2')]
+    datacenter.converge(normalize_spec(storages=storages))
+
+    for storage in storages:
+        storage['content'] = 'backup'
+    actions = datacenter.converge(normalize_spec(storages=storages))[0]
+    assert [(action['action'], action['id']) for action in actions] == [('update', 'a1'), ('update', 'a2')]
+    assert [datacenter.proxmox_api.storage(storageid).get()['content'] for storageid in ('a1', 'a2')] == ['backup', 'backup']
+
+
+def test_storage_reconcile_absent_deletes_the_listed_storages(cache_dir):
+    proxmox = ProxmoxOpenSSHStorageAnsible(FakeModule(api_host='pve1'))
+    storages = [(storageid, {'path': '/srv/' + storageid}) for storageid in ('a1', 'a2')]
+    proxmox.reconcile('dir', storages)
+
+    actions = proxmox.reconcile('dir', [('a1', {}), ('missing', {})], state='absent')
+    assert actions == [{'action': 'delete', 'id': 'a1'}]
+    assert sorted(storage['storage'] for storage in proxmox.get_storages(type=None)) == ['a2', 'local']
+
+
+@pytest.mark.parametrize('prefix', ['/vms', '/vms/'])
+def test_acl_exclusive_prefix_covers_the_prefix_itself(cache_dir, prefix):
+    proxmox = ProxmoxOpenSSHACLAnsible(FakeModule(api_host='pve1'))
+    proxmox.proxmox_api.access.groups.post(groupid='ops')
+    for path in ('/vms', '/vms/100', '/vmsx', '/storage'):
+        proxmox.proxmox_api.access.acl.put(path=path, roles='PVEAuditor', groups='ops')
+
+    setting, removed = proxmox.exclusive('/vms/200', 'PVEAuditor', True, prefix=prefix, groups='ops')
+    assert setting == {'groups': ['ops']}
+    assert removed == ['/vms:PVEAuditor:group:ops', '/vms/100:PVEAuditor:group:ops']
+    assert sorted(acl['path'] for acl in proxmox.proxmox_api.access.acl.get()) == ['/storage', '/vms/200', '/vmsx']
+
+
+def test_access_objects_with_the_client_module(cache_dir):
+    module = ProxmoxOpenSSHClientModule({'api_host': 'pve1', 'api_user': 'root', 'api_backend': 'fake'})
+    groups = ProxmoxOpenSSHGroupAnsible(module)
+    groups.create('ops', comment='Operations')
+    assert groups.get('ops')['comment'] == 'Operations'
+    with pytest.raises(ProxmoxOpenSSHHostExit) as e:
+        groups.create('ops')
+    assert e.value.result['msg'] == 'Group ops exists'
+    assert not e.value.result['failed']
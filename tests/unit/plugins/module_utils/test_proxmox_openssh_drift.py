@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import random
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_drift import (CappedList)
+
+
+def test_capped_list_keeps_the_smallest_items():
+    items = list(range(1000))
+    random.Random(7).shuffle(items)
+    capped = CappedList(10)
+    for item in items:
+        capped.add(item)
+        assert len(capped.items) < 20
+    assert capped.report() == {'count': 1000, 'items': list(range(10))}
+
+
+def test_capped_list_below_the_limit():
+    capped = CappedList(5)
+    for item in ['c', 'a', 'b']:
+        capped.add(item)
+    assert capped.report() == {'count': 3, 'items': ['a', 'b', 'c']}
+    assert CappedList(5).report() == {'count': 0, 'items': []}
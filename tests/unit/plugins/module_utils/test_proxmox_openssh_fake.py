@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_fake import (
+    ProxmoxOpenSSHFakeSession, fake_initial_state)
+
+
+@pytest.fixture
+def session(tmp_path):
+    return ProxmoxOpenSSHFakeSession(str(tmp_path / 'pve1.json'))
+
+
+def get(session, path, **params):
+    response = session.request('GET', path, params=params)
+    assert response.status_code == 200
+    return json.loads(response.content)
+
+
+def test_initial_state(session):
+    assert get(session, '/version')['version'] == fake_initial_state()['version']['version']
+    assert [user['userid'] for user in get(session, '/access/users')] == ['root@pam']
+
+
+def test_writes_persist_between_sessions(session, tmp_path):
+    assert session.request('POST', '/access/users', data={'userid': 'devops@pve'}).status_code == 200
+    other = ProxmoxOpenSSHFakeSession(str(tmp_path / 'pve1.json'))
+    assert sorted(user['userid'] for user in get(other, '/access/users')) == ['devops@pve', 'root@pam']
+    assert session.request('POST', '/access/users', data={'userid': 'devops@pve'}).status_code == 500
+
+
+def test_digest_is_checked(session):
+    digests = session.config_digests(['/etc/pve/user.cfg', '/etc/pve/storage.cfg'])
+    session.request('POST', '/access/groups', data={'groupid': 'ops'})
+    stale = session.request('PUT', '/access/groups/ops', data={'comment': 'x', 'digest': digests['/etc/pve/user.cfg']})
+    assert stale.status_code == 500
+    assert 'detected modified configuration' in stale.content
+    # storage.cfg did not change
+    assert session.config_digests(['/etc/pve/storage.cfg']) == {'/etc/pve/storage.cfg': digests['/etc/pve/storage.cfg']}
+
+
+def test_versions_count_writes(session):
+    session.request('POST', '/access/groups', data={'groupid': 'ops'})
+    session.request('POST', '/access/groups', data={'groupid': 'dev'})
+    versions = json.loads(session.read_config_files(['/etc/pve/.version'])['/etc/pve/.version'])
+    assert versions == {'user.cfg': 2, 'storage.cfg': 0}
+
+
+def test_injected_failure_is_used_up(session, tmp_path):
+    state = fake_initial_state()
+    state['failures'] = [{'path': '^/access/users$', 'method': 'GET', 'status': 503, 'times': 1}]
+    with open(str(tmp_path / 'pve1.json'), 'w') as f:
+        json.dump(state, f)
+    assert session.request('GET', '/access/users').status_code == 503
+    assert session.request('GET', '/access/users').status_code == 200
+
+
+def test_down_node(tmp_path):
+    state = fake_initial_state()
+    state['down'] = ['pve2']
+    with open(str(tmp_path / 'cluster.json'), 'w') as f:
+        json.dump(state, f)
+    with pytest.raises(IOError):
+        ProxmoxOpenSSHFakeSession(str(tmp_path / 'cluster.json'), node='pve2').request('GET', '/version')
+    assert ProxmoxOpenSSHFakeSession(str(tmp_path / 'cluster.json'), node='pve1').request('GET', '/version').status_code == 200
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_permissions import (PermissionTrie)
+
+ROLES = [
+    {'roleid': 'Auditor', 'privs': 'VM.Audit,Sys.Audit'},
+    {'roleid': 'Power', 'privs': 'VM.PowerMgmt'},
+    {'roleid': 'VMAdmin', 'privs': 'VM.Audit,VM.PowerMgmt,VM.Allocate'},
+    {'roleid': 'NoAccess', 'privs': ''},
+]
+
+USERS = [
+    {'userid': 'ops@pve', 'groups': 'admins', 'tokens': [{'tokenid': 'shared', 'privsep': 0},
+                                                          {'tokenid': 'limited', 'privsep': 1}]},
+    {'userid': 'dev@pve', 'groups': 'admins'},
+    {'userid': 'guest@pve'},
+]
+
+
+def acl(path, ugid, roleid, acl_type='user', propagate=1):
+    return {'path': path, 'ugid': ugid, 'roleid': roleid, 'type': acl_type, 'propagate': propagate}
+
+
+def test_roles_propagate_and_are_replaced_deeper():
+    trie = PermissionTrie([acl('/', 'ops@pve', 'Auditor'), acl('/vms/100', 'ops@pve', 'Power')], ROLES, USERS)
+    assert trie.privileges('ops@pve', '/vms/101') == frozenset(['VM.Audit', 'Sys.Audit'])
+    assert trie.privileges('ops@pve', '/vms/100') == frozenset(['VM.PowerMgmt'])
+
+
+def test_roles_without_propagate_only_on_their_path():
+    trie = PermissionTrie([acl('/vms', 'ops@pve', 'Auditor', propagate=0)], ROLES, USERS)
+    assert trie.privileges('ops@pve', '/vms') == frozenset(['VM.Audit', 'Sys.Audit'])
+    assert trie.privileges('ops@pve', '/vms/100') == frozenset()
+
+
+def test_user_roles_override_group_roles():
+    trie = PermissionTrie([acl('/vms', 'admins', 'VMAdmin', 'group'), acl('/vms', 'dev@pve', 'Auditor')], ROLES, USERS)
+    assert trie.privileges('ops@pve', '/vms/100') == frozenset(['VM.Audit', 'VM.PowerMgmt', 'VM.Allocate'])
+    assert trie.privileges('dev@pve', '/vms/100') == frozenset(['VM.Audit', 'Sys.Audit'])
+    assert trie.privileges('guest@pve', '/vms/100') == frozenset()
+
+
+def test_no_access_wins():
+    trie = PermissionTrie([acl('/', 'admins', 'VMAdmin', 'group'), acl('/vms', 'admins', 'NoAccess', 'group'),
+                           acl('/vms', 'admins', 'Power', 'group')], ROLES, USERS)
+    assert trie.roles('ops@pve', '/vms/100') == {'NoAccess': 1}
+    assert trie.privileges('ops@pve', '/vms/100') == frozenset()
+
+
+def test_tokens_and_privsep():
+    trie = PermissionTrie([acl('/', 'ops@pve', 'VMAdmin'), acl('/', 'ops@pve!limited', 'Auditor', 'token')], ROLES, USERS)
+    assert trie.privileges('ops@pve!shared', '/vms/100') == frozenset(['VM.Audit', 'VM.PowerMgmt', 'VM.Allocate'])
+    # Only what both the token and its user have
+    assert trie.privileges('ops@pve!limited', '/vms/100') == frozenset(['VM.Audit'])
+    assert trie.privileges('ops@pve!unknown', '/vms/100') == frozenset()
+
+
+def test_root_has_every_privilege():
+    trie = PermissionTrie([], ROLES, USERS)
+    assert trie.privileges('root@pam', '/storage/local') >= frozenset(['VM.Allocate', 'Sys.Audit'])
+
+
+def test_pool_path_is_checked_separately():
+    trie = PermissionTrie([acl('/vms/100', 'ops@pve', 'Auditor'), acl('/pool/prod', 'ops@pve', 'Power')],
+                          ROLES, USERS, pools={100: 'prod'})
+    assert trie.checked_paths('/vms/100') == ['/vms/100', '/pool/prod']
+    assert trie.privileges('ops@pve', '/vms/100') == frozenset(['VM.Audit', 'Sys.Audit', 'VM.PowerMgmt'])
+    assert trie.path_roles('ops@pve', '/vms/100') == set(['Auditor', 'Power'])
+    # Each privilege is granted on one of the paths, both together on neither
+    assert trie.check('ops@pve', '/vms/100', ['VM.PowerMgmt']) == (True, [])
+    assert trie.check('ops@pve', '/vms/100', ['VM.Audit']) == (True, [])
+    assert trie.check('ops@pve', '/vms/100', ['VM.Audit', 'VM.PowerMgmt']) == (False, ['VM.PowerMgmt'])
+    assert trie.check('ops@pve', '/vms/101', ['VM.Audit']) == (False, ['VM.Audit'])
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_schema import (
+    check_acl_path, validate_api_params)
+
+ACL_SCHEMA = {'PUT /access/acl': {'path': {'type': 'string'}, 'roles': {'type': 'string'}}}
+
+
+@pytest.mark.parametrize('path', ['/', '/vms/100', '/sdn/controllers', '/sdn/ipams/pve', '/sdn/dns', '/sdn/vnets/vnet1',
+                                  '/mapping/pci/gpu', '/pool/dev/team', '/storage/local-lvm'])
+def test_acl_paths_of_any_release_are_accepted(path):
+    assert check_acl_path(path)
+    assert validate_api_params(ACL_SCHEMA, 'PUT', '/access/acl', {'path': path, 'roles': 'PVEAuditor'})['path'] == path
+
+
+@pytest.mark.parametrize('path', ['', 'vms/100', 'sdn', '/vms/1 00', '/vms/100\n'])
+def test_malformed_acl_paths_are_rejected(path):
+    assert not check_acl_path(path)
+    with pytest.raises(ValueError, match='not a valid ACL path'):
+        validate_api_params(ACL_SCHEMA, 'PUT', '/access/acl', {'path': path, 'roles': 'PVEAuditor'})
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Cloud Codger <cloud at codger.site>
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.cloudcodger.proxmox_openssh.plugins.module_utils.proxmox_openssh_storage import (
+    STORAGE_SCHEMA, ProxmoxOpenSSHStorageAnsible, public_storage_options, storage_schema, validate_storage_options)
+
+# The parts of the /storage API schema that storage_schema reads, as returned by parse_apidoc
+APIDOC = {
+    'POST /storage': {
+        'storage': {'type': 'string', 'format': 'pve-storage-id'},
+        'type': {'type': 'string', 'enum': ['cifs', 'dir', 'lvmthin', 'zfspool']},
+        'bwlimit': {'type': 'string', 'optional': 1},
+        'content': {'type': 'string', 'format': 'pve-storage-content-list', 'optional': 1},
+        'create-base-path': {'type': 'boolean', 'default': 'yes', 'optional': 1},
+        'mkdir': {'type': 'boolean', 'default': 'yes', 'optional': 1},
+        'path': {'type': 'string', 'optional': 1},
+        'preallocation': {'type': 'string', 'enum': ['off', 'metadata', 'falloc', 'full'], 'default': 'metadata', 'optional': 1},
+        'vgname': {'type': 'string', 'optional': 1},
+    },
+    'PUT /storage/{storage}': {
+        'storage': {'type': 'string', 'format': 'pve-storage-id'},
+        'bwlimit': {'type': 'string', 'optional': 1},
+        'content': {'type': 'string', 'format': 'pve-storage-content-list', 'optional': 1},
+        'create-base-path': {'type': 'boolean', 'default': 'yes', 'optional': 1},
+        'mkdir': {'type': 'boolean', 'default': 'yes', 'optional': 1},
+        'preallocation': {'type': 'string', 'enum': ['off', 'metadata', 'falloc', 'full'], 'default': 'metadata', 'optional': 1},
+    },
+}
+
+
+class ModuleFailed(Exception):
+    pass
+
+
+class FakeModule(object):
+
+    check_mode = False
+
+    def fail_json(self, msg, **kwargs):
+        raise ModuleFailed(msg)
+
+
+def storage_helper(schema=STORAGE_SCHEMA):
+    # diff only needs the module and the storage schema, no connection is made
+    helper = ProxmoxOpenSSHStorageAnsible.__new__(ProxmoxOpenSSHStorageAnsible)
+    helper.module = FakeModule()
+    helper._storage_schema = schema
+    return helper
+
+
+def test_validate_normalizes():
+    options = validate_storage_options('dir', {
+        'path': '/mnt/data',
+        'content': ['ISO', 'backup', 'iso'],
+        'shared': True,
+        'nodes': 'pve2, pve1',
+        'max-protected-backups': '3',
+        'disable': None,
+    })
+    assert options == {
+        'path': '/mnt/data',
+        'content': 'backup,iso',
+        'shared': '1',
+        'nodes': 'pve1,pve2',
+        'max-protected-backups': '3',
+    }
+
+
+@pytest.mark.parametrize('storage_type, options, message', [
+    ('ceph', {}, "Unsupported storage type 'ceph'"),
+    ('dir', {'server': 'nas'}, "Option 'server' is not valid for storage type 'dir'"),
+    ('dir', {'shared': 'maybe'}, "Option 'shared': expected a boolean"),
+    ('dir', {'format': 'vdi'}, "Option 'format' must be one of raw, qcow2, vmdk"),
+    ('lvmthin', {'content': 'iso'}, "Content iso is not valid for storage type 'lvmthin'"),
+])
+def test_validate_rejects(storage_type, options, message):
+    with pytest.raises(ValueError) as e:
+        validate_storage_options(storage_type, options)
+    assert message in str(e.value)
+
+
+def test_diff_only_returns_changed_options():
+    current = {'storage': 'nas', 'type': 'nfs', 'server': '10.0.0.1', 'export': '/backup', 'path': '/mnt/pve/nas',
+               'content': 'iso,backup', 'digest': 'abc'}
+    desired = validate_storage_options('nfs', {'server': '10.0.0.1', 'export': '/backup', 'path': '/mnt/pve/nas',
+                                               'content': ['backup', 'iso'], 'disable': False,
+                                               'options': 'vers=4.2'})
+    assert storage_helper().diff('nfs', current, desired) == {'options': 'vers=4.2'}
+
+
+def test_diff_uses_defaults_of_missing_options():
+    current = {'storage': 'data', 'type': 'dir', 'path': '/srv/data'}
+    desired = validate_storage_options('dir', {'path': '/srv/data', 'create-base-path': True, 'create-subdirs': False,
+                                               'shared': False})
+    assert storage_helper().diff('dir', current, desired) == {'create-subdirs': '0'}
+    desired = validate_storage_options('dir', {'mkdir': True, 'preallocation': 'metadata', 'shared': True}, storage_schema(APIDOC))
+    assert storage_helper(storage_schema(APIDOC)).diff('dir', current, desired) == {'shared': '1'}
+
+
+def test_diff_skips_secrets():
+    current = {'storage': 'pbs', 'type': 'pbs', 'server': 'pbs1', 'datastore': 'store1'}
+    desired = validate_storage_options('pbs', {'server': 'pbs1', 'datastore': 'store1', 'password': 'secret',
+                                               'encryption-key': 'key'})
+    assert storage_helper().diff('pbs', current, desired) == {}
+
+
+def test_diff_fails_on_fixed_options():
+    current = {'storage': 'data', 'type': 'dir', 'path': '/srv/data'}
+    with pytest.raises(ModuleFailed) as e:
+        storage_helper().diff('dir', current, {'path': '/srv/other'})
+    assert "Option 'path' of storage data" in str(e.value)
+
+
+def test_public_options_drop_secrets():
+    options = validate_storage_options('pbs', {'server': 'pbs1', 'password': 'secret', 'encryption-key': 'key',
+                                               'master-pubkey': 'pub'})
+    assert public_storage_options('pbs', options) == {'server': 'pbs1'}
+
+
+def test_schema_without_api_schema_is_the_local_copy():
+    assert storage_schema() is STORAGE_SCHEMA
+    assert storage_schema({'GET /access/users': {}}) is STORAGE_SCHEMA
+
+
+def test_schema_from_api_schema():
+    schema = storage_schema(APIDOC)
+    assert sorted(schema) == ['cifs', 'dir', 'lvmthin', 'zfspool']
+    options = schema['zfspool']['options']
+    assert options['bwlimit'] == {'type': 'string'}
+    assert options['content'] == {'type': 'list'}
+    assert options['mkdir'] == {'type': 'boolean', 'default': '1'}
+    assert options['preallocation']['choices'] == ['off', 'metadata', 'falloc', 'full']
+    # Not taken by PUT /storage/{storage}
+    assert options['vgname'] == {'type': 'string', 'fixed': True}
+    # Required on create for the types of the local copy
+    assert schema['lvmthin']['options']['vgname'] == {'type': 'string', 'fixed': True, 'create': True}
+    assert schema['lvmthin']['content'] == STORAGE_SCHEMA['lvmthin']['content']
+    assert schema['cifs']['content'] is None
+
+
+def test_validate_with_api_schema():
+    schema = storage_schema(APIDOC)
+    assert validate_storage_options('zfspool', {'bwlimit': 'default=100', 'preallocation': 'off', 'mkdir': False}, schema) == {
+        'bwlimit': 'default=100', 'preallocation': 'off', 'mkdir': '0'}
+    assert validate_storage_options('cifs', {'content': 'iso'}, schema) == {'content': 'iso'}
+    with pytest.raises(ValueError) as e:
+        validate_storage_options('lvmthin', {'content': 'iso'}, schema)
+    assert "Content iso is not valid for storage type 'lvmthin'" in str(e.value)